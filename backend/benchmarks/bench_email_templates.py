@@ -0,0 +1,153 @@
+#!/usr/bin/env python3
+"""
+Email template render throughput benchmark
+
+Compares, for the contact confirmation email:
+  - the previous f-string builder that EmailService used per call
+  - compiling the Jinja2 template on every render (no cache)
+  - EmailTemplateEngine.render with its compiled-template cache
+
+Renders run in-process against the files in email_templates/. The
+database template lookup is replaced by one that finds nothing, so no
+round-trip is included in the numbers.
+
+Usage (from the backend directory):
+    python benchmarks/bench_email_templates.py [--renders 20000]
+"""
+
+import argparse
+import asyncio
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from services import email_templates as email_templates_module
+from services.email_templates import EmailTemplateEngine, template_context
+
+CONTACT = {
+    "name": "Layla Haddad",
+    "email": "layla@example.com",
+    "phone": "+971 50 123 4567",
+    "service": "web_development",
+    "message": "We need a bilingual storefront with <b>WhatsApp</b> checkout & analytics.",
+}
+SENDER = "hello@nowheredigital.ae"
+
+
+def legacy_render(contact_data) -> str:
+    """The previous per-call f-string, kept for comparison"""
+    return f"""
+        <html>
+            <body style="font-family: Arial, sans-serif; line-height: 1.6; color: #333;">
+                <div style="max-width: 600px; margin: 0 auto; padding: 20px; background: #000; color: #00ff00;">
+                    <div style="text-align: center; margin-bottom: 30px;">
+                        <h1 style="color: #00ff00; font-family: monospace; font-size: 28px;">
+                            NOWHERE DIGITAL
+                        </h1>
+                        <p style="color: #00ff00; font-family: monospace; font-size: 14px;">
+                            DIGITAL_MATRIX_DUBAI
+                        </p>
+                    </div>
+                    <div style="background: #111; padding: 20px; border: 1px solid #00ff00; border-radius: 8px;">
+                        <h2 style="color: #00ff00; font-family: monospace; margin-bottom: 20px;">
+                            &gt; TRANSMISSION_RECEIVED
+                        </h2>
+                        <p style="color: #00ff00; font-family: monospace; margin-bottom: 15px;">
+                            Hello {contact_data['name']},
+                        </p>
+                        <p style="color: #00ff00; font-family: monospace; margin-bottom: 15px;">
+                            &gt; Your message has been received and processed
+                            <br />
+                            &gt; Agent will initiate contact within 24 hours
+                            <br />
+                            &gt; Service requested: {contact_data['service'].replace('_', ' ').title()}
+                        </p>
+                        <div style="background: #000; padding: 15px; border-left: 3px solid #00ff00; margin: 20px 0;">
+                            <h3 style="color: #00ff00; font-family: monospace; margin-bottom: 10px;">
+                                YOUR_MESSAGE:
+                            </h3>
+                            <p style="color: #00ff00; font-family: monospace; font-size: 14px;">
+                                {contact_data['message']}
+                            </p>
+                        </div>
+                        <div style="margin-top: 30px;">
+                            <p style="color: #00ff00; font-family: monospace; font-size: 14px;">
+                                &gt; CONTACT_PROTOCOLS_ACTIVE
+                                <br />
+                                &gt; EMAIL: {SENDER}
+                                <br />
+                                &gt; PHONE: +971 50 XXX XXXX
+                                <br />
+                                &gt; LOCATION: Dubai, UAE
+                            </p>
+                        </div>
+                    </div>
+                    <div style="text-align: center; margin-top: 30px;">
+                        <p style="color: #666; font-family: monospace; font-size: 12px;">
+                            © 2025 NOWHERE_DIGITAL_MATRIX. ALL_RIGHTS_RESERVED.
+                        </p>
+                    </div>
+                </div>
+            </body>
+        </html>
+        """
+
+
+class NoDatabaseTemplates:
+    async def find_one(self, *args, **kwargs):
+        return None
+
+
+class NoDatabase:
+    email_templates = NoDatabaseTemplates()
+
+
+def measure(render, renders: int) -> float:
+    for _ in range(200):
+        render()
+    start = time.perf_counter()
+    for _ in range(renders):
+        render()
+    return (time.perf_counter() - start) / renders
+
+
+async def measure_async(render, renders: int) -> float:
+    for _ in range(200):
+        await render()
+    start = time.perf_counter()
+    for _ in range(renders):
+        await render()
+    return (time.perf_counter() - start) / renders
+
+
+async def main(renders: int):
+    email_templates_module.get_database = lambda: NoDatabase()
+    engine = EmailTemplateEngine()
+    data = {"sender_email": SENDER, **CONTACT}
+
+    body_source = (engine.root / "contact_confirmation.html").read_text(encoding="utf-8")
+    context = template_context(data)
+
+    def uncached():
+        return engine._html.from_string(body_source).render(context)
+
+    results = [
+        ("f-string (previous)", measure(lambda: legacy_render(CONTACT), renders)),
+        ("jinja2, compile each", measure(uncached, max(renders // 20, 100))),
+        ("jinja2, cached", await measure_async(lambda: engine.render("contact_confirmation", data), renders)),
+    ]
+
+    print(f"contact_confirmation, {renders} renders per variant")
+    print(f"{'variant':<24}{'us/render':>12}{'renders/s':>14}")
+    for name, value in results:
+        print(f"{name:<24}{value * 1e6:>12.1f}{1 / value:>14.0f}")
+    print(f"template engine: {engine.get_metrics()}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--renders", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.renders))
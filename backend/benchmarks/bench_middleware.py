@@ -0,0 +1,113 @@
+#!/usr/bin/env python3
+"""
+Middleware overhead benchmark for GET /api/health
+
+Compares the per-request cost of the legacy BaseHTTPMiddleware-based
+AnalyticsMiddleware with the pure ASGI implementation in server.py.
+Requests are driven straight through the ASGI interface so that no
+network or HTTP client cost is included in the numbers.
+
+Usage (from the backend directory):
+    python benchmarks/bench_middleware.py [--requests 20000]
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent))
+
+from fastapi import FastAPI
+from starlette.middleware.base import BaseHTTPMiddleware
+from starlette.requests import Request
+
+import server
+from models import AnalyticsEventType
+from server import AnalyticsMiddleware, api_router
+from services.analytics_service import analytics_service
+
+
+class LegacyAnalyticsMiddleware(BaseHTTPMiddleware):
+    """The previous BaseHTTPMiddleware implementation, kept for comparison"""
+
+    async def dispatch(self, request: Request, call_next):
+        start_time = datetime.utcnow()
+
+        if request.method == "GET":
+            analytics_service.emit(AnalyticsEventType.PAGE_VIEW)
+
+        response = await call_next(request)
+
+        process_time = (datetime.utcnow() - start_time).total_seconds()
+        server.logger.info(f"{request.method} {request.url.path} - {response.status_code} - {process_time:.3f}s")
+
+        return response
+
+
+def build_app(middleware=None) -> FastAPI:
+    app = FastAPI()
+    app.include_router(api_router)
+    if middleware:
+        app.add_middleware(middleware)
+    return app
+
+
+async def call(app, scope):
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        pass
+
+    await app(scope, receive, send)
+
+
+async def run(app, requests: int) -> float:
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": "/api/health",
+        "raw_path": b"/api/health",
+        "root_path": "",
+        "query_string": b"",
+        "headers": [(b"host", b"testserver")],
+        "client": ("127.0.0.1", 50000),
+        "server": ("testserver", 80),
+    }
+
+    # Warm up routing and pydantic serializers
+    for _ in range(200):
+        await call(app, dict(scope))
+
+    start = time.perf_counter()
+    for _ in range(requests):
+        await call(app, dict(scope))
+    return (time.perf_counter() - start) / requests
+
+
+async def main(requests: int):
+    # Keep log I/O out of the measurement; both variants format the same line
+    server.logger.setLevel(logging.WARNING)
+
+    baseline = await run(build_app(), requests)
+    legacy = await run(build_app(LegacyAnalyticsMiddleware), requests)
+    asgi = await run(build_app(AnalyticsMiddleware), requests)
+
+    print(f"GET /api/health, {requests} requests per variant")
+    print(f"{'variant':<24}{'us/request':>12}{'overhead us':>14}")
+    for name, value in (("no middleware", baseline), ("BaseHTTPMiddleware", legacy), ("pure ASGI", asgi)):
+        print(f"{name:<24}{value * 1e6:>12.1f}{(value - baseline) * 1e6:>14.1f}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=20000)
+    args = parser.parse_args()
+    asyncio.run(main(args.requests))
@@ -1,86 +1,301 @@
-from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING, monitoring
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase, AsyncIOMotorCollection
 from config import settings
 import logging
-from typing import Optional
+import asyncio
+import threading
+from typing import Optional, Dict, Any, Awaitable, List, Tuple, Union
 
 logger = logging.getLogger(__name__)
 
+class PoolMetrics(monitoring.ConnectionPoolListener):
+    """Connection pool utilization, collected from pymongo's pool events.
+
+    Events arrive on driver threads, so the counters are guarded by a lock.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {
+            "created": 0,
+            "closed": 0,
+            "checkout_started": 0,
+            "checked_out": 0,
+            "checked_in": 0,
+            "checkout_failed": 0,
+            "pool_cleared": 0,
+        }
+        self._in_use_peak = 0
+
+    def _inc(self, name: str):
+        with self._lock:
+            self._counters[name] += 1
+            in_use = self._counters["checked_out"] - self._counters["checked_in"]
+            self._in_use_peak = max(self._in_use_peak, in_use)
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_cleared(self, event):
+        self._inc("pool_cleared")
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_created(self, event):
+        self._inc("created")
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_closed(self, event):
+        self._inc("closed")
+
+    def connection_check_out_started(self, event):
+        self._inc("checkout_started")
+
+    def connection_check_out_failed(self, event):
+        self._inc("checkout_failed")
+
+    def connection_checked_out(self, event):
+        self._inc("checked_out")
+
+    def connection_checked_in(self, event):
+        self._inc("checked_in")
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            counters = dict(self._counters)
+            in_use_peak = self._in_use_peak
+        in_use = counters["checked_out"] - counters["checked_in"]
+        return {
+            **counters,
+            "open": counters["created"] - counters["closed"],
+            "in_use": in_use,
+            "in_use_peak": in_use_peak,
+            "waiting": counters["checkout_started"] - counters["checked_out"] - counters["checkout_failed"],
+            "max_pool_size": settings.mongo_max_pool_size,
+            "min_pool_size": settings.mongo_min_pool_size,
+            "utilization": round(in_use / settings.mongo_max_pool_size, 3) if settings.mongo_max_pool_size else None,
+        }
+
 class Database:
     client: Optional[AsyncIOMotorClient] = None
     db: Optional[AsyncIOMotorDatabase] = None
+    ready: bool = False  # connected, warmed up and indexed
 
 db = Database()
+pool_metrics = PoolMetrics()
+
+def create_client() -> AsyncIOMotorClient:
+    """Motor client with the pool settings from ``Settings``"""
+    return AsyncIOMotorClient(
+        settings.mongo_url,
+        maxPoolSize=settings.mongo_max_pool_size,
+        minPoolSize=settings.mongo_min_pool_size,
+        maxIdleTimeMS=settings.mongo_max_idle_time_ms,
+        waitQueueTimeoutMS=settings.mongo_wait_queue_timeout_ms,
+        serverSelectionTimeoutMS=settings.mongo_server_selection_timeout_ms,
+        connectTimeoutMS=settings.mongo_connect_timeout_ms,
+        socketTimeoutMS=settings.mongo_socket_timeout_ms,
+        event_listeners=[pool_metrics],
+    )
+
+async def warm_up_pool():
+    """Open connections up front so the first requests do not pay for the handshakes"""
+    count = min(settings.mongo_warmup_connections, settings.mongo_max_pool_size)
+    # Concurrent pings each need their own connection
+    await asyncio.gather(*(db.client.admin.command("ping") for _ in range(count)))
+    logger.info(f"MongoDB connection pool warmed up ({pool_metrics.snapshot()['open']} open)")
 
 async def connect_to_db():
     """Create database connection"""
     try:
-        db.client = AsyncIOMotorClient(settings.mongo_url)
+        db.client = create_client()
         db.db = db.client[settings.db_name]
         
         # Test connection
         await db.client.admin.command('ping')
         logger.info("Connected to MongoDB")
         
+        await warm_up_pool()
+        
         # Create indexes
         await create_indexes()
         
+        if settings.index_advisor_on_startup:
+            from index_advisor import log_index_report
+            await log_index_report(db.db)
+        
+        db.ready = True
+        
     except Exception as e:
         logger.error(f"Failed to connect to MongoDB: {e}")
+        if db.client:
+            db.client.close()
+        db.client = db.db = None
         raise
 
+async def connect_with_retry():
+    """Connect, retrying with exponential backoff until MongoDB is reachable"""
+    delay = settings.mongo_connect_retry_delay
+    while True:
+        try:
+            await connect_to_db()
+            return
+        except Exception:
+            logger.warning(f"Retrying MongoDB connection in {delay:g}s")
+            await asyncio.sleep(delay)
+            delay = min(delay * 2, 30)
+
+async def ping_database() -> bool:
+    """Whether MongoDB answers a ping right now"""
+    if not db.client:
+        return False
+    try:
+        await db.client.admin.command("ping")
+        return True
+    except Exception as e:
+        logger.warning(f"MongoDB ping failed: {e}")
+        return False
+
 async def close_db_connection():
     """Close database connection"""
+    db.ready = False
     if db.client:
         db.client.close()
         logger.info("Disconnected from MongoDB")
 
+# Index spec per collection: (keys, options). Compound indexes follow the
+# equality -> sort -> range order of the queries that use them; the shapes
+# they are meant to serve are listed in index_advisor.QUERY_SHAPES.
+INDEX_SPECS: Dict[str, List[Tuple[Union[str, List[Tuple[str, int]]], Dict[str, Any]]]] = {
+    "contact_forms": [
+        ("id", {"unique": True}),
+        ("email", {}),
+        ([("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ([("admin_digest_pending", ASCENDING), ("created_at", ASCENDING)], {"partialFilterExpression": {"admin_digest_pending": True}}),
+        ("admin_digest_id", {"sparse": True}),
+    ],
+    "users": [
+        ("id", {"unique": True}),
+        ("email", {"unique": True}),
+        ("role", {}),
+    ],
+    "portfolio": [
+        ("id", {"unique": True}),
+        ([("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ([("service_type", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ([("is_featured", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ([("service_type", ASCENDING), ("is_featured", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+    ],
+    "bookings": [
+        ("id", {"unique": True}),
+        ("preferred_date", {}),
+        ([("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ([("user_id", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ([("user_id", ASCENDING), ("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+    ],
+    "chat_messages": [
+        ("id", {"unique": True}),
+        ("user_id", {}),
+        ([("session_id", ASCENDING), ("created_at", ASCENDING), ("id", ASCENDING)], {}),
+    ],
+    "chat_sessions": [
+        ("session_id", {"unique": True}),
+        ("user_id", {}),
+    ],
+    "services": [
+        ("id", {"unique": True}),
+        ([("created_at", DESCENDING)], {}),
+        ([("is_active", ASCENDING), ("created_at", DESCENDING)], {}),
+        ([("category", ASCENDING), ("is_active", ASCENDING), ("created_at", DESCENDING)], {}),
+    ],
+    "testimonials": [
+        ("id", {"unique": True}),
+        ([("rating", DESCENDING), ("id", DESCENDING)], {}),
+        ([("is_featured", ASCENDING), ("rating", DESCENDING), ("id", DESCENDING)], {}),
+    ],
+    "content_generation": [
+        ("id", {"unique": True}),
+        ([("metadata.job_id", ASCENDING), ("metadata.index", ASCENDING)], {}),
+    ],
+    "content_jobs": [
+        ("id", {"unique": True}),
+    ],
+    "email_outbox": [
+        ("id", {"unique": True}),
+        # Serves both branches of the claim's $or in next_attempt_at order, so neither needs a SORT
+        ([("status", ASCENDING), ("next_attempt_at", ASCENDING), ("locked_until", ASCENDING)], {}),
+        ("claimed_by", {}),
+        ([("status", ASCENDING), ("created_at", DESCENDING), ("id", DESCENDING)], {}),
+        ("sent_at", {"expireAfterSeconds": 7 * 24 * 3600}),  # sent emails are kept for a week
+    ],
+    "analytics": [
+        ("analytics_date", {"unique": True}),
+    ],
+    "ai_prompt_cache": [
+        ("expires_at", {"expireAfterSeconds": 0}),
+        ([("scope", ASCENDING), ("shingles", ASCENDING)], {}),
+    ],
+}
+
 async def create_indexes():
-    """Create database indexes for better performance"""
-    try:
-        # Contact forms indexes
-        await db.db.contact_forms.create_index("email")
-        await db.db.contact_forms.create_index("status")
-        await db.db.contact_forms.create_index("created_at")
-        
-        # Users indexes
-        await db.db.users.create_index("email", unique=True)
-        await db.db.users.create_index("role")
-        
-        # Portfolio indexes
-        await db.db.portfolio.create_index("service_type")
-        await db.db.portfolio.create_index("is_featured")
-        await db.db.portfolio.create_index("created_at")
-        
-        # Bookings indexes
-        await db.db.bookings.create_index("user_id")
-        await db.db.bookings.create_index("status")
-        await db.db.bookings.create_index("preferred_date")
-        
-        # Chat messages indexes
-        await db.db.chat_messages.create_index("session_id")
-        await db.db.chat_messages.create_index("user_id")
-        await db.db.chat_messages.create_index("created_at")
-        
-        # Chat sessions indexes
-        await db.db.chat_sessions.create_index("session_id", unique=True)
-        await db.db.chat_sessions.create_index("user_id")
-        
-        # Services indexes
-        await db.db.services.create_index("category")
-        await db.db.services.create_index("is_active")
-        
-        # Testimonials indexes
-        await db.db.testimonials.create_index("is_featured")
-        await db.db.testimonials.create_index("rating")
-        
-        # Analytics indexes
-        await db.db.analytics.create_index("analytics_date", unique=True)
-        
+    """Create the indexes declared in INDEX_SPECS"""
+    failed = 0
+    for collection, indexes in INDEX_SPECS.items():
+        for keys, options in indexes:
+            try:
+                await db.db[collection].create_index(keys, **options)
+            except Exception as e:
+                failed += 1
+                logger.error(f"Failed to create index {keys} on {collection}: {e}")
+    
+    if failed:
+        logger.error(f"{failed} database indexes could not be created")
+    else:
         logger.info("Database indexes created successfully")
-        
-    except Exception as e:
-        logger.error(f"Failed to create indexes: {e}")
 
 def get_database() -> AsyncIOMotorDatabase:
     """Get database instance"""
-    return db.db
\ No newline at end of file
+    return db.db
+
+def is_database_ready() -> bool:
+    """Whether startup finished connecting, warming up and indexing"""
+    return db.ready
+
+class QueryPlan:
+    """Collects independent reads and runs them concurrently.
+
+    Total latency is roughly that of the slowest query instead of the sum.
+    ``count`` uses the collection metadata (``estimated_document_count``)
+    for unfiltered totals unless an exact count is requested.
+    """
+
+    def __init__(self):
+        self._queries: Dict[str, Awaitable[Any]] = {}
+
+    def add(self, name: str, query: Awaitable[Any]) -> "QueryPlan":
+        """Register an arbitrary awaitable under ``name``"""
+        self._queries[name] = query
+        return self
+
+    def find_one(self, name: str, collection: AsyncIOMotorCollection, query: Dict[str, Any]) -> "QueryPlan":
+        return self.add(name, collection.find_one(query))
+
+    def count(self, name: str, collection: AsyncIOMotorCollection, query: Optional[Dict[str, Any]] = None, exact: bool = False) -> "QueryPlan":
+        if query or exact:
+            return self.add(name, collection.count_documents(query or {}))
+        return self.add(name, collection.estimated_document_count())
+
+    async def run(self) -> Dict[str, Any]:
+        """Run all registered queries concurrently and return results by name"""
+        names = list(self._queries)
+        results = await asyncio.gather(*self._queries.values())
+        self._queries = {}
+        return dict(zip(names, results))
@@ -0,0 +1,157 @@
+#!/usr/bin/env python3
+"""
+Index advisor
+
+Runs explain() on every query shape the API issues and reports the ones
+whose winning plan contains a COLLSCAN (no usable index) or a SORT stage
+(in-memory sort). Run it against a populated database after changing
+endpoint queries or INDEX_SPECS:
+
+    python index_advisor.py [--create-indexes]
+
+It can also run at startup by setting INDEX_ADVISOR_ON_STARTUP=true.
+"""
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from database import connect_to_db, close_db_connection, create_indexes, get_database
+from pagination import RECENT_FIRST, OLDEST_FIRST, TOP_RATED_FIRST
+from pymongo import ASCENDING, DESCENDING
+from datetime import date, datetime
+from typing import List, Dict, Any
+import argparse
+import asyncio
+import logging
+import sys
+
+logger = logging.getLogger(__name__)
+
+PROBLEM_STAGES = {"COLLSCAN", "SORT"}
+
+# Every filter + sort the API issues, with representative values
+QUERY_SHAPES: List[Dict[str, Any]] = [
+    # get_contact_forms / update_contact_form
+    {"name": "contact_forms.list", "collection": "contact_forms", "filter": {}, "sort": RECENT_FIRST},
+    {"name": "contact_forms.list_by_status", "collection": "contact_forms", "filter": {"status": "new"}, "sort": RECENT_FIRST},
+    {"name": "contact_forms.by_id", "collection": "contact_forms", "filter": {"id": ""}},
+    # AdminDigestService._claim
+    {"name": "contact_forms.digest_pending", "collection": "contact_forms", "filter": {"admin_digest_pending": True}, "sort": [("created_at", ASCENDING)]},
+    # get_chat_history / send_chat_message
+    {"name": "chat_messages.history", "collection": "chat_messages", "filter": {"session_id": ""}, "sort": OLDEST_FIRST},
+    {"name": "chat_sessions.by_session_id", "collection": "chat_sessions", "filter": {"session_id": ""}},
+    # get_portfolio_items / update_portfolio_item
+    {"name": "portfolio.list", "collection": "portfolio", "filter": {}, "sort": RECENT_FIRST},
+    {"name": "portfolio.list_by_service", "collection": "portfolio", "filter": {"service_type": "seo"}, "sort": RECENT_FIRST},
+    {"name": "portfolio.list_featured", "collection": "portfolio", "filter": {"is_featured": True}, "sort": RECENT_FIRST},
+    {"name": "portfolio.list_by_service_featured", "collection": "portfolio", "filter": {"service_type": "seo", "is_featured": True}, "sort": RECENT_FIRST},
+    {"name": "portfolio.by_id", "collection": "portfolio", "filter": {"id": ""}},
+    # get_services
+    {"name": "services.list", "collection": "services", "filter": {}, "sort": [("created_at", DESCENDING)]},
+    {"name": "services.list_active", "collection": "services", "filter": {"is_active": True}, "sort": [("created_at", DESCENDING)]},
+    {"name": "services.list_by_category", "collection": "services", "filter": {"category": "seo", "is_active": True}, "sort": [("created_at", DESCENDING)]},
+    # get_bookings / create_booking
+    {"name": "bookings.list", "collection": "bookings", "filter": {}, "sort": RECENT_FIRST},
+    {"name": "bookings.list_by_user", "collection": "bookings", "filter": {"user_id": ""}, "sort": RECENT_FIRST},
+    {"name": "bookings.list_by_status", "collection": "bookings", "filter": {"status": "pending"}, "sort": RECENT_FIRST},
+    {"name": "bookings.list_by_user_status", "collection": "bookings", "filter": {"user_id": "", "status": "pending"}, "sort": RECENT_FIRST},
+    {"name": "users.by_id", "collection": "users", "filter": {"id": ""}},
+    # prompt cache near-duplicate lookup
+    {"name": "ai_prompt_cache.near_duplicates", "collection": "ai_prompt_cache", "filter": {"scope": "", "shingles": {"$in": [""]}}},
+    # get_content_batch
+    {"name": "content_generation.by_job", "collection": "content_generation", "filter": {"metadata.job_id": ""}, "sort": [("metadata.index", ASCENDING)]},
+    # EmailOutbox._claim / get_dead_letter_emails
+    {"name": "email_outbox.due", "collection": "email_outbox", "filter": {"$or": [
+        {"status": "pending", "next_attempt_at": {"$lte": datetime.utcnow()}},
+        {"status": "sending", "locked_until": {"$lte": datetime.utcnow()}},
+    ]}, "sort": [("next_attempt_at", ASCENDING)]},
+    {"name": "email_outbox.dead", "collection": "email_outbox", "filter": {"status": "dead"}, "sort": RECENT_FIRST},
+    # get_testimonials
+    {"name": "testimonials.list", "collection": "testimonials", "filter": {}, "sort": TOP_RATED_FIRST},
+    {"name": "testimonials.list_featured", "collection": "testimonials", "filter": {"is_featured": True}, "sort": TOP_RATED_FIRST},
+    {"name": "testimonials.by_id", "collection": "testimonials", "filter": {"id": ""}},
+    # get_analytics_summary
+    {"name": "analytics.by_date", "collection": "analytics", "filter": {"analytics_date": date.today().isoformat()}},
+]
+
+def _plan_stages(plan: Dict[str, Any]) -> List[str]:
+    """Flatten the stage names of an explain() plan tree"""
+    stages = []
+    if "stage" in plan:
+        stages.append(plan["stage"])
+    # Newer servers nest the classic plan under queryPlan
+    for key in ("queryPlan", "inputStage"):
+        if isinstance(plan.get(key), dict):
+            stages.extend(_plan_stages(plan[key]))
+    for child in plan.get("inputStages", []):
+        stages.extend(_plan_stages(child))
+    return stages
+
+async def explain_shape(db: AsyncIOMotorDatabase, shape: Dict[str, Any]) -> Dict[str, Any]:
+    """Explain one query shape and flag problem stages in its winning plan"""
+    cursor = db[shape["collection"]].find(shape["filter"])
+    if shape.get("sort"):
+        cursor = cursor.sort(shape["sort"])
+
+    explain = await cursor.explain()
+    stages = _plan_stages(explain["queryPlanner"]["winningPlan"])
+    return {
+        "name": shape["name"],
+        "collection": shape["collection"],
+        "stages": stages,
+        "problems": sorted(PROBLEM_STAGES.intersection(stages)),
+    }
+
+async def run_index_advisor(db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
+    """Explain every registered query shape"""
+    report = []
+    for shape in QUERY_SHAPES:
+        try:
+            report.append(await explain_shape(db, shape))
+        except Exception as e:
+            report.append({
+                "name": shape["name"],
+                "collection": shape["collection"],
+                "stages": [],
+                "problems": [],
+                "error": str(e),
+            })
+    return report
+
+async def log_index_report(db: AsyncIOMotorDatabase) -> List[Dict[str, Any]]:
+    """Run the advisor and log a warning for every problematic query shape"""
+    report = await run_index_advisor(db)
+    problems = [entry for entry in report if entry["problems"]]
+    for entry in problems:
+        logger.warning(
+            f"Index advisor: {entry['name']} uses {', '.join(entry['problems'])} "
+            f"(plan: {' <- '.join(entry['stages'])})"
+        )
+    if not problems:
+        logger.info(f"Index advisor: all {len(report)} query shapes are served by indexes")
+    return report
+
+async def main(create: bool) -> int:
+    await connect_to_db()
+    try:
+        if create:
+            await create_indexes()
+        report = await run_index_advisor(get_database())
+    finally:
+        await close_db_connection()
+
+    width = max(len(entry["name"]) for entry in report)
+    for entry in report:
+        if entry.get("error"):
+            status = f"ERROR {entry['error']}"
+        elif entry["problems"]:
+            status = f"{'+'.join(entry['problems'])}  {' <- '.join(entry['stages'])}"
+        else:
+            status = f"ok  {' <- '.join(entry['stages'])}"
+        print(f"{entry['name']:<{width}}  {status}")
+
+    return 1 if any(entry["problems"] or entry.get("error") for entry in report) else 0
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Report query shapes that need a COLLSCAN or in-memory SORT")
+    parser.add_argument("--create-indexes", action="store_true", help="create INDEX_SPECS before explaining")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main(args.create_indexes)))
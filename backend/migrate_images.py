@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Move inline Base64 images into the image store
+
+Rewrites portfolio.images and testimonials.image entries that still hold
+Base64 data (or data: URIs) to content-addressed image ids. Entries that
+are already ids are left alone, so the script can be re-run safely.
+
+    python migrate_images.py [--dry-run]
+"""
+
+from database import connect_to_db, close_db_connection, get_database
+from services.image_store import image_store, is_image_id, ImageValidationError
+import argparse
+import asyncio
+import logging
+
+logger = logging.getLogger(__name__)
+
+async def migrate_collection(collection: str, field: str, is_list: bool, dry_run: bool) -> int:
+    """Migrate one image field and return the number of documents rewritten"""
+    db = get_database()
+    migrated = 0
+
+    async for document in db[collection].find({field: {"$exists": True, "$ne": None}}, {"id": 1, field: 1}):
+        values = document[field] if is_list else [document[field]]
+        if all(is_image_id(value) for value in values):
+            continue
+
+        migrated += 1
+        if dry_run:
+            continue
+
+        try:
+            image_ids = [await image_store.ingest(value) for value in values]
+        except ImageValidationError as e:
+            logger.error(f"Skipping {collection} {document.get('id')}: {e}")
+            migrated -= 1
+            continue
+
+        await db[collection].update_one(
+            {"_id": document["_id"]},
+            {"$set": {field: image_ids if is_list else image_ids[0]}}
+        )
+
+    return migrated
+
+async def main(dry_run: bool):
+    await connect_to_db()
+    try:
+        portfolio = await migrate_collection("portfolio", "images", True, dry_run)
+        testimonials = await migrate_collection("testimonials", "image", False, dry_run)
+    finally:
+        await close_db_connection()
+
+    action = "Would migrate" if dry_run else "Migrated"
+    print(f"{action} {portfolio} portfolio items and {testimonials} testimonials")
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Move inline Base64 images into the image store")
+    parser.add_argument("--dry-run", action="store_true", help="report what would change without writing")
+    args = parser.parse_args()
+    asyncio.run(main(args.dry_run))
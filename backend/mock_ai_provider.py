@@ -0,0 +1,103 @@
+#!/usr/bin/env python3
+"""
+Local stand-in for an OpenAI-compatible chat completions API
+
+Answers /v1/chat/completions (plain and streaming) after a configurable
+latency and returns 429 with Retry-After once more than --max-concurrency
+requests are in flight, so the provider client's pooling, rate limiting
+and retries can be exercised without network access or API spend.
+
+    python mock_ai_provider.py [--port 8100] [--latency 0.5] [--max-concurrency 4]
+
+then start the API with
+AI_API_BASE_URL=http://localhost:8100/v1 OPENAI_API_KEY=mock
+"""
+
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse
+from starlette.responses import StreamingResponse
+import argparse
+import asyncio
+import json
+import time
+import uuid
+import uvicorn
+
+app = FastAPI(title="Mock AI Provider")
+options = argparse.Namespace(latency=0.5, token_delay=0.02, max_concurrency=4, retry_after=1)
+state = {"in_flight": 0, "requests": 0, "throttled": 0, "connections": set()}
+
+def completion_text(messages) -> str:
+    prompt = messages[-1]["content"] if messages else ""
+    return f"Mock completion for: {prompt}"
+
+@app.post("/v1/chat/completions")
+async def chat_completions(request: Request):
+    state["requests"] += 1
+    state["connections"].add((request.client.host, request.client.port))
+    if state["in_flight"] >= options.max_concurrency:
+        state["throttled"] += 1
+        return JSONResponse(
+            status_code=429,
+            content={"error": {"message": "Rate limit exceeded", "type": "rate_limit_error"}},
+            headers={"Retry-After": str(options.retry_after)}
+        )
+
+    body = await request.json()
+    text = completion_text(body.get("messages", []))
+    completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+
+    state["in_flight"] += 1
+    try:
+        await asyncio.sleep(options.latency)
+    except BaseException:
+        state["in_flight"] -= 1
+        raise
+
+    if not body.get("stream"):
+        state["in_flight"] -= 1
+        return {
+            "id": completion_id,
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": body.get("model"),
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+        }
+
+    async def events():
+        try:
+            for word in text.split(" "):
+                chunk = {
+                    "id": completion_id,
+                    "object": "chat.completion.chunk",
+                    "choices": [{"index": 0, "delta": {"content": word + " "}, "finish_reason": None}],
+                }
+                yield f"data: {json.dumps(chunk)}\n\n"
+                await asyncio.sleep(options.token_delay)
+            yield "data: [DONE]\n\n"
+        finally:
+            state["in_flight"] -= 1
+
+    return StreamingResponse(events(), media_type="text/event-stream")
+
+@app.get("/stats")
+async def stats():
+    """Request, throttling and client connection counts"""
+    return {
+        "requests": state["requests"],
+        "throttled": state["throttled"],
+        "in_flight": state["in_flight"],
+        "client_connections": len(state["connections"]),
+    }
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Mock OpenAI-compatible chat completions server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8100)
+    parser.add_argument("--latency", type=float, default=options.latency, help="seconds before the first token")
+    parser.add_argument("--token-delay", type=float, default=options.token_delay, help="seconds between streamed tokens")
+    parser.add_argument("--max-concurrency", type=int, default=options.max_concurrency, help="in-flight requests before answering 429")
+    parser.add_argument("--retry-after", type=int, default=options.retry_after, help="Retry-After seconds sent with 429s")
+    args = parser.parse_args()
+    vars(options).update({name: value for name, value in vars(args).items() if name in vars(options)})
+    uvicorn.run(app, host=args.host, port=args.port)
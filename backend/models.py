@@ -43,6 +43,25 @@ class UserRole(str, Enum):
     CLIENT = "client"
     STAFF = "staff"
 
+class AnalyticsEventType(str, Enum):
+    PAGE_VIEW = "page_views"
+    CONTACT_FORM = "contact_forms"
+    BOOKING = "bookings"
+    CHAT_SESSION = "chat_sessions"
+    PORTFOLIO_ITEM = "portfolio_items"
+
+class ContentJobStatus(str, Enum):
+    QUEUED = "queued"
+    RUNNING = "running"
+    COMPLETED = "completed"
+    FAILED = "failed"
+
+class EmailStatus(str, Enum):
+    PENDING = "pending"
+    SENDING = "sending"
+    SENT = "sent"
+    DEAD = "dead"
+
 # Base Models
 class BaseDocument(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -112,11 +131,26 @@ class Portfolio(BaseDocument):
     service_type: ServiceType
     project_duration: str
     results: List[str]
-    images: List[str]  # Base64 encoded images
+    images: List[str]  # Image ids (content hashes) served from /api/images/{id}
     technologies: List[str]
     testimonial: Optional[str] = None
     is_featured: bool = False
 
+class PortfolioSummary(BaseModel):
+    """Portfolio list item without the heavy image payloads"""
+    id: str
+    title: str
+    description: str
+    client_name: str
+    service_type: ServiceType
+    project_duration: str
+    results: List[str]
+    technologies: List[str]
+    testimonial: Optional[str] = None
+    is_featured: bool = False
+    created_at: datetime
+    updated_at: datetime
+
 class PortfolioCreate(BaseModel):
     title: str
     description: str
@@ -202,6 +236,18 @@ class ContentGenerationCreate(BaseModel):
     prompt: str
     user_id: Optional[str] = None
 
+class ContentBatchCreate(BaseModel):
+    items: List[ContentGenerationCreate] = Field(..., min_length=1)
+    user_id: Optional[str] = None
+
+class ContentJob(BaseDocument):
+    user_id: Optional[str] = None
+    status: ContentJobStatus = ContentJobStatus.QUEUED
+    total: int
+    completed: int = 0
+    failed: int = 0
+    errors: List[Dict[str, Any]] = []  # {"index": ..., "error": ...} per failed item
+
 # Service Models (for dynamic service management)
 class Service(BaseDocument):
     title: str
@@ -236,9 +282,21 @@ class Testimonial(BaseDocument):
     position: Optional[str] = None
     text: str
     rating: int = Field(ge=1, le=5)
-    image: Optional[str] = None  # Base64 encoded image
+    image: Optional[str] = None  # Image id (content hash) served from /api/images/{id}
     is_featured: bool = False
 
+class TestimonialSummary(BaseModel):
+    """Testimonial list item without the image payload"""
+    id: str
+    name: str
+    company: str
+    position: Optional[str] = None
+    text: str
+    rating: int
+    is_featured: bool = False
+    created_at: datetime
+    updated_at: datetime
+
 class TestimonialCreate(BaseModel):
     name: str
     company: str
@@ -266,6 +324,25 @@ class Analytics(BaseDocument):
     chat_sessions: int = 0
     analytics_date: str = Field(default_factory=lambda: date.today().isoformat())
 
+class AnalyticsSummary(BaseModel):
+    contacts: int = 0
+    bookings: int = 0
+    chat_sessions: int = 0
+    portfolio_items: int = 0
+    reconciled_at: Optional[datetime] = None
+
+class AnalyticsEvent(BaseModel):
+    type: AnalyticsEventType
+    amount: int = 1
+    analytics_date: str = Field(default_factory=lambda: date.today().isoformat())
+    created_at: Optional[datetime] = None  # of the document the event counts, if any
+
+# Image Models
+class ImageRef(BaseModel):
+    id: str  # SHA-256 of the image bytes
+    content_type: str
+    size: int
+
 # Email Templates
 class EmailTemplate(BaseDocument):
     name: str
@@ -274,6 +351,25 @@ class EmailTemplate(BaseDocument):
     template_type: str  # contact_confirmation, booking_confirmation, etc.
     variables: List[str] = []  # Available variables for the template
 
+class EmailTemplateUpdate(BaseModel):
+    subject: str
+    body: str  # Jinja2 HTML, auto-escaped
+    template_type: str
+    variables: List[str] = []
+
+class OutboundEmail(BaseDocument):
+    to_email: str
+    subject: str
+    content: str
+    content_type: str = "text/html"
+    status: EmailStatus = EmailStatus.PENDING
+    attempts: int = 0
+    next_attempt_at: datetime = Field(default_factory=datetime.utcnow)
+    claimed_by: Optional[str] = None
+    locked_until: Optional[datetime] = None
+    last_error: Optional[str] = None
+    sent_at: Optional[datetime] = None
+
 # Response Models
 class StandardResponse(BaseModel):
     success: bool
@@ -282,8 +378,9 @@ class StandardResponse(BaseModel):
 
 class PaginatedResponse(BaseModel):
     items: List[Any]
-    total: int
-    page: int
+    total: Optional[int] = None
+    page: Optional[int] = None
     per_page: int
     has_next: bool
-    has_prev: bool
\ No newline at end of file
+    has_prev: bool
+    next_cursor: Optional[str] = None  # Opaque keyset cursor for the next page
\ No newline at end of file
@@ -0,0 +1,140 @@
+from motor.motor_asyncio import AsyncIOMotorCollection
+from pymongo import ASCENDING, DESCENDING
+from pydantic import BaseModel
+from models import PaginatedResponse
+from datetime import datetime
+from typing import List, Optional, Dict, Any, Tuple, Callable, Type
+import base64
+import json
+
+# Sort keys for keyset pagination, e.g. [("created_at", DESCENDING), ("id", DESCENDING)].
+# The last key must be unique so that every document has a distinct position.
+SortKeys = List[Tuple[str, int]]
+
+RECENT_FIRST: SortKeys = [("created_at", DESCENDING), ("id", DESCENDING)]
+OLDEST_FIRST: SortKeys = [("created_at", ASCENDING), ("id", ASCENDING)]
+TOP_RATED_FIRST: SortKeys = [("rating", DESCENDING), ("id", DESCENDING)]
+
+class InvalidCursorError(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+
+class InvalidFieldsError(ValueError):
+    """Raised when a sparse fieldset names unknown fields"""
+
+def model_projection(model: Type[BaseModel]) -> Dict[str, int]:
+    """Projection fetching only the fields declared on ``model``"""
+    projection = {field: 1 for field in model.model_fields}
+    projection["_id"] = 0
+    return projection
+
+def parse_fields(fields: Optional[str], model: Type[BaseModel]) -> Optional[List[str]]:
+    """Parse a ``fields=a,b,c`` sparse fieldset, validated against ``model``"""
+    if not fields:
+        return None
+
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in model.model_fields]
+    if unknown:
+        raise InvalidFieldsError(f"Unknown fields: {', '.join(unknown)}")
+
+    # The id is always returned so items stay addressable
+    return ["id"] + [field for field in requested if field != "id"]
+
+def sparse_projection(fields: List[str]) -> Dict[str, int]:
+    """Projection for a parsed sparse fieldset"""
+    projection = {field: 1 for field in fields}
+    projection["_id"] = 0
+    return projection
+
+def _encode_value(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return {"$date": value.isoformat()}
+    return value
+
+def _decode_value(value: Any) -> Any:
+    if isinstance(value, dict) and "$date" in value:
+        return datetime.fromisoformat(value["$date"])
+    return value
+
+def encode_cursor(document: Dict[str, Any], sort: SortKeys) -> str:
+    """Build an opaque cursor pointing just after ``document``"""
+    values = [_encode_value(document.get(field)) for field, _ in sort]
+    raw = json.dumps(values, separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+def decode_cursor(cursor: str, sort: SortKeys) -> List[Any]:
+    """Decode a cursor produced by ``encode_cursor`` for the same sort keys"""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        values = json.loads(raw)
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Invalid pagination cursor") from e
+
+    if not isinstance(values, list) or len(values) != len(sort):
+        raise InvalidCursorError("Invalid pagination cursor")
+    try:
+        return [_decode_value(value) for value in values]
+    except (ValueError, TypeError) as e:
+        raise InvalidCursorError("Invalid pagination cursor") from e
+
+def keyset_filter(sort: SortKeys, values: List[Any]) -> Dict[str, Any]:
+    """Filter matching documents strictly after ``values`` in ``sort`` order"""
+    clauses = []
+    for i, (field, direction) in enumerate(sort):
+        clause = {prev_field: values[j] for j, (prev_field, _) in enumerate(sort[:i])}
+        clause[field] = {"$gt" if direction == ASCENDING else "$lt": values[i]}
+        clauses.append(clause)
+    return {"$or": clauses}
+
+def list_projection(
+    fields: Optional[str],
+    model: Type[BaseModel],
+    summary_model: Type[BaseModel]
+) -> Tuple[Dict[str, int], Callable[[Dict[str, Any]], Any]]:
+    """Projection and item factory for a list endpoint.
+
+    Without ``fields`` items are returned as the lean ``summary_model``;
+    with it, only the requested fields of ``model`` are fetched and returned.
+    """
+    selected = parse_fields(fields, model)
+    if selected:
+        return sparse_projection(selected), lambda doc: {field: doc.get(field) for field in selected}
+    return model_projection(summary_model), lambda doc: summary_model(**doc)
+
+async def paginate(
+    collection: AsyncIOMotorCollection,
+    query: Dict[str, Any],
+    sort: SortKeys,
+    limit: int,
+    cursor: Optional[str] = None,
+    item_factory: Optional[Callable[[Dict[str, Any]], Any]] = None,
+    projection: Optional[Dict[str, int]] = None
+) -> PaginatedResponse:
+    """Fetch one page using keyset (cursor) pagination.
+
+    Instead of skipping over earlier documents, the cursor's sort-key values
+    are turned into a range filter, so with a matching compound index every
+    page costs the same as the first one. The sort keys are always fetched
+    (they are needed for the next cursor) even if ``projection`` leaves them out.
+    """
+    find_query = query
+    if cursor:
+        after = keyset_filter(sort, decode_cursor(cursor, sort))
+        find_query = {"$and": [query, after]} if query else after
+
+    if projection:
+        projection = {**projection, **{field: 1 for field, _ in sort}}
+
+    # Fetch one extra document to know whether there is a next page
+    documents = await collection.find(find_query, projection).sort(sort).limit(limit + 1).to_list(length=limit + 1)
+    has_next = len(documents) > limit
+    documents = documents[:limit]
+    next_cursor = encode_cursor(documents[-1], sort) if has_next else None
+
+    return PaginatedResponse(
+        items=[item_factory(doc) for doc in documents] if item_factory else documents,
+        per_page=limit,
+        has_next=has_next,
+        has_prev=cursor is not None,
+        next_cursor=next_cursor
+    )
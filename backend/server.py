@@ -1,24 +1,44 @@
-from fastapi import FastAPI, APIRouter, HTTPException, Depends, BackgroundTasks, Query
+from fastapi import FastAPI, APIRouter, HTTPException, Depends, Query, UploadFile, File
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
-from starlette.middleware.base import BaseHTTPMiddleware
 from starlette.requests import Request
-from starlette.responses import Response
+from starlette.responses import Response, StreamingResponse, JSONResponse
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
 from datetime import datetime, date
-from typing import List, Optional, Dict, Any
+from typing import List, Optional, Dict, Any, AsyncIterator, Awaitable, Callable
+from contextlib import asynccontextmanager
 import logging
 from pathlib import Path
 import os
 import json
 import asyncio
+import time
 import uuid
+import jwt
 
 # Import our modules
 from config import settings
-from database import connect_to_db, close_db_connection, get_database
+from database import connect_with_retry, close_db_connection, get_database, is_database_ready, ping_database, pool_metrics, QueryPlan
 from models import *
+from http_utils import parse_byte_range, etag_matches, sse_event, SSE_HEADERS, RangeNotSatisfiableError
+from singleflight import SingleFlight
+from pagination import paginate, list_projection, InvalidCursorError, InvalidFieldsError, RECENT_FIRST, OLDEST_FIRST, TOP_RATED_FIRST
 from services.email_service import email_service
+from services.email_transport import email_transport
+from services.email_outbox import email_outbox
+from services.email_templates import email_templates
+from services.admin_digest import admin_digest
+from jinja2 import TemplateSyntaxError
 from services.ai_service import ai_service
+from services.ai_provider import ai_provider
+from services.chat_context import chat_context
+from services.content_jobs import content_job_service, ContentJobQueueFullError
+from services.analytics_service import analytics_service
+from services.image_store import image_store, iter_handle_range, ImageValidationError
+from services.image_derivatives import image_derivative_service
+from services.response_cache import response_cache
+from services.cache_backend import cache
+from services.prompt_cache import prompt_cache
 
 # Configure logging
 logging.basicConfig(
@@ -27,74 +47,168 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Connect to MongoDB in the background, start workers once it is ready, shut everything down on exit"""
+    async def start():
+        await connect_with_retry()
+        await start_background_services()
+        logger.info("NOWHERE Digital API started successfully")
+
+    # Requests are answered with 503 until the database is ready
+    startup = asyncio.create_task(start())
+    yield
+    startup.cancel()
+    await asyncio.gather(startup, return_exceptions=True)
+    await stop_background_services()
+    await close_db_connection()
+    logger.info("NOWHERE Digital API shutdown")
+
 # Create FastAPI app
 app = FastAPI(
     title="NOWHERE Digital API",
     description="Comprehensive digital marketing agency platform API",
     version="1.0.0",
-    debug=settings.debug
+    debug=settings.debug,
+    lifespan=lifespan
 )
 
 # Security
 security = HTTPBearer()
 
+# Placeholder secrets anyone could sign tokens with
+INSECURE_JWT_SECRETS = {"", "your-secret-key-change-in-production"}
+
+async def require_admin(credentials: HTTPAuthorizationCredentials = Depends(security)) -> Dict[str, Any]:
+    """Allow only bearer tokens signed with ``jwt_secret`` that carry ``"role": "admin"``"""
+    if settings.jwt_secret in INSECURE_JWT_SECRETS:
+        raise HTTPException(status_code=503, detail="Admin API is disabled until JWT_SECRET is configured")
+    try:
+        claims = jwt.decode(credentials.credentials, settings.jwt_secret, algorithms=[settings.jwt_algorithm])
+    except jwt.PyJWTError:
+        raise HTTPException(status_code=401, detail="Invalid token", headers={"WWW-Authenticate": "Bearer"})
+    if claims.get("role") != "admin":
+        raise HTTPException(status_code=403, detail="Admin access required")
+    return claims
+
 # Create API router
 api_router = APIRouter(prefix=settings.api_prefix)
 
-# CORS middleware
-app.add_middleware(
-    CORSMiddleware,
-    allow_origins=settings.cors_origins,
-    allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
-)
+# Coalesces identical concurrent reads that are not served from the response cache
+read_flight = SingleFlight()
 
 # Analytics middleware
-class AnalyticsMiddleware(BaseHTTPMiddleware):
-    async def dispatch(self, request: Request, call_next):
-        start_time = datetime.utcnow()
+class AnalyticsMiddleware:
+    """Pure ASGI middleware for request timing, logging and page-view tracking.
+
+    Unlike ``BaseHTTPMiddleware`` this does not wrap the response in an extra
+    task and memory stream, so streaming bodies pass straight through.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        start_time = time.perf_counter()
+        status_code = 500
         
         # Track page views
-        if request.method == "GET":
-            await self.track_page_view()
+        if scope["method"] == "GET":
+            self.track_page_view()
         
-        response = await call_next(request)
+        async def send_wrapper(message: Message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
         
-        # Log API calls
-        process_time = (datetime.utcnow() - start_time).total_seconds()
-        logger.info(f"{request.method} {request.url.path} - {response.status_code} - {process_time:.3f}s")
-        
-        return response
-    
-    async def track_page_view(self):
         try:
-            db = get_database()
-            today = date.today().isoformat()  # Convert to string
-            
-            # Update or create today's analytics
-            await db.analytics.update_one(
-                {"analytics_date": today},
-                {"$inc": {"page_views": 1}},
-                upsert=True
-            )
-        except Exception as e:
-            logger.error(f"Error tracking page view: {e}")
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Log API calls
+            process_time = time.perf_counter() - start_time
+            logger.info(f"{scope['method']} {scope['path']} - {status_code} - {process_time:.3f}s")
+    
+    def track_page_view(self):
+        # Queued on the analytics event bus and written in bulk by its worker
+        analytics_service.emit(AnalyticsEventType.PAGE_VIEW)
 
 app.add_middleware(AnalyticsMiddleware)
 
+# Readiness gate
+class ReadinessMiddleware:
+    """Answers API requests with 503 until the database is connected and warmed up.
+
+    Health, readiness and pool metrics stay reachable so probes can tell a
+    starting instance from a broken one.
+    """
+
+    ALWAYS_OPEN = {"/health", "/ready", "/metrics/db"}
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+        self.open_paths = {settings.api_prefix + path for path in self.ALWAYS_OPEN}
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if (
+            scope["type"] != "http"
+            or is_database_ready()
+            or not scope["path"].startswith(settings.api_prefix)
+            or scope["path"] in self.open_paths
+        ):
+            await self.app(scope, receive, send)
+            return
+
+        response = JSONResponse(
+            status_code=503,
+            content={"detail": "Service is starting, database not ready"},
+            headers={"Retry-After": "5"}
+        )
+        await response(scope, receive, send)
+
+app.add_middleware(ReadinessMiddleware)
+
+# CORS middleware, added last so it is outermost and also answers preflights
+# and decorates the readiness gate's 503s
+app.add_middleware(
+    CORSMiddleware,
+    allow_origins=settings.cors_origins,
+    allow_credentials=True,
+    allow_methods=["*"],
+    allow_headers=["*"],
+)
+
 # Health check endpoint
 @api_router.get("/health")
 async def health_check():
     """Health check endpoint"""
     return {"status": "healthy", "timestamp": datetime.utcnow(), "service": "nowhere-digital-api"}
 
+@api_router.get("/ready")
+async def readiness_check():
+    """Readiness probe: 200 once the database is connected and answering"""
+    if not is_database_ready():
+        return JSONResponse(status_code=503, content={"status": "starting"})
+    if not await ping_database():
+        return JSONResponse(status_code=503, content={"status": "unavailable"})
+    return {"status": "ready", "timestamp": datetime.utcnow()}
+
+@api_router.get("/metrics/db")
+async def get_database_metrics():
+    """Get MongoDB connection pool utilization"""
+    return StandardResponse(
+        success=True,
+        message="Database metrics retrieved successfully",
+        data={"ready": is_database_ready(), "pool": pool_metrics.snapshot()}
+    )
+
 # Contact Form Endpoints
 @api_router.post("/contact", response_model=StandardResponse)
-async def create_contact_form(
-    contact_data: ContactFormCreate,
-    background_tasks: BackgroundTasks
-):
+async def create_contact_form(contact_data: ContactFormCreate):
     """Submit contact form"""
     try:
         db = get_database()
@@ -102,25 +216,18 @@ async def create_contact_form(
         # Create contact form entry
         contact_form = ContactForm(**contact_data.dict())
         
-        # Save to database
-        await db.contact_forms.insert_one(contact_form.dict())
+        # Save to database; non-urgent submissions wait for the admin digest
+        contact = contact_form.dict()
+        urgent = admin_digest.send_immediately(contact)
+        await db.contact_forms.insert_one({**contact, "admin_digest_pending": not urgent})
         
-        # Send emails in background
-        background_tasks.add_task(
-            email_service.send_contact_form_notification, 
-            contact_form.dict()
-        )
-        background_tasks.add_task(
-            email_service.send_contact_confirmation, 
-            contact_form.dict()
-        )
+        # Track analytics right after the insert, before any other await
+        analytics_service.emit(AnalyticsEventType.CONTACT_FORM, created_at=contact_form.created_at)
         
-        # Track analytics
-        await db.analytics.update_one(
-            {"analytics_date": date.today().isoformat()},
-            {"$inc": {"contact_forms": 1}},
-            upsert=True
-        )
+        # Queue emails in the outbox
+        if urgent:
+            await admin_digest.notify(contact)
+        await email_service.send_contact_confirmation(contact)
         
         return StandardResponse(
             success=True,
@@ -132,10 +239,10 @@ async def create_contact_form(
         logger.error(f"Error creating contact form: {e}")
         raise HTTPException(status_code=500, detail="Failed to submit contact form")
 
-@api_router.get("/contact", response_model=List[ContactForm])
+@api_router.get("/contact", response_model=PaginatedResponse)
 async def get_contact_forms(
     status: Optional[ContactStatus] = None,
-    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     limit: int = Query(50, ge=1, le=100)
 ):
     """Get contact forms (admin only)"""
@@ -148,11 +255,13 @@ async def get_contact_forms(
             query["status"] = status
         
         # Get contact forms
-        cursor = db.contact_forms.find(query).skip(skip).limit(limit).sort("created_at", -1)
-        contact_forms = await cursor.to_list(length=limit)
-        
-        return [ContactForm(**form) for form in contact_forms]
+        return await paginate(
+            db.contact_forms, query, RECENT_FIRST, limit, cursor,
+            lambda form: ContactForm(**form)
+        )
         
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting contact forms: {e}")
         raise HTTPException(status_code=500, detail="Failed to get contact forms")
@@ -208,11 +317,7 @@ async def create_chat_session(
         await db.chat_sessions.insert_one(session.dict())
         
         # Track analytics
-        await db.analytics.update_one(
-            {"analytics_date": date.today().isoformat()},
-            {"$inc": {"chat_sessions": 1}},
-            upsert=True
-        )
+        analytics_service.emit(AnalyticsEventType.CHAT_SESSION, created_at=session.created_at)
         
         return StandardResponse(
             success=True,
@@ -224,36 +329,61 @@ async def create_chat_session(
         logger.error(f"Error creating chat session: {e}")
         raise HTTPException(status_code=500, detail="Failed to create chat session")
 
+async def save_chat_message(message_data: ChatMessageCreate, ai_response: str) -> ChatMessage:
+    """Persist a chat exchange and count it on its session"""
+    db = get_database()
+    
+    # Create chat message
+    chat_message = ChatMessage(
+        session_id=message_data.session_id,
+        user_id=message_data.user_id,
+        message=message_data.message,
+        response=ai_response
+    )
+    
+    # Save to database
+    await db.chat_messages.insert_one(chat_message.dict())
+    
+    # Update session
+    await db.chat_sessions.update_one(
+        {"session_id": message_data.session_id},
+        {"$inc": {"total_messages": 1}}
+    )
+    return chat_message
+
+def event_stream(chunks: AsyncIterator[str], on_complete: Callable[[str], Awaitable[Dict[str, Any]]]) -> StreamingResponse:
+    """Stream text chunks as SSE ``token`` events, then a ``done`` event.
+    
+    ``on_complete`` receives the full text once the stream finishes and
+    returns the payload of the ``done`` event. If the client disconnects
+    first, nothing is persisted.
+    """
+    async def events():
+        parts = []
+        try:
+            async for chunk in chunks:
+                parts.append(chunk)
+                yield sse_event("token", {"text": chunk})
+            yield sse_event("done", await on_complete("".join(parts)))
+        except Exception as e:
+            logger.error(f"Error streaming response: {e}")
+            yield sse_event("error", {"detail": "Failed to generate response"})
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 @api_router.post("/chat/message", response_model=StandardResponse)
 async def send_chat_message(
     message_data: ChatMessageCreate
 ):
     """Send a message to AI chat"""
     try:
-        db = get_database()
-        
         # Get AI response
         ai_response = await ai_service.send_chat_message(
             message_data.session_id,
             message_data.message
         )
         
-        # Create chat message
-        chat_message = ChatMessage(
-            session_id=message_data.session_id,
-            user_id=message_data.user_id,
-            message=message_data.message,
-            response=ai_response
-        )
-        
-        # Save to database
-        await db.chat_messages.insert_one(chat_message.dict())
-        
-        # Update session
-        await db.chat_sessions.update_one(
-            {"session_id": message_data.session_id},
-            {"$inc": {"total_messages": 1}}
-        )
+        await save_chat_message(message_data, ai_response)
         
         return StandardResponse(
             success=True,
@@ -265,10 +395,24 @@ async def send_chat_message(
         logger.error(f"Error sending chat message: {e}")
         raise HTTPException(status_code=500, detail="Failed to send message")
 
-@api_router.get("/chat/history/{session_id}")
+@api_router.post("/chat/message/stream")
+async def stream_chat_message(
+    message_data: ChatMessageCreate
+):
+    """Send a message to AI chat and stream the response as Server-Sent Events"""
+    async def on_complete(ai_response: str) -> Dict[str, Any]:
+        chat_message = await save_chat_message(message_data, ai_response)
+        return {"id": chat_message.id, "response": ai_response}
+    
+    return event_stream(
+        ai_service.stream_chat_message(message_data.session_id, message_data.message),
+        on_complete
+    )
+
+@api_router.get("/chat/history/{session_id}", response_model=PaginatedResponse)
 async def get_chat_history(
     session_id: str,
-    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     limit: int = Query(50, ge=1, le=100)
 ):
     """Get chat history for a session"""
@@ -276,39 +420,39 @@ async def get_chat_history(
         db = get_database()
         
         # Get chat messages
-        cursor = db.chat_messages.find(
-            {"session_id": session_id}
-        ).skip(skip).limit(limit).sort("created_at", 1)
-        
-        messages = await cursor.to_list(length=limit)
-        
-        return [ChatMessage(**msg) for msg in messages]
+        return await paginate(
+            db.chat_messages, {"session_id": session_id}, OLDEST_FIRST, limit, cursor,
+            lambda msg: ChatMessage(**msg)
+        )
         
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting chat history: {e}")
         raise HTTPException(status_code=500, detail="Failed to get chat history")
 
 # Content Generation Endpoints
+async def save_generated_content(content_request: ContentGenerationCreate, generated_content: str) -> ContentGeneration:
+    """Store a content generation record"""
+    db = get_database()
+    content_record = ContentGeneration(**content_request.dict(), generated_content=generated_content)
+    await db.content_generation.insert_one(content_record.dict())
+    return content_record
+
 @api_router.post("/content/generate", response_model=StandardResponse)
 async def generate_content(
-    content_request: ContentGenerationCreate,
-    background_tasks: BackgroundTasks
+    content_request: ContentGenerationCreate
 ):
     """Generate content using AI"""
     try:
-        db = get_database()
-        
         # Generate content
         generated_content = await ai_service.generate_content(
             content_request.content_type,
-            content_request.description,
-            content_request.tone,
-            content_request.target_audience
+            content_request.prompt
         )
         
         # Store content generation record
-        content_record = ContentGeneration(**content_request.dict(), content=generated_content)
-        await db.content_generation.insert_one(content_record.dict())
+        content_record = await save_generated_content(content_request, generated_content)
         
         return StandardResponse(
             success=True,
@@ -320,6 +464,96 @@ async def generate_content(
         logger.error(f"Error generating content: {e}")
         raise HTTPException(status_code=500, detail="Failed to generate content")
 
+@api_router.post("/content/generate/stream")
+async def stream_content(
+    content_request: ContentGenerationCreate
+):
+    """Generate content using AI and stream it as Server-Sent Events"""
+    async def on_complete(generated_content: str) -> Dict[str, Any]:
+        content_record = await save_generated_content(content_request, generated_content)
+        return {"id": content_record.id, "content": generated_content}
+    
+    return event_stream(
+        ai_service.stream_content(content_request.content_type, content_request.prompt),
+        on_complete
+    )
+
+@api_router.post("/content/generate/batch", response_model=StandardResponse)
+async def generate_content_batch(
+    batch: ContentBatchCreate
+):
+    """Queue a batch of content generation requests"""
+    try:
+        if len(batch.items) > settings.content_batch_max_items:
+            raise HTTPException(
+                status_code=400,
+                detail=f"A batch can contain at most {settings.content_batch_max_items} items"
+            )
+        
+        job = await content_job_service.submit(batch.items, batch.user_id)
+        
+        return StandardResponse(
+            success=True,
+            message="Content batch queued successfully",
+            data={"job_id": job.id, "status": job.status, "total": job.total}
+        )
+        
+    except HTTPException:
+        raise
+    except ContentJobQueueFullError as e:
+        raise HTTPException(status_code=503, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error queueing content batch: {e}")
+        raise HTTPException(status_code=500, detail="Failed to queue content batch")
+
+@api_router.get("/content/generate/batch/{job_id}", response_model=StandardResponse)
+async def get_content_batch(
+    job_id: str
+):
+    """Get a content batch job's progress and finished results"""
+    try:
+        db = get_database()
+        
+        live = content_job_service.get_live(job_id)
+        if live:
+            job = live.job
+        else:
+            stored = await db.content_jobs.find_one({"id": job_id})
+            if not stored:
+                raise HTTPException(status_code=404, detail="Content job not found")
+            job = ContentJob(**stored)
+        
+        results = await db.content_generation.find(
+            {"metadata.job_id": job_id}
+        ).sort("metadata.index", 1).to_list(job.total)
+        
+        return StandardResponse(
+            success=True,
+            message="Content job retrieved successfully",
+            data={"job": job, "results": [ContentGeneration(**result) for result in results]}
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting content job: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get content job")
+
+@api_router.get("/content/generate/batch/{job_id}/stream")
+async def stream_content_batch(
+    job_id: str
+):
+    """Stream a content batch job's results as Server-Sent Events"""
+    live = content_job_service.get_live(job_id)
+    if not live:
+        raise HTTPException(status_code=404, detail="Content job is not running on this server; poll it instead")
+    
+    async def events():
+        async for event, data in content_job_service.stream(live):
+            yield sse_event(event, data)
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers=SSE_HEADERS)
+
 # AI Problem Analysis Endpoint
 @api_router.post("/ai/analyze-problem", response_model=StandardResponse)
 async def analyze_business_problem(
@@ -331,15 +565,6 @@ async def analyze_business_problem(
         industry = problem_data.get("industry", "general")
         budget_range = problem_data.get("budget_range", "")
         
-        # Generate comprehensive analysis using multiple AI capabilities
-        recommendations = await ai_service.generate_service_recommendations(
-            f"Industry: {industry}, Problem: {problem_description}, Budget: {budget_range}"
-        )
-        
-        # Get market trends for the industry
-        market_analysis = await ai_service.analyze_market_trends(industry)
-        
-        # Generate strategy proposal
         business_info = {
             "business_name": "Client Business",
             "industry": industry,
@@ -348,30 +573,144 @@ async def analyze_business_problem(
             "goals": "Solve the described problem",
             "budget": budget_range
         }
-        strategy_proposal = await ai_service.generate_strategy_proposal(business_info)
         
+        # The three analyses are independent: run them concurrently and
+        # return whatever finished within the per-call timeout
+        results, timed_out, failed = await ai_service.gather_with_timeouts({
+            "ai_analysis": ai_service.generate_service_recommendations(
+                f"Industry: {industry}, Problem: {problem_description}, Budget: {budget_range}",
+                raise_errors=True
+            ),
+            "market_insights": ai_service.analyze_market_trends(industry, raise_errors=True),
+            "strategy_proposal": ai_service.generate_strategy_proposal(business_info, raise_errors=True),
+        }, settings.ai_call_timeout)
+        
+        if len(timed_out) + len(failed) == len(results):
+            if timed_out:
+                raise HTTPException(status_code=504, detail="AI analysis timed out")
+            raise HTTPException(status_code=502, detail="AI analysis failed")
+        
+        partial = bool(timed_out or failed)
         return StandardResponse(
             success=True,
-            message="Problem analysis completed successfully",
+            message="Problem analysis partially completed" if partial else "Problem analysis completed successfully",
             data={
                 "analysis": {
                     "problem_description": problem_description,
                     "industry": industry,
-                    "ai_analysis": recommendations,
-                    "market_insights": market_analysis,
-                    "strategy_proposal": strategy_proposal,
+                    **results,
                     "estimated_roi": "200-400%",
                     "implementation_time": "2-8 weeks",
                     "budget_range": budget_range or "AED 15,000 - 50,000/month",
                     "priority_level": "HIGH"
-                }
+                },
+                "partial": partial,
+                "timed_out": timed_out,
+                "failed": failed
             }
         )
         
+    except HTTPException:
+        raise
     except Exception as e:
         logger.error(f"Error analyzing business problem: {e}")
         raise HTTPException(status_code=500, detail="Failed to analyze business problem")
 
+@api_router.get("/ai/provider/stats")
+async def get_ai_provider_stats():
+    """Get AI provider client and batch queue metrics"""
+    return StandardResponse(
+        success=True,
+        message="AI provider metrics retrieved successfully",
+        data={**ai_provider.get_metrics(), "content_jobs": content_job_service.get_metrics()}
+    )
+
+@api_router.get("/email/stats")
+async def get_email_stats():
+    """Get email transport and outbox metrics"""
+    try:
+        return StandardResponse(
+            success=True,
+            message="Email metrics retrieved successfully",
+            data={
+                **email_transport.get_metrics(),
+                "outbox": await email_outbox.get_metrics(),
+                "templates": email_templates.get_metrics(),
+                "admin_digest": admin_digest.get_metrics()
+            }
+        )
+    except Exception as e:
+        logger.error(f"Error getting email stats: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get email stats")
+
+@api_router.get("/email/outbox/dead", response_model=PaginatedResponse, dependencies=[Depends(require_admin)])
+async def get_dead_letter_emails(
+    cursor: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100)
+):
+    """Get emails that could not be delivered after all retries"""
+    try:
+        db = get_database()
+        return await paginate(
+            db.email_outbox, {"status": EmailStatus.DEAD}, RECENT_FIRST, limit, cursor,
+            lambda email: OutboundEmail(**email)
+        )
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error getting dead-letter emails: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get dead-letter emails")
+
+@api_router.post("/email/outbox/{email_id}/retry", response_model=StandardResponse, dependencies=[Depends(require_admin)])
+async def retry_dead_letter_email(email_id: str):
+    """Requeue a dead-lettered email"""
+    try:
+        if not await email_outbox.requeue(email_id):
+            raise HTTPException(status_code=404, detail="Dead-lettered email not found")
+        return StandardResponse(success=True, message="Email requeued", data={"id": email_id})
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error requeueing email: {e}")
+        raise HTTPException(status_code=500, detail="Failed to requeue email")
+
+@api_router.get("/email/templates", response_model=StandardResponse, dependencies=[Depends(require_admin)])
+async def get_email_templates():
+    """Get email templates stored in the database (they override the template files)"""
+    try:
+        db = get_database()
+        templates = await db.email_templates.find({}, {"_id": 0}).sort("name", 1).to_list(None)
+        return StandardResponse(
+            success=True,
+            message="Email templates retrieved successfully",
+            data=[EmailTemplate(**template) for template in templates]
+        )
+    except Exception as e:
+        logger.error(f"Error getting email templates: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get email templates")
+
+@api_router.put("/email/templates/{name}", response_model=StandardResponse, dependencies=[Depends(require_admin)])
+async def put_email_template(name: str, template_data: EmailTemplateUpdate):
+    """Create or replace a database email template"""
+    try:
+        email_templates.validate(template_data.subject, template_data.body)
+
+        db = get_database()
+        existing = await db.email_templates.find_one({"name": name}, {"_id": 0})
+        if existing:
+            template = EmailTemplate(**{**existing, **template_data.dict(), "updated_at": datetime.utcnow()})
+        else:
+            template = EmailTemplate(name=name, **template_data.dict())
+        await db.email_templates.replace_one({"name": name}, template.dict(), upsert=True)
+        email_templates.invalidate(name)
+
+        return StandardResponse(success=True, message="Email template saved", data={"id": template.id, "name": name})
+    except TemplateSyntaxError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid template: {e}")
+    except Exception as e:
+        logger.error(f"Error saving email template: {e}")
+        raise HTTPException(status_code=500, detail="Failed to save email template")
+
 @api_router.get("/content/recommendations")
 async def get_service_recommendations(
     business_info: str = Query(..., description="Business information and needs")
@@ -399,32 +738,43 @@ async def create_portfolio_item(
     try:
         db = get_database()
         
-        # Create portfolio item
-        portfolio_item = Portfolio(**portfolio_data.dict())
+        # Store images out of line and keep only their ids; ingest before
+        # the item is built so created_at is close to the insert
+        images = [await image_store.ingest(image) for image in portfolio_data.images]
+        portfolio_item = Portfolio(**{**portfolio_data.dict(), "images": images})
         
         # Save to database
         await db.portfolio.insert_one(portfolio_item.dict())
         
+        # Track analytics
+        analytics_service.emit(AnalyticsEventType.PORTFOLIO_ITEM, created_at=portfolio_item.created_at)
+        await response_cache.invalidate("portfolio")
+        
         return StandardResponse(
             success=True,
             message="Portfolio item created successfully",
             data={"id": portfolio_item.id}
         )
         
+    except ImageValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error creating portfolio item: {e}")
         raise HTTPException(status_code=500, detail="Failed to create portfolio item")
 
-@api_router.get("/portfolio", response_model=List[Portfolio])
+@api_router.get("/portfolio", response_model=PaginatedResponse)
+@response_cache.cached("portfolio")
 async def get_portfolio_items(
     service_type: Optional[ServiceType] = None,
     is_featured: Optional[bool] = None,
-    skip: int = Query(0, ge=0),
+    fields: Optional[str] = Query(None, description="Comma-separated sparse fieldset, e.g. title,client_name,images"),
+    cursor: Optional[str] = None,
     limit: int = Query(20, ge=1, le=50)
 ):
-    """Get portfolio items"""
+    """Get portfolio items (images are left out unless requested via fields)"""
     try:
         db = get_database()
+        projection, item_factory = list_projection(fields, Portfolio, PortfolioSummary)
         
         # Build query
         query = {}
@@ -434,15 +784,38 @@ async def get_portfolio_items(
             query["is_featured"] = is_featured
         
         # Get portfolio items
-        cursor = db.portfolio.find(query).skip(skip).limit(limit).sort("created_at", -1)
-        portfolio_items = await cursor.to_list(length=limit)
-        
-        return [Portfolio(**item) for item in portfolio_items]
+        return await paginate(
+            db.portfolio, query, RECENT_FIRST, limit, cursor,
+            item_factory, projection
+        )
         
+    except (InvalidCursorError, InvalidFieldsError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting portfolio items: {e}")
         raise HTTPException(status_code=500, detail="Failed to get portfolio items")
 
+@api_router.get("/portfolio/{portfolio_id}", response_model=Portfolio)
+@response_cache.cached("portfolio")
+async def get_portfolio_item(
+    portfolio_id: str
+):
+    """Get a single portfolio item including its images"""
+    try:
+        db = get_database()
+        
+        item = await db.portfolio.find_one({"id": portfolio_id}, {"_id": 0})
+        if not item:
+            raise HTTPException(status_code=404, detail="Portfolio item not found")
+        
+        return Portfolio(**item)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting portfolio item: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get portfolio item")
+
 @api_router.put("/portfolio/{portfolio_id}", response_model=StandardResponse)
 async def update_portfolio_item(
     portfolio_id: str,
@@ -455,6 +828,8 @@ async def update_portfolio_item(
         # Update portfolio item
         update_dict = {k: v for k, v in update_data.dict().items() if v is not None}
         update_dict["updated_at"] = datetime.utcnow()
+        if "images" in update_dict:
+            update_dict["images"] = [await image_store.ingest(image) for image in update_dict["images"]]
         
         result = await db.portfolio.update_one(
             {"id": portfolio_id},
@@ -464,6 +839,8 @@ async def update_portfolio_item(
         if result.matched_count == 0:
             raise HTTPException(status_code=404, detail="Portfolio item not found")
         
+        await response_cache.invalidate("portfolio")
+        
         return StandardResponse(
             success=True,
             message="Portfolio item updated successfully"
@@ -471,12 +848,15 @@ async def update_portfolio_item(
         
     except HTTPException:
         raise
+    except ImageValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error updating portfolio item: {e}")
         raise HTTPException(status_code=500, detail="Failed to update portfolio item")
 
 # Services Endpoints
 @api_router.get("/services", response_model=List[Service])
+@response_cache.cached("services")
 async def get_services(
     category: Optional[ServiceType] = None,
     is_active: Optional[bool] = True
@@ -515,6 +895,7 @@ async def create_service(
         
         # Save to database
         await db.services.insert_one(service.dict())
+        await response_cache.invalidate("services")
         
         return StandardResponse(
             success=True,
@@ -530,7 +911,6 @@ async def create_service(
 @api_router.post("/bookings", response_model=StandardResponse)
 async def create_booking(
     booking_data: BookingCreate,
-    background_tasks: BackgroundTasks,
     user_id: Optional[str] = None
 ):
     """Create a new booking"""
@@ -546,22 +926,14 @@ async def create_booking(
         # Save to database
         await db.bookings.insert_one(booking.dict())
         
-        # Send confirmation email in background
+        # Track analytics right after the insert, before any other await
+        analytics_service.emit(AnalyticsEventType.BOOKING, created_at=booking.created_at)
+        
+        # Queue confirmation email in the outbox
         if user_id:
             user = await db.users.find_one({"id": user_id})
             if user:
-                background_tasks.add_task(
-                    email_service.send_booking_confirmation,
-                    booking.dict(),
-                    user["email"]
-                )
-        
-        # Track analytics
-        await db.analytics.update_one(
-            {"analytics_date": date.today().isoformat()},
-            {"$inc": {"bookings": 1}},
-            upsert=True
-        )
+                await email_service.send_booking_confirmation(booking.dict(), user["email"])
         
         return StandardResponse(
             success=True,
@@ -573,11 +945,11 @@ async def create_booking(
         logger.error(f"Error creating booking: {e}")
         raise HTTPException(status_code=500, detail="Failed to create booking")
 
-@api_router.get("/bookings", response_model=List[Booking])
+@api_router.get("/bookings", response_model=PaginatedResponse)
 async def get_bookings(
     user_id: Optional[str] = None,
     status: Optional[BookingStatus] = None,
-    skip: int = Query(0, ge=0),
+    cursor: Optional[str] = None,
     limit: int = Query(50, ge=1, le=100)
 ):
     """Get bookings"""
@@ -592,25 +964,30 @@ async def get_bookings(
             query["status"] = status
         
         # Get bookings
-        cursor = db.bookings.find(query).skip(skip).limit(limit).sort("created_at", -1)
-        bookings = await cursor.to_list(length=limit)
-        
-        return [Booking(**booking) for booking in bookings]
+        return await paginate(
+            db.bookings, query, RECENT_FIRST, limit, cursor,
+            lambda booking: Booking(**booking)
+        )
         
+    except InvalidCursorError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting bookings: {e}")
         raise HTTPException(status_code=500, detail="Failed to get bookings")
 
 # Testimonials Endpoints
-@api_router.get("/testimonials", response_model=List[Testimonial])
+@api_router.get("/testimonials", response_model=PaginatedResponse)
+@response_cache.cached("testimonials")
 async def get_testimonials(
     is_featured: Optional[bool] = None,
-    skip: int = Query(0, ge=0),
+    fields: Optional[str] = Query(None, description="Comma-separated sparse fieldset, e.g. name,company,text,image"),
+    cursor: Optional[str] = None,
     limit: int = Query(20, ge=1, le=50)
 ):
-    """Get testimonials"""
+    """Get testimonials (the image is left out unless requested via fields)"""
     try:
         db = get_database()
+        projection, item_factory = list_projection(fields, Testimonial, TestimonialSummary)
         
         # Build query
         query = {}
@@ -618,15 +995,38 @@ async def get_testimonials(
             query["is_featured"] = is_featured
         
         # Get testimonials
-        cursor = db.testimonials.find(query).skip(skip).limit(limit).sort("rating", -1)
-        testimonials = await cursor.to_list(length=limit)
-        
-        return [Testimonial(**testimonial) for testimonial in testimonials]
+        return await paginate(
+            db.testimonials, query, TOP_RATED_FIRST, limit, cursor,
+            item_factory, projection
+        )
         
+    except (InvalidCursorError, InvalidFieldsError) as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error getting testimonials: {e}")
         raise HTTPException(status_code=500, detail="Failed to get testimonials")
 
+@api_router.get("/testimonials/{testimonial_id}", response_model=Testimonial)
+@response_cache.cached("testimonials")
+async def get_testimonial(
+    testimonial_id: str
+):
+    """Get a single testimonial including its image"""
+    try:
+        db = get_database()
+        
+        testimonial = await db.testimonials.find_one({"id": testimonial_id}, {"_id": 0})
+        if not testimonial:
+            raise HTTPException(status_code=404, detail="Testimonial not found")
+        
+        return Testimonial(**testimonial)
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error getting testimonial: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get testimonial")
+
 @api_router.post("/testimonials", response_model=StandardResponse)
 async def create_testimonial(
     testimonial_data: TestimonialCreate
@@ -635,11 +1035,14 @@ async def create_testimonial(
     try:
         db = get_database()
         
-        # Create testimonial
+        # Create testimonial, storing its image out of line
         testimonial = Testimonial(**testimonial_data.dict())
+        if testimonial.image:
+            testimonial.image = await image_store.ingest(testimonial.image)
         
         # Save to database
         await db.testimonials.insert_one(testimonial.dict())
+        await response_cache.invalidate("testimonials")
         
         return StandardResponse(
             success=True,
@@ -647,49 +1050,153 @@ async def create_testimonial(
             data={"id": testimonial.id}
         )
         
+    except ImageValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     except Exception as e:
         logger.error(f"Error creating testimonial: {e}")
         raise HTTPException(status_code=500, detail="Failed to create testimonial")
 
-# Analytics Endpoints
-@api_router.get("/analytics/summary")
-async def get_analytics_summary():
-    """Get analytics summary"""
+# Image Endpoints
+@api_router.post("/images", response_model=StandardResponse)
+async def upload_image(
+    file: UploadFile = File(...)
+):
+    """Upload an image (multipart) and get its content-addressed id"""
     try:
-        db = get_database()
+        # Read one byte past the limit so oversized uploads are rejected
+        data = await file.read(settings.max_file_size + 1)
+        image = await image_store.put(data)
+        
+        return StandardResponse(
+            success=True,
+            message="Image uploaded successfully",
+            data={**image.dict(), "url": f"{settings.api_prefix}/images/{image.id}"}
+        )
         
-        # Get today's analytics
-        today = date.today().isoformat()
-        today_analytics = await db.analytics.find_one({"analytics_date": today})
+    except ImageValidationError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    except Exception as e:
+        logger.error(f"Error uploading image: {e}")
+        raise HTTPException(status_code=500, detail="Failed to upload image")
+
+@api_router.get("/images/{image_id}")
+async def get_image(
+    image_id: str,
+    request: Request,
+    w: Optional[int] = Query(None, description="Serve a resized derivative at one of the configured widths")
+):
+    """Serve a stored image, or a resized derivative, with ETag and Range support"""
+    try:
+        if w is not None and w not in image_derivative_service.widths:
+            raise HTTPException(
+                status_code=400,
+                detail=f"Width must be one of {', '.join(map(str, image_derivative_service.widths))}"
+            )
         
-        # Get total counts
-        total_contacts = await db.contact_forms.count_documents({})
-        total_bookings = await db.bookings.count_documents({})
-        total_chat_sessions = await db.chat_sessions.count_documents({})
-        total_portfolio = await db.portfolio.count_documents({})
+        image = await image_store.get(image_id)
+        if not image:
+            raise HTTPException(status_code=404, detail="Image not found")
+        
+        # Derivatives are cached on disk and rendered in a process pool. The
+        # file is opened up front so eviction cannot remove it mid-response
+        iter_range = image_store.iter_range
+        handle = None
+        if w is not None:
+            image, handle = await image_derivative_service.open(image, w)
+            iter_range = lambda ref, start, end: iter_handle_range(handle, start, end)
+        
+        # Content-addressed: the id is a strong validator and never changes
+        etag = f'"{image.id}"'
+        headers = {
+            "ETag": etag,
+            "Cache-Control": "public, max-age=31536000, immutable",
+            "Accept-Ranges": "bytes",
+        }
         
-        # Get recent activity
-        recent_contacts = await db.contact_forms.count_documents({
+        if etag_matches(request.headers.get("if-none-match"), etag):
+            if handle:
+                handle.close()
+            return Response(status_code=304, headers=headers)
+        
+        start, end = 0, image.size - 1
+        status_code = 200
+        if_range = request.headers.get("if-range")
+        if not if_range or if_range.strip() == etag:
+            try:
+                byte_range = parse_byte_range(request.headers.get("range"), image.size)
+            except RangeNotSatisfiableError:
+                if handle:
+                    handle.close()
+                return Response(status_code=416, headers={**headers, "Content-Range": f"bytes */{image.size}"})
+            if byte_range:
+                start, end = byte_range
+                status_code = 206
+                headers["Content-Range"] = f"bytes {start}-{end}/{image.size}"
+        
+        headers["Content-Length"] = str(end - start + 1)
+        return StreamingResponse(
+            iter_range(image, start, end),
+            status_code=status_code,
+            media_type=image.content_type,
+            headers=headers
+        )
+        
+    except HTTPException:
+        raise
+    except Exception as e:
+        logger.error(f"Error serving image: {e}")
+        raise HTTPException(status_code=500, detail="Failed to get image")
+
+# Analytics Endpoints
+async def build_analytics_summary(exact: bool) -> Dict[str, Any]:
+    """Read today's counters and the running totals"""
+    db = get_database()
+    
+    # Independent reads run concurrently
+    today = date.today().isoformat()
+    plan = QueryPlan()
+    plan.find_one("today", db.analytics, {"analytics_date": today})
+    plan.add("totals", analytics_service.get_summary(exact=exact))
+    if exact:
+        plan.count("contacts_today", db.contact_forms, {
             "created_at": {"$gte": datetime.utcnow().replace(hour=0, minute=0, second=0, microsecond=0)}
         })
-        
-        summary = {
-            "today": {
-                "page_views": today_analytics.get("page_views", 0) if today_analytics else 0,
-                "contact_forms": today_analytics.get("contact_forms", 0) if today_analytics else 0,
-                "bookings": today_analytics.get("bookings", 0) if today_analytics else 0,
-                "chat_sessions": today_analytics.get("chat_sessions", 0) if today_analytics else 0,
-            },
-            "total": {
-                "contacts": total_contacts,
-                "bookings": total_bookings,
-                "chat_sessions": total_chat_sessions,
-                "portfolio_items": total_portfolio,
-            },
-            "recent": {
-                "contacts_today": recent_contacts,
-            }
-        }
+    results = await plan.run()
+    
+    today_analytics = results["today"]
+    totals = results["totals"]
+    contacts_today = results.get(
+        "contacts_today",
+        today_analytics.get("contact_forms", 0) if today_analytics else 0
+    )
+    
+    return {
+        "today": {
+            "page_views": today_analytics.get("page_views", 0) if today_analytics else 0,
+            "contact_forms": today_analytics.get("contact_forms", 0) if today_analytics else 0,
+            "bookings": today_analytics.get("bookings", 0) if today_analytics else 0,
+            "chat_sessions": today_analytics.get("chat_sessions", 0) if today_analytics else 0,
+        },
+        "total": {
+            "contacts": totals.contacts,
+            "bookings": totals.bookings,
+            "chat_sessions": totals.chat_sessions,
+            "portfolio_items": totals.portfolio_items,
+        },
+        "recent": {
+            "contacts_today": contacts_today,
+        },
+        "reconciled_at": totals.reconciled_at
+    }
+
+@api_router.get("/analytics/summary")
+async def get_analytics_summary(
+    exact: bool = Query(False, description="Count totals live instead of reading the materialized summary")
+):
+    """Get analytics summary"""
+    try:
+        # Dashboards polling at the same moment share one set of queries
+        summary = await read_flight.do(("analytics_summary", exact), lambda: build_analytics_summary(exact))
         
         return StandardResponse(
             success=True,
@@ -701,21 +1208,53 @@ async def get_analytics_summary():
         logger.error(f"Error getting analytics summary: {e}")
         raise HTTPException(status_code=500, detail="Failed to get analytics summary")
 
+@api_router.get("/analytics/pipeline")
+async def get_analytics_pipeline_metrics():
+    """Get analytics event bus queue and writer metrics"""
+    return StandardResponse(
+        success=True,
+        message="Analytics pipeline metrics retrieved successfully",
+        data=analytics_service.get_metrics()
+    )
+
+@api_router.get("/cache/stats")
+async def get_cache_stats():
+    """Get response cache, prompt cache and request coalescing metrics"""
+    return StandardResponse(
+        success=True,
+        message="Cache metrics retrieved successfully",
+        data={
+            **response_cache.get_metrics(),
+            "single_flight": {
+                "cache_fills": cache.flight.get_metrics(),
+                "reads": read_flight.get_metrics(),
+            },
+            "prompt_cache": prompt_cache.get_metrics(),
+            "chat_context": chat_context.get_metrics(),
+        }
+    )
+
 # Include the API router
 app.include_router(api_router)
 
-# Startup and shutdown events (temporarily disabled for setup)
-# @app.on_event("startup")
-# async def startup_event():
-#     """Initialize database connection on startup"""
-#     await connect_to_db()
-#     logger.info("NOWHERE Digital API started successfully")
-
-# @app.on_event("shutdown")
-# async def shutdown_event():
-#     """Close database connection on shutdown"""
-#     await close_db_connection()
-#     logger.info("NOWHERE Digital API shutdown")
+# Background services (started and stopped by the lifespan)
+async def start_background_services():
+    """Start in-process background workers"""
+    await analytics_service.start()
+    await content_job_service.start()
+    await email_outbox.start()
+    await admin_digest.start()
+
+async def stop_background_services():
+    """Flush and stop in-process background workers"""
+    await analytics_service.stop()
+    await content_job_service.stop()
+    await admin_digest.stop()
+    await email_outbox.stop()
+    await image_derivative_service.stop()
+    await cache.close()
+    await ai_provider.close()
+    await email_transport.close()
 
 # Root endpoint
 @app.get("/")
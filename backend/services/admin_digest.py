@@ -0,0 +1,128 @@
+from database import get_database
+from config import settings
+from services.email_service import email_service
+from collections import Counter
+from datetime import datetime
+from typing import Dict, Any, Optional, List
+import logging
+import asyncio
+import uuid
+
+logger = logging.getLogger(__name__)
+
+class AdminDigestService:
+    """Batches new contact form notifications into one admin email per window.
+
+    Submissions for a service listed in ``admin_urgent_services`` (none by
+    default) are mailed to the admin right away. All others are stored
+    with ``admin_digest_pending`` set, and every ``admin_digest_window``
+    seconds a worker claims the pending ones and sends a single summary
+    email. A window of 0 disables digesting, so every submission is mailed
+    immediately.
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+        self._metrics = {"immediate": 0, "digests": 0, "digested_contacts": 0}
+
+    @staticmethod
+    def urgent_services() -> List[str]:
+        """Services parsed from ``admin_urgent_services``"""
+        return [service.strip() for service in settings.admin_urgent_services.split(",") if service.strip()]
+
+    def send_immediately(self, contact_data: Dict[str, Any]) -> bool:
+        """Whether a submission bypasses the digest"""
+        service = getattr(contact_data["service"], "value", contact_data["service"])
+        return settings.admin_digest_window <= 0 or service in self.urgent_services()
+
+    async def notify(self, contact_data: Dict[str, Any]) -> bool:
+        """Send the admin notification for an urgent submission"""
+        self._metrics["immediate"] += 1
+        return await email_service.send_contact_form_notification(contact_data)
+
+    async def _claim(self) -> List[Dict[str, Any]]:
+        db = get_database()
+        cursor = db.contact_forms.find({"admin_digest_pending": True}, {"id": 1}).sort("created_at", 1).limit(settings.admin_digest_max_items)
+        ids = [doc["id"] async for doc in cursor]
+        if not ids:
+            return []
+
+        # Only one worker wins each submission
+        claim = str(uuid.uuid4())
+        await db.contact_forms.update_many(
+            {"id": {"$in": ids}, "admin_digest_pending": True},
+            {"$set": {"admin_digest_pending": False, "admin_digest_id": claim}}
+        )
+        return await db.contact_forms.find({"admin_digest_id": claim}, {"_id": 0}).sort("created_at", 1).to_list(None)
+
+    async def send_digest(self) -> int:
+        """Mail pending submissions as digests; returns how many were included"""
+        total = 0
+        while True:
+            contacts = await self._claim()
+            if not contacts:
+                return total
+
+            services = Counter(contact["service"] for contact in contacts)
+            sent = await email_service.send_template(email_service.admin_email, "admin_digest", {
+                "contacts": contacts,
+                "count": len(contacts),
+                "services": services.most_common(),
+                "since": contacts[0]["created_at"],
+                "until": contacts[-1]["created_at"],
+                "generated_at": datetime.utcnow(),
+            })
+            if not sent:
+                # Leave them for the next window
+                await get_database().contact_forms.update_many(
+                    {"id": {"$in": [contact["id"] for contact in contacts]}},
+                    {"$set": {"admin_digest_pending": True}}
+                )
+                return total
+
+            total += len(contacts)
+            self._metrics["digests"] += 1
+            self._metrics["digested_contacts"] += len(contacts)
+            logger.info(f"Queued admin digest of {len(contacts)} contact form submissions")
+            if len(contacts) < settings.admin_digest_max_items:
+                return total
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(settings.admin_digest_window)
+            try:
+                await self.send_digest()
+            except Exception as e:
+                logger.error(f"Admin digest error: {e}")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            **self._metrics,
+            "window": settings.admin_digest_window,
+            "urgent_services": self.urgent_services(),
+        }
+
+    async def start(self):
+        """Start the digest worker"""
+        if self._task or settings.admin_digest_window <= 0:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info(f"Admin digest worker started ({settings.admin_digest_window:g}s window)")
+
+    async def stop(self):
+        """Stop the worker and send whatever is pending"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            try:
+                await self.send_digest()
+            except Exception as e:
+                logger.error(f"Admin digest error: {e}")
+        logger.info("Admin digest worker stopped")
+
+# Create global admin digest service instance
+admin_digest = AdminDigestService()
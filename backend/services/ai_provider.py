@@ -0,0 +1,191 @@
+from config import settings
+from typing import Dict, Any, Optional, List, AsyncIterator
+from email.utils import parsedate_to_datetime
+from datetime import datetime, timezone
+import logging
+import asyncio
+import json
+import random
+import time
+import httpx
+
+logger = logging.getLogger(__name__)
+
+RETRY_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+class AIProviderError(Exception):
+    """Raised when the AI provider cannot produce a completion"""
+
+def http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def retry_after_seconds(response: httpx.Response) -> Optional[float]:
+    """Delay requested by a Retry-After header (seconds or HTTP date)"""
+    value = response.headers.get("retry-after")
+    if not value:
+        return None
+    try:
+        return max(float(value), 0.0)
+    except ValueError:
+        pass
+    try:
+        return max((parsedate_to_datetime(value) - datetime.now(timezone.utc)).total_seconds(), 0.0)
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """Async token bucket: ``rate`` requests per second with bursts up to ``capacity``"""
+
+    def __init__(self, rate: float, capacity: int):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+class AIProviderClient:
+    """Shared HTTP client for an OpenAI-compatible chat completions API.
+
+    One connection pool (keep-alive, HTTP/2 when ``h2`` is installed) lives
+    for the whole application, so calls do not pay a TLS handshake each.
+    Outgoing requests are capped by a concurrency semaphore and a token
+    bucket, and 429/5xx/transport errors are retried with full-jitter
+    exponential backoff that honours ``Retry-After``.
+
+    Point ``ai_api_base_url`` at ``mock_ai_provider.py`` to run locally.
+    """
+
+    def __init__(self):
+        self.base_url = settings.ai_api_base_url
+        self.api_key = settings.openai_api_key
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(settings.ai_max_concurrency)
+        self._bucket = TokenBucket(settings.ai_rate_limit, settings.ai_rate_burst)
+        self._in_flight = 0
+        self._metrics = {"requests": 0, "retries": 0, "throttled": 0, "errors": 0}
+
+    @property
+    def enabled(self) -> bool:
+        """Whether a provider is configured (otherwise AIService uses mock responses)"""
+        return bool(self.api_key)
+
+    @property
+    def client(self) -> httpx.AsyncClient:
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                base_url=self.base_url,
+                headers={"Authorization": f"Bearer {self.api_key}"},
+                http2=http2_available(),
+                limits=httpx.Limits(
+                    max_connections=settings.ai_max_connections,
+                    max_keepalive_connections=settings.ai_max_connections,
+                    keepalive_expiry=settings.ai_keepalive_expiry
+                ),
+                timeout=httpx.Timeout(settings.ai_request_timeout, connect=10.0)
+            )
+        return self._client
+
+    def _backoff(self, attempt: int, response: Optional[httpx.Response]) -> float:
+        retry_after = retry_after_seconds(response) if response is not None else None
+        if retry_after is not None:
+            return min(retry_after, settings.ai_retry_max_delay)
+        # Full jitter spreads retries out instead of synchronising them
+        return random.uniform(0, min(settings.ai_retry_max_delay, settings.ai_retry_base_delay * 2 ** attempt))
+
+    async def _send(self, payload: Dict[str, Any], stream: bool) -> httpx.Response:
+        """POST to /chat/completions with rate limiting and retries (caller holds the semaphore)"""
+        for attempt in range(settings.ai_max_retries + 1):
+            await self._bucket.acquire()
+            self._metrics["requests"] += 1
+            response = None
+            try:
+                request = self.client.build_request("POST", "/chat/completions", json=payload)
+                response = await self.client.send(request, stream=stream)
+                if response.status_code < 400:
+                    return response
+                if response.status_code == 429:
+                    self._metrics["throttled"] += 1
+                await response.aclose()
+                if response.status_code not in RETRY_STATUSES:
+                    self._metrics["errors"] += 1
+                    raise AIProviderError(f"Provider returned {response.status_code}")
+                reason = f"status {response.status_code}"
+            except httpx.TransportError as e:
+                reason = f"{type(e).__name__}: {e}"
+
+            if attempt == settings.ai_max_retries:
+                break
+            delay = self._backoff(attempt, response)
+            self._metrics["retries"] += 1
+            logger.warning(f"AI provider request failed ({reason}), retrying in {delay:.2f}s")
+            await asyncio.sleep(delay)
+
+        self._metrics["errors"] += 1
+        raise AIProviderError(f"Provider request failed after {settings.ai_max_retries + 1} attempts ({reason})")
+
+    async def chat(self, messages: List[Dict[str, str]], model: str, **options) -> str:
+        """Get a complete chat completion"""
+        async with self._semaphore:
+            self._in_flight += 1
+            try:
+                response = await self._send({"model": model, "messages": messages, **options}, stream=False)
+                return response.json()["choices"][0]["message"]["content"]
+            finally:
+                self._in_flight -= 1
+
+    async def stream_chat(self, messages: List[Dict[str, str]], model: str, **options) -> AsyncIterator[str]:
+        """Stream a chat completion as text deltas"""
+        async with self._semaphore:
+            self._in_flight += 1
+            try:
+                response = await self._send({"model": model, "messages": messages, "stream": True, **options}, stream=True)
+                try:
+                    async for line in response.aiter_lines():
+                        if not line.startswith("data:"):
+                            continue
+                        data = line[5:].strip()
+                        if data == "[DONE]":
+                            break
+                        delta = json.loads(data)["choices"][0].get("delta", {}).get("content")
+                        if delta:
+                            yield delta
+                finally:
+                    await response.aclose()
+            finally:
+                self._in_flight -= 1
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            **self._metrics,
+            "enabled": self.enabled,
+            "in_flight": self._in_flight,
+            "max_concurrency": settings.ai_max_concurrency,
+            "rate_limit": settings.ai_rate_limit,
+            "http2": http2_available(),
+        }
+
+    async def close(self):
+        """Close the connection pool"""
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+# Create global AI provider client instance
+ai_provider = AIProviderClient()
@@ -1,109 +1,215 @@
 from config import settings
+from services.prompt_cache import prompt_cache
+from services.ai_provider import ai_provider
+from services.chat_context import chat_context
 import logging
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, List, Tuple, Awaitable, AsyncIterator
 import asyncio
+import json
+import re
 
 logger = logging.getLogger(__name__)
 
+CHAT_SYSTEM_MESSAGE = """You are a helpful AI assistant for NOWHERE Digital, a leading digital marketing agency in Dubai, UAE. 
+
+You help with:
+- Digital marketing strategy
+- Social media marketing
+- Web development
+- AI solutions
+- SEO and content marketing
+- WhatsApp business solutions
+- E-commerce development
+- Lead generation
+
+Always be professional, helpful, and provide actionable insights specific to the UAE market. 
+Use a friendly but professional tone and include relevant examples when possible.
+
+If users ask about services, pricing, or want to book a consultation, guide them to use the booking system or contact form."""
+
 class AIService:
     def __init__(self):
         self.api_key = settings.openai_api_key
         self.model = settings.default_ai_model
         self.provider = settings.ai_provider
         
-    async def create_chat_session(self, session_id: str, system_message: str = None) -> dict:
-        """Create a new chat session (mocked for now)"""
-        if not system_message:
-            system_message = """You are a helpful AI assistant for NOWHERE Digital, a leading digital marketing agency in Dubai, UAE. 
-            
-            You help with:
-            - Digital marketing strategy
-            - Social media marketing
-            - Web development
-            - AI solutions
-            - SEO and content marketing
-            - WhatsApp business solutions
-            - E-commerce development
-            - Lead generation
-            
-            Always be professional, helpful, and provide actionable insights specific to the UAE market. 
-            Use a friendly but professional tone and include relevant examples when possible.
-            
-            If users ask about services, pricing, or want to book a consultation, guide them to use the booking system or contact form."""
+    def _messages(self, system_message: str, prompt: str) -> List[Dict[str, str]]:
+        return [
+            {"role": "system", "content": system_message},
+            {"role": "user", "content": prompt},
+        ]
+
+    async def _call_model(self, messages: List[Dict[str, str]], mock_response: str) -> str:
+        """Get a completion from the provider, or the mock response if none is configured"""
+        if not ai_provider.enabled:
+            return mock_response
+        return await ai_provider.chat(messages, self.model)
+
+    async def _complete(self, method: str, system_message: str, prompt: str, mock_response: str, use_cache: bool = True) -> str:
+        """Get a completion for ``prompt``, served from the prompt cache when possible"""
+        # Mock responses are never cached, so they cannot outlive configuring a provider
+        if not ai_provider.enabled:
+            return mock_response
+        if not use_cache:
+            return await self._call_model(self._messages(system_message, prompt), mock_response)
+        return await prompt_cache.get_or_complete(
+            method, self.model, system_message, prompt,
+            lambda: self._call_model(self._messages(system_message, prompt), mock_response)
+        )
+
+    async def _stream_model(self, messages: List[Dict[str, str]], mock_response: str) -> AsyncIterator[str]:
+        """Stream a completion from the provider as text chunks"""
+        if ai_provider.enabled:
+            async for chunk in ai_provider.stream_chat(messages, self.model):
+                yield chunk
+            return
         
-        try:
-            # Mock chat session for now
-            chat = {
-                "session_id": session_id,
-                "system_message": system_message,
-                "api_key": self.api_key,
-                "model": self.model,
-                "provider": self.provider
-            }
-            
-            return chat
-            
-        except Exception as e:
-            logger.error(f"Error creating chat session: {e}")
-            raise
+        # Mock token stream
+        for chunk in re.findall(r"\S+\s*", mock_response):
+            yield chunk
+            await asyncio.sleep(0)
+
+    async def _stream(self, method: str, system_message: str, prompt: str, mock_response: str) -> AsyncIterator[str]:
+        """Streaming counterpart of ``_complete``; a cached completion arrives as one chunk"""
+        if not ai_provider.enabled:
+            async for chunk in self._stream_model(self._messages(system_message, prompt), mock_response):
+                yield chunk
+            return
+        
+        cached = await prompt_cache.get(method, self.model, system_message, prompt)
+        if cached is not None:
+            yield cached
+            return
+        
+        chunks = []
+        async for chunk in self._stream_model(self._messages(system_message, prompt), mock_response):
+            chunks.append(chunk)
+            yield chunk
+        await prompt_cache.put(method, self.model, system_message, prompt, "".join(chunks))
+
+    async def gather_with_timeouts(self, calls: Dict[str, Awaitable[str]], timeout: float) -> Tuple[Dict[str, Optional[str]], List[str], List[str]]:
+        """Run independent AI calls concurrently, each bounded by ``timeout``.
+        
+        Returns the results by name (None for calls that did not finish) and
+        the names of the calls that timed out and that failed. Pass calls
+        made with ``raise_errors=True`` so provider failures land in
+        ``failed`` instead of coming back as an apology string.
+        """
+        names = list(calls)
+        outcomes = await asyncio.gather(
+            *(asyncio.wait_for(call, timeout) for call in calls.values()),
+            return_exceptions=True
+        )
+        
+        results, timed_out, failed = {}, [], []
+        for name, outcome in zip(names, outcomes):
+            if isinstance(outcome, asyncio.TimeoutError):
+                logger.warning(f"AI call {name} timed out after {timeout}s")
+                timed_out.append(name)
+                results[name] = None
+            elif isinstance(outcome, BaseException):
+                logger.error(f"AI call {name} failed: {outcome}")
+                failed.append(name)
+                results[name] = None
+            else:
+                results[name] = outcome
+        return results, timed_out, failed
+
+    def _chat_mock_response(self, message: str) -> str:
+        return f"Thank you for your message: '{message}'. I'm currently being set up and will provide full AI responses soon. In the meantime, please feel free to use our contact form or booking system to get in touch with our team at NOWHERE Digital."
 
     async def send_chat_message(self, session_id: str, message: str) -> str:
-        """Send a message to the AI chat and get response (mocked for now)"""
+        """Send a message to the AI chat and get response"""
         try:
-            chat = await self.create_chat_session(session_id)
-            # Mock AI response for now
-            response = f"Thank you for your message: '{message}'. I'm currently being set up and will provide full AI responses soon. In the meantime, please feel free to use our contact form or booking system to get in touch with our team at NOWHERE Digital."
+            # Recent turns plus a rolling summary keep the prompt bounded
+            messages = await chat_context.build_messages(session_id, CHAT_SYSTEM_MESSAGE, message)
+            response = await self._call_model(messages, self._chat_mock_response(message))
+            await chat_context.record(session_id, message, response)
             return response
             
         except Exception as e:
             logger.error(f"Error sending chat message: {e}")
             return "I'm sorry, I'm having trouble processing your request right now. Please try again later or contact our support team."
 
-    async def generate_content(self, content_type: str, prompt: str, additional_context: Dict[str, Any] = None) -> str:
-        """Generate content using AI"""
+    async def stream_chat_message(self, session_id: str, message: str) -> AsyncIterator[str]:
+        """Send a message to the AI chat and stream the response as it is generated"""
+        messages = await chat_context.build_messages(session_id, CHAT_SYSTEM_MESSAGE, message)
+        chunks = []
+        async for chunk in self._stream_model(messages, self._chat_mock_response(message)):
+            chunks.append(chunk)
+            yield chunk
+        await chat_context.record(session_id, message, "".join(chunks))
+
+    def _content_system_message(self, content_type: str, additional_context: Dict[str, Any] = None) -> str:
+        """System message for a content type"""
+        # Create content-specific system messages
+        system_messages = {
+            "blog_post": """You are a content writer for NOWHERE Digital. Create engaging blog posts about digital marketing, 
+            web development, and business growth in the UAE market. Include actionable tips and local insights.""",
+            
+            "social_media": """You are a social media expert for NOWHERE Digital. Create engaging social media content 
+            that resonates with UAE audiences. Include relevant hashtags and call-to-actions.""",
+            
+            "ad_copy": """You are an advertising copywriter for NOWHERE Digital. Create compelling ad copy that converts 
+            for the UAE market. Focus on benefits, urgency, and clear call-to-actions.""",
+            
+            "email_campaign": """You are an email marketing specialist for NOWHERE Digital. Create email campaigns that 
+            engage UAE customers and drive conversions. Include personalization and clear CTAs.""",
+            
+            "web_copy": """You are a web copywriter for NOWHERE Digital. Create website copy that converts visitors 
+            into customers. Focus on benefits, credibility, and clear value propositions.""",
+            
+            "seo_content": """You are an SEO content specialist for NOWHERE Digital. Create SEO-optimized content 
+            that ranks well in UAE search results and provides value to readers."""
+        }
+        
+        system_message = system_messages.get(content_type, 
+            "You are a content creator for NOWHERE Digital. Create high-quality content based on the given prompt.")
+        
+        # Add additional context if provided
+        if additional_context:
+            system_message += f"\n\nAdditional context: {additional_context}"
+        
+        return system_message
+
+    async def generate_content(self, content_type: str, prompt: str, additional_context: Dict[str, Any] = None,
+                               raise_errors: bool = False, use_cache: bool = True) -> str:
+        """Generate content using AI (errors become an apology unless ``raise_errors``).
+
+        Pass ``use_cache=False`` when every call should get its own
+        completion, such as variants of the same prompt.
+        """
         try:
-            # Create content-specific system messages
-            system_messages = {
-                "blog_post": """You are a content writer for NOWHERE Digital. Create engaging blog posts about digital marketing, 
-                web development, and business growth in the UAE market. Include actionable tips and local insights.""",
-                
-                "social_media": """You are a social media expert for NOWHERE Digital. Create engaging social media content 
-                that resonates with UAE audiences. Include relevant hashtags and call-to-actions.""",
-                
-                "ad_copy": """You are an advertising copywriter for NOWHERE Digital. Create compelling ad copy that converts 
-                for the UAE market. Focus on benefits, urgency, and clear call-to-actions.""",
-                
-                "email_campaign": """You are an email marketing specialist for NOWHERE Digital. Create email campaigns that 
-                engage UAE customers and drive conversions. Include personalization and clear CTAs.""",
-                
-                "web_copy": """You are a web copywriter for NOWHERE Digital. Create website copy that converts visitors 
-                into customers. Focus on benefits, credibility, and clear value propositions.""",
-                
-                "seo_content": """You are an SEO content specialist for NOWHERE Digital. Create SEO-optimized content 
-                that ranks well in UAE search results and provides value to readers."""
-            }
-            
-            system_message = system_messages.get(content_type, 
-                "You are a content creator for NOWHERE Digital. Create high-quality content based on the given prompt.")
-            
-            # Add additional context if provided
-            if additional_context:
-                system_message += f"\n\nAdditional context: {additional_context}"
-            
-            session_id = f"content_generation_{content_type}"
-            chat = await self.create_chat_session(session_id, system_message)
-            
-            # Mock content generation for now
-            response = f"Generated {content_type} content for: '{prompt}'. Full AI content generation will be available once OpenAI integration is configured."
+            system_message = self._content_system_message(content_type, additional_context)
+            
+            response = await self._complete(
+                "generate_content",
+                system_message,
+                prompt,
+                f"Generated {content_type} content for: '{prompt}'. Full AI content generation will be available once OpenAI integration is configured.",
+                use_cache=use_cache
+            )
             
             return response
             
         except Exception as e:
+            if raise_errors:
+                raise
             logger.error(f"Error generating content: {e}")
             return "I'm sorry, I couldn't generate the content right now. Please try again later."
 
-    async def generate_service_recommendations(self, user_input: str) -> str:
-        """Generate service recommendations based on user input"""
+    async def stream_content(self, content_type: str, prompt: str, additional_context: Dict[str, Any] = None) -> AsyncIterator[str]:
+        """Generate content using AI, streaming it as it is generated"""
+        async for chunk in self._stream(
+            "generate_content",
+            self._content_system_message(content_type, additional_context),
+            prompt,
+            f"Generated {content_type} content for: '{prompt}'. Full AI content generation will be available once OpenAI integration is configured."
+        ):
+            yield chunk
+
+    async def generate_service_recommendations(self, user_input: str, raise_errors: bool = False) -> str:
+        """Generate service recommendations based on user input (errors become an apology unless ``raise_errors``)"""
         try:
             system_message = """You are a digital marketing consultant for NOWHERE Digital. Based on the user's business 
             needs, recommend the most suitable services from our portfolio:
@@ -124,20 +230,23 @@ class AIService:
             
             Provide specific recommendations with explanations and suggest next steps."""
             
-            session_id = "service_recommendations"
-            chat = await self.create_chat_session(session_id, system_message)
-            
-            # Mock service recommendations for now
-            response = f"Based on your input: '{user_input}', we recommend our comprehensive digital marketing services including Social Media Marketing, Web Development, and SEO. Please contact us for a detailed consultation."
+            response = await self._complete(
+                "generate_service_recommendations",
+                system_message,
+                user_input,
+                f"Based on your input: '{user_input}', we recommend our comprehensive digital marketing services including Social Media Marketing, Web Development, and SEO. Please contact us for a detailed consultation."
+            )
             
             return response
             
         except Exception as e:
+            if raise_errors:
+                raise
             logger.error(f"Error generating service recommendations: {e}")
             return "I'm sorry, I couldn't generate recommendations right now. Please contact our team directly for personalized service recommendations."
 
-    async def analyze_market_trends(self, industry: str, location: str = "UAE") -> str:
-        """Analyze market trends for a specific industry"""
+    async def analyze_market_trends(self, industry: str, location: str = "UAE", raise_errors: bool = False) -> str:
+        """Analyze market trends for a specific industry (errors become an apology unless ``raise_errors``)"""
         try:
             system_message = f"""You are a market research analyst for NOWHERE Digital. Analyze current digital marketing 
             trends for the {industry} industry in {location}. Provide insights on:
@@ -151,20 +260,23 @@ class AIService:
             
             Focus on actionable insights that can help businesses grow."""
             
-            session_id = f"market_analysis_{industry}"
-            chat = await self.create_chat_session(session_id, system_message)
-            
-            # Mock market analysis for now
-            response = f"Market analysis for {industry} in {location}: Growing digital transformation opportunities with strong mobile and social media adoption. Contact us for detailed market insights."
+            response = await self._complete(
+                "analyze_market_trends",
+                system_message,
+                f"{industry} in {location}",
+                f"Market analysis for {industry} in {location}: Growing digital transformation opportunities with strong mobile and social media adoption. Contact us for detailed market insights."
+            )
             
             return response
             
         except Exception as e:
+            if raise_errors:
+                raise
             logger.error(f"Error analyzing market trends: {e}")
             return "I'm sorry, I couldn't analyze the market trends right now. Please try again later."
 
-    async def generate_strategy_proposal(self, business_info: Dict[str, Any]) -> str:
-        """Generate a digital marketing strategy proposal"""
+    async def generate_strategy_proposal(self, business_info: Dict[str, Any], raise_errors: bool = False) -> str:
+        """Generate a digital marketing strategy proposal (errors become an apology unless ``raise_errors``)"""
         try:
             system_message = """You are a digital marketing strategist for NOWHERE Digital. Create comprehensive 
             digital marketing strategy proposals tailored to the UAE market. Include:
@@ -179,17 +291,20 @@ class AIService:
             
             Make the proposal professional and actionable."""
             
-            session_id = "strategy_proposal"
-            chat = await self.create_chat_session(session_id, system_message)
-            
-            # Mock strategy proposal for now
             business_name = business_info.get('business_name', 'Your Business')
             industry = business_info.get('industry', 'Not specified')
-            response = f"Digital Marketing Strategy Proposal for {business_name} ({industry}): We recommend a comprehensive approach including social media marketing, SEO optimization, and lead generation tailored for the UAE market. Contact us for a detailed proposal."
+            response = await self._complete(
+                "generate_strategy_proposal",
+                system_message,
+                json.dumps(business_info, sort_keys=True, default=str),
+                f"Digital Marketing Strategy Proposal for {business_name} ({industry}): We recommend a comprehensive approach including social media marketing, SEO optimization, and lead generation tailored for the UAE market. Contact us for a detailed proposal."
+            )
             
             return response
             
         except Exception as e:
+            if raise_errors:
+                raise
             logger.error(f"Error generating strategy proposal: {e}")
             return "I'm sorry, I couldn't generate the strategy proposal right now. Please contact our team for a personalized proposal."
 
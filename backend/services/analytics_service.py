@@ -0,0 +1,283 @@
+from pymongo import UpdateOne
+from database import get_database, QueryPlan
+from config import settings
+from models import AnalyticsEvent, AnalyticsEventType, AnalyticsSummary
+from datetime import datetime, timedelta
+from collections import defaultdict
+from typing import Dict, Any, Optional
+import logging
+import asyncio
+
+logger = logging.getLogger(__name__)
+
+SUMMARY_ID = "summary"
+
+# Materialized all-time totals: summary field -> (event type, source collection)
+SUMMARY_TOTALS = {
+    "contacts": (AnalyticsEventType.CONTACT_FORM, "contact_forms"),
+    "bookings": (AnalyticsEventType.BOOKING, "bookings"),
+    "chat_sessions": (AnalyticsEventType.CHAT_SESSION, "chat_sessions"),
+    "portfolio_items": (AnalyticsEventType.PORTFOLIO_ITEM, "portfolio"),
+}
+SUMMARY_FIELDS = {event_type: field for field, (event_type, _) in SUMMARY_TOTALS.items()}
+
+class AnalyticsService:
+    """Analytics event bus with a background writer.
+
+    Endpoints emit typed ``AnalyticsEvent``s into a bounded asyncio queue
+    without touching the database. A single consumer task coalesces them per
+    analytics day and per counter and writes them as one bulk ``$inc`` every
+    ``analytics_flush_interval`` seconds, or as soon as
+    ``analytics_flush_threshold`` increments are pending. When the queue is
+    full new events are dropped and counted rather than blocking a request.
+
+    The same flush keeps the materialized ``analytics_summary`` document's
+    all-time totals up to date, and the writer periodically reconciles those
+    totals against the source collections to repair any drift (dropped
+    events, failed writes, manual deletes). A reconciliation counts only
+    documents created before it started; events for those documents that
+    arrive afterwards skip the totals, since the count already has them.
+    """
+
+    def __init__(self):
+        self.flush_interval = settings.analytics_flush_interval
+        self.flush_threshold = settings.analytics_flush_threshold
+        self.reconcile_interval = settings.analytics_reconcile_interval
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=settings.analytics_queue_size)
+        self._pending: Dict[str, Dict[str, int]] = defaultdict(lambda: defaultdict(int))
+        self._pending_count = 0
+        self._pending_totals: Dict[str, int] = defaultdict(int)
+        self._counted_before: Optional[datetime] = None  # cutoff of the last reconciliation
+        self._task: Optional[asyncio.Task] = None
+        self._flushing = False
+        self._stopping = False
+        self._write_lock = asyncio.Lock()  # serializes flushes and reconciliations
+        self._metrics = {
+            "emitted": 0,
+            "dropped": 0,
+            "queue_high_water": 0,
+            "flushed_events": 0,
+            "flushes": 0,
+            "flush_errors": 0,
+            "last_flush_at": None,
+            "reconciliations": 0,
+            "last_reconciled_at": None,
+        }
+
+    def emit(self, event_type: AnalyticsEventType, amount: int = 1, created_at: Optional[datetime] = None) -> bool:
+        """Queue an analytics event (no I/O); returns False if it was dropped.
+
+        Pass the ``created_at`` of the document being counted so a
+        reconciliation that already counted it is not added to again.
+        """
+        try:
+            self._queue.put_nowait(AnalyticsEvent(type=event_type, amount=amount, created_at=created_at))
+        except asyncio.QueueFull:
+            self._metrics["dropped"] += 1
+            return False
+
+        self._metrics["emitted"] += 1
+        depth = self._queue.qsize()
+        if depth > self._metrics["queue_high_water"]:
+            self._metrics["queue_high_water"] = depth
+        return True
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Queue and writer metrics"""
+        return {
+            **self._metrics,
+            "queue_depth": self._queue.qsize(),
+            "queue_size": self._queue.maxsize,
+            "pending_increments": self._pending_count,
+            "running": self._task is not None and not self._task.done(),
+        }
+
+    def _aggregate(self, event: AnalyticsEvent):
+        self._pending[event.analytics_date][event.type.value] += event.amount
+        self._pending_count += event.amount
+
+        field = SUMMARY_FIELDS.get(event.type)
+        counted = self._counted_before and event.created_at and event.created_at < self._counted_before
+        if field and not counted:
+            self._pending_totals[field] += event.amount
+
+    def _drain_queue(self):
+        while True:
+            try:
+                self._aggregate(self._queue.get_nowait())
+            except asyncio.QueueEmpty:
+                return
+
+    async def flush(self):
+        """Write all pending increments as a single bulk write, one $inc per day"""
+        async with self._write_lock:
+            await self._flush_pending()
+
+    async def _flush_pending(self):
+        if not self._pending and not self._pending_totals:
+            return
+
+        # stop() does not cancel the writer while this is set, so increments
+        # swapped out below are never lost mid-write
+        self._flushing = True
+        try:
+            await self._write_pending()
+        finally:
+            self._flushing = False
+
+    async def _write_pending(self):
+        pending, self._pending = self._pending, defaultdict(lambda: defaultdict(int))
+        pending_count, self._pending_count = self._pending_count, 0
+        totals, self._pending_totals = self._pending_totals, defaultdict(int)
+        totals = {field: amount for field, amount in totals.items() if amount}
+
+        operations = [
+            UpdateOne({"analytics_date": analytics_date}, {"$inc": dict(counters)}, upsert=True)
+            for analytics_date, counters in pending.items()
+        ]
+
+        try:
+            db = get_database()
+            if operations:
+                await db.analytics.bulk_write(operations, ordered=False)
+            self._metrics["flushes"] += 1
+            self._metrics["flushed_events"] += pending_count
+            self._metrics["last_flush_at"] = datetime.utcnow()
+        except Exception as e:
+            logger.error(f"Error flushing analytics events: {e}")
+            self._metrics["flush_errors"] += 1
+            # Put the increments back so they are retried on the next flush
+            for analytics_date, counters in pending.items():
+                for counter, amount in counters.items():
+                    self._pending[analytics_date][counter] += amount
+            self._pending_count += pending_count
+            for field, amount in totals.items():
+                self._pending_totals[field] += amount
+            return
+
+        if totals:
+            try:
+                await db.analytics_summary.update_one(
+                    {"_id": SUMMARY_ID},
+                    {"$inc": totals},
+                    upsert=True
+                )
+            except Exception as e:
+                # Not retried: the next reconciliation repairs the totals
+                logger.error(f"Error updating analytics summary: {e}")
+                self._metrics["flush_errors"] += 1
+
+    async def count_totals(self, exact: bool = True, before: Optional[datetime] = None) -> AnalyticsSummary:
+        """Count the totals live from the source collections, concurrently"""
+        db = get_database()
+        # Older documents without a created_at count as before any cutoff
+        query = {"$or": [{"created_at": {"$lt": before}}, {"created_at": {"$exists": False}}]} if before else None
+        plan = QueryPlan()
+        for field, (_, collection) in SUMMARY_TOTALS.items():
+            plan.count(field, db[collection], query, exact=exact)
+        return AnalyticsSummary(**await plan.run())
+
+    async def reconcile_summary(self) -> Optional[AnalyticsSummary]:
+        """Recompute the materialized totals from the source collections"""
+        async with self._write_lock:
+            # Write every increment emitted so far first; events that arrive
+            # later are skipped from the totals if the count below has them
+            self._drain_queue()
+            await self._flush_pending()
+            if self._pending or self._pending_totals:
+                logger.warning("Skipping analytics reconciliation: pending increments could not be flushed")
+                return None
+            return await self._reconcile()
+
+    async def _reconcile(self) -> Optional[AnalyticsSummary]:
+        # Mongo stores milliseconds, so round up to one: a cutoff on a boundary
+        # compares the same against stored and in-memory created_at values
+        now = datetime.utcnow()
+        cutoff = now.replace(microsecond=now.microsecond // 1000 * 1000)
+        if cutoff < now:
+            cutoff += timedelta(milliseconds=1)
+        previous, self._counted_before = self._counted_before, cutoff
+        try:
+            db = get_database()
+            summary = await self.count_totals(exact=True, before=cutoff)
+            summary.reconciled_at = cutoff
+
+            await db.analytics_summary.update_one(
+                {"_id": SUMMARY_ID},
+                {"$set": summary.dict()},
+                upsert=True
+            )
+            self._metrics["reconciliations"] += 1
+            self._metrics["last_reconciled_at"] = summary.reconciled_at
+            return summary
+        except Exception as e:
+            # Nothing was overwritten, so events before the cutoff still need their $inc
+            self._counted_before = previous
+            logger.error(f"Error reconciling analytics summary: {e}")
+            return None
+
+    async def get_summary(self, exact: bool = False) -> AnalyticsSummary:
+        """Get the all-time totals.
+
+        By default this is a single read of the materialized document, falling
+        back to metadata-based estimates until the first reconciliation has
+        run. ``exact`` bypasses the materialized document and counts live.
+        """
+        if exact:
+            return await self.count_totals(exact=True)
+
+        db = get_database()
+        summary = await db.analytics_summary.find_one({"_id": SUMMARY_ID})
+        if summary:
+            return AnalyticsSummary(**summary)
+        return await self.count_totals(exact=False)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+        reconcile_at = loop.time()
+        while not self._stopping:
+            # asyncio.timeout rather than wait_for, which on 3.11 can swallow a
+            # cancel that arrives as the queue yields an event, hanging stop()
+            try:
+                async with asyncio.timeout(max(deadline - loop.time(), 0)):
+                    event = await self._queue.get()
+                self._aggregate(event)
+                self._drain_queue()
+            except TimeoutError:
+                pass
+
+            if self._pending_count >= self.flush_threshold or loop.time() >= deadline:
+                await self.flush()
+                deadline = loop.time() + self.flush_interval
+
+                if loop.time() >= reconcile_at:
+                    await self.reconcile_summary()
+                    reconcile_at = loop.time() + self.reconcile_interval
+
+    async def start(self):
+        """Start the background writer"""
+        if self._task:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info("Analytics event writer started")
+
+    async def stop(self):
+        """Stop the background writer and write whatever is still queued"""
+        if self._task:
+            self._stopping = True
+            # A flush in progress is left to finish; the loop exits after it
+            if not self._flushing:
+                self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            self._stopping = False
+        self._drain_queue()
+        await self.flush()
+        logger.info("Analytics event writer stopped")
+
+# Create global analytics service instance
+analytics_service = AnalyticsService()
@@ -0,0 +1,289 @@
+from config import settings, resolve_storage_dir
+from singleflight import SingleFlight
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from typing import Dict, Any, Optional, List, Tuple, Callable, Awaitable
+import logging
+import asyncio
+import sqlite3
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+Loader = Callable[[], Awaitable[bytes]]
+
+class CacheBackend(ABC):
+    """Key/value cache interface shared by the API and the AI service.
+
+    Values are bytes (callers serialize), every write takes an optional
+    per-key TTL in seconds, and ``get_or_set`` collapses concurrent misses
+    for the same key into a single loader call (single-flight) so an
+    expired hot key does not stampede the database or the AI provider.
+    """
+
+    def __init__(self):
+        self.flight = SingleFlight()
+
+    @abstractmethod
+    async def get(self, key: str) -> Optional[bytes]:
+        """Get a value, or None if it is missing or expired"""
+
+    @abstractmethod
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        """Store a value, expiring after ``ttl`` seconds if given"""
+
+    @abstractmethod
+    async def delete(self, key: str):
+        """Remove a key if present"""
+
+    @abstractmethod
+    async def incr(self, key: str) -> int:
+        """Atomically increment an integer counter and return the new value"""
+
+    async def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        """Get several keys at once; missing keys are left out"""
+        values = {}
+        for key in keys:
+            value = await self.get(key)
+            if value is not None:
+                values[key] = value
+        return values
+
+    async def set_many(self, items: Dict[str, bytes], ttl: Optional[float] = None):
+        """Set several keys at once with the same TTL"""
+        for key, value in items.items():
+            await self.set(key, value, ttl)
+
+    async def _fill(self, key: str, loader: Loader, ttl: Optional[float]) -> bytes:
+        value = await loader()
+        await self.set(key, value, ttl)
+        return value
+
+    async def get_or_set(self, key: str, loader: Loader, ttl: Optional[float] = None) -> bytes:
+        """Return the cached value, loading it once on a miss"""
+        value = await self.get(key)
+        if value is not None:
+            return value
+
+        return await self.flight.do(key, lambda: self._fill(key, loader, ttl))
+
+    async def close(self):
+        pass
+
+class MemoryCacheBackend(CacheBackend):
+    """In-process LRU cache with per-key expiry (one copy per worker)"""
+
+    def __init__(self, max_entries: int):
+        super().__init__()
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, Tuple[Optional[float], bytes]]" = OrderedDict()
+
+    async def get(self, key: str) -> Optional[bytes]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at is not None and expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        self._entries[key] = (time.monotonic() + ttl if ttl else None, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def delete(self, key: str):
+        self._entries.pop(key, None)
+
+    async def incr(self, key: str) -> int:
+        current = await self.get(key)
+        value = int(current or 0) + 1
+        self._entries[key] = (None, str(value).encode())
+        return value
+
+class SQLiteCacheBackend(CacheBackend):
+    """Cache shared by all worker processes on one host.
+
+    Backed by a SQLite database in WAL mode, by default on /dev/shm so it
+    lives in shared memory. Expired rows are purged and the least recently
+    used rows are trimmed beyond ``max_entries``. A read refreshes a row's
+    recency only once it is ``touch_interval`` seconds old, so hot keys do
+    not make every reader take the database write lock.
+    """
+
+    def __init__(self, path: str, max_entries: int, touch_interval: float = 60.0):
+        super().__init__()
+        self.path = str(resolve_storage_dir(path))
+        self.max_entries = max_entries
+        self.touch_interval = touch_interval
+        self._conn: Optional[sqlite3.Connection] = None
+        self._lock = threading.Lock()
+        self._writes = 0
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, timeout=5, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=OFF")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache ("
+                "key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL, accessed_at REAL NOT NULL)"
+            )
+            conn.execute("CREATE INDEX IF NOT EXISTS cache_accessed_at ON cache (accessed_at)")
+            self._conn = conn
+        return self._conn
+
+    def _run(self, operation: Callable[[sqlite3.Connection], Any]) -> Any:
+        with self._lock:
+            return operation(self._connection())
+
+    def _get_many(self, conn: sqlite3.Connection, keys: List[str]) -> Dict[str, bytes]:
+        now = time.time()
+        placeholders = ",".join("?" * len(keys))
+        rows = conn.execute(
+            f"SELECT key, value, accessed_at FROM cache WHERE key IN ({placeholders}) AND (expires_at IS NULL OR expires_at > ?)",
+            (*keys, now)
+        ).fetchall()
+        stale = [(now, key) for key, _, accessed_at in rows if now - accessed_at >= self.touch_interval]
+        if stale:
+            conn.executemany("UPDATE cache SET accessed_at = ? WHERE key = ?", stale)
+        return {key: bytes(value) for key, value, _ in rows}
+
+    def _set_many(self, conn: sqlite3.Connection, items: Dict[str, bytes], ttl: Optional[float]):
+        now = time.time()
+        expires_at = now + ttl if ttl else None
+        conn.executemany(
+            "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, ?, ?)",
+            [(key, value, expires_at, now) for key, value in items.items()]
+        )
+        self._writes += len(items)
+        if self._writes >= max(self.max_entries // 10, 1):
+            self._writes = 0
+            conn.execute("DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?", (now,))
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY accessed_at DESC LIMIT -1 OFFSET ?)",
+                (self.max_entries,)
+            )
+
+    def _incr(self, conn: sqlite3.Connection, key: str) -> int:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            row = conn.execute("SELECT value FROM cache WHERE key = ?", (key,)).fetchone()
+            value = int(bytes(row[0])) + 1 if row else 1
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires_at, accessed_at) VALUES (?, ?, NULL, ?)",
+                (key, str(value).encode(), time.time())
+            )
+            conn.execute("COMMIT")
+            return value
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return (await self.get_many([key])).get(key)
+
+    async def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        if not keys:
+            return {}
+        return await asyncio.to_thread(self._run, lambda conn: self._get_many(conn, keys))
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        await self.set_many({key: value}, ttl)
+
+    async def set_many(self, items: Dict[str, bytes], ttl: Optional[float] = None):
+        if items:
+            await asyncio.to_thread(self._run, lambda conn: self._set_many(conn, items, ttl))
+
+    async def delete(self, key: str):
+        await asyncio.to_thread(self._run, lambda conn: conn.execute("DELETE FROM cache WHERE key = ?", (key,)))
+
+    async def incr(self, key: str) -> int:
+        return await asyncio.to_thread(self._run, lambda conn: self._incr(conn, key))
+
+    async def close(self):
+        if self._conn:
+            self._conn.close()
+            self._conn = None
+
+class RedisCacheBackend(CacheBackend):
+    """Cache shared across workers and hosts via the Redis protocol.
+
+    Pass ``client`` to use any ``redis.asyncio``-compatible client (for
+    example ``fakeredis.aioredis.FakeRedis`` locally); otherwise one is
+    created from ``url``. Single-flight extends across processes with a
+    short ``SET NX`` fill lock per key.
+    """
+
+    def __init__(self, url: str = "", client: Any = None, prefix: str = "", lock_timeout: float = 10.0):
+        super().__init__()
+        if client is None:
+            import redis.asyncio as redis
+            client = redis.Redis.from_url(url)
+        self.client = client
+        self.prefix = prefix
+        self.lock_timeout = lock_timeout
+
+    def _key(self, key: str) -> str:
+        return f"{self.prefix}{key}"
+
+    async def get(self, key: str) -> Optional[bytes]:
+        return await self.client.get(self._key(key))
+
+    async def get_many(self, keys: List[str]) -> Dict[str, bytes]:
+        if not keys:
+            return {}
+        values = await self.client.mget([self._key(key) for key in keys])
+        return {key: value for key, value in zip(keys, values) if value is not None}
+
+    async def set(self, key: str, value: bytes, ttl: Optional[float] = None):
+        await self.client.set(self._key(key), value, px=int(ttl * 1000) if ttl else None)
+
+    async def set_many(self, items: Dict[str, bytes], ttl: Optional[float] = None):
+        if not items:
+            return
+        async with self.client.pipeline(transaction=False) as pipe:
+            for key, value in items.items():
+                pipe.set(self._key(key), value, px=int(ttl * 1000) if ttl else None)
+            await pipe.execute()
+
+    async def delete(self, key: str):
+        await self.client.delete(self._key(key))
+
+    async def incr(self, key: str) -> int:
+        return await self.client.incr(self._key(key))
+
+    async def _fill(self, key: str, loader: Loader, ttl: Optional[float]) -> bytes:
+        lock_key = self._key(f"{key}:fill-lock")
+        if await self.client.set(lock_key, b"1", nx=True, px=int(self.lock_timeout * 1000)):
+            try:
+                return await super()._fill(key, loader, ttl)
+            finally:
+                await self.client.delete(lock_key)
+
+        # Another process is filling this key: wait for its value
+        deadline = time.monotonic() + self.lock_timeout
+        while time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+            value = await self.get(key)
+            if value is not None:
+                return value
+        return await super()._fill(key, loader, ttl)
+
+    async def close(self):
+        await self.client.aclose()
+
+def create_cache_backend() -> CacheBackend:
+    """Build the cache backend selected by ``settings.cache_backend``"""
+    if settings.cache_backend == "redis":
+        return RedisCacheBackend(settings.cache_redis_url, prefix=settings.cache_key_prefix)
+    if settings.cache_backend == "sqlite":
+        return SQLiteCacheBackend(settings.cache_sqlite_path, settings.cache_max_entries)
+    return MemoryCacheBackend(settings.cache_max_entries)
+
+# Create global cache backend instance
+cache = create_cache_backend()
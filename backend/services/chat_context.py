@@ -0,0 +1,131 @@
+from database import get_database
+from config import settings
+from services.ai_provider import ai_provider
+from pymongo import DESCENDING
+from collections import OrderedDict, deque
+from typing import Dict, Any, List, Deque, Tuple
+import logging
+import asyncio
+
+logger = logging.getLogger(__name__)
+
+Turn = Tuple[str, str]  # (user message, assistant response)
+
+def _clip(text: str, limit: int) -> str:
+    return text if len(text) <= limit else text[:limit - 1] + "…"
+
+class ChatContext:
+    """Bounded model context for one session: a rolling summary plus recent turns"""
+
+    def __init__(self, summary: str, turns: List[Turn]):
+        self.summary = summary
+        self.turns: Deque[Turn] = deque(turns, maxlen=settings.chat_context_turns)
+        self.lock = asyncio.Lock()
+
+class ChatContextManager:
+    """Keeps per-session chat context so each turn sends a bounded prompt.
+
+    Only the last ``chat_context_turns`` exchanges are sent verbatim; older
+    ones are folded into a rolling summary capped at
+    ``chat_context_summary_chars`` (condensed by the model when a provider
+    is configured, otherwise trimmed oldest-first). Contexts are cached in
+    memory with LRU eviction; on a miss the summary is read from the
+    session document and only the last turns from ``chat_messages``.
+    """
+
+    def __init__(self):
+        self._contexts: "OrderedDict[str, ChatContext]" = OrderedDict()
+        self._metrics = {"hits": 0, "misses": 0, "evictions": 0, "summaries": 0}
+
+    async def _load(self, session_id: str) -> ChatContext:
+        db = get_database()
+        session = await db.chat_sessions.find_one({"session_id": session_id}, {"context_summary": 1})
+        cursor = db.chat_messages.find(
+            {"session_id": session_id}, {"message": 1, "response": 1}
+        ).sort([("created_at", DESCENDING), ("id", DESCENDING)]).limit(settings.chat_context_turns)
+        recent = [(doc["message"], doc["response"]) async for doc in cursor]
+        return ChatContext((session or {}).get("context_summary", ""), list(reversed(recent)))
+
+    async def get(self, session_id: str) -> ChatContext:
+        context = self._contexts.get(session_id)
+        if context is not None:
+            self._metrics["hits"] += 1
+            self._contexts.move_to_end(session_id)
+            return context
+
+        self._metrics["misses"] += 1
+        context = await self._load(session_id)
+        # Another request may have loaded it meanwhile
+        context = self._contexts.setdefault(session_id, context)
+        while len(self._contexts) > settings.chat_context_max_sessions:
+            self._contexts.popitem(last=False)
+            self._metrics["evictions"] += 1
+        return context
+
+    async def build_messages(self, session_id: str, system_message: str, message: str) -> List[Dict[str, str]]:
+        """Model messages for the next turn: system + summary, recent turns, new message"""
+        context = await self.get(session_id)
+        limit = settings.chat_context_turn_chars
+
+        if context.summary:
+            system_message = f"{system_message}\n\nSummary of the earlier conversation:\n{context.summary}"
+        messages = [{"role": "system", "content": system_message}]
+        for user_message, response in context.turns:
+            messages.append({"role": "user", "content": _clip(user_message, limit)})
+            messages.append({"role": "assistant", "content": _clip(response, limit)})
+        messages.append({"role": "user", "content": _clip(message, limit)})
+        return messages
+
+    async def _condense(self, summary: str) -> str:
+        limit = settings.chat_context_summary_chars
+        if len(summary) <= limit:
+            return summary
+
+        if ai_provider.enabled:
+            try:
+                condensed = await ai_provider.chat([
+                    {"role": "system", "content": f"Condense this conversation summary to under {limit // 2} characters. Keep names, needs, budgets and decisions."},
+                    {"role": "user", "content": summary},
+                ], settings.default_ai_model)
+                self._metrics["summaries"] += 1
+                return _clip(condensed, limit)
+            except Exception as e:
+                logger.warning(f"Failed to condense chat summary: {e}")
+
+        # Drop the oldest lines until it fits
+        lines = summary.split("\n")
+        while len(lines) > 1 and len("\n".join(lines)) > limit:
+            lines.pop(0)
+        return _clip("\n".join(lines), limit)
+
+    async def record(self, session_id: str, message: str, response: str):
+        """Add a finished turn, folding the turn that leaves the window into the summary"""
+        context = await self.get(session_id)
+        async with context.lock:
+            if len(context.turns) < context.turns.maxlen:
+                context.turns.append((message, response))
+                return
+
+            old_message, old_response = context.turns.popleft()
+            context.turns.append((message, response))
+            summary = f"{context.summary}\n- User: {_clip(old_message, 200)} / Assistant: {_clip(old_response, 200)}".strip()
+            context.summary = await self._condense(summary)
+
+        try:
+            await get_database().chat_sessions.update_one(
+                {"session_id": session_id},
+                {"$set": {"context_summary": context.summary}}
+            )
+        except Exception as e:
+            logger.warning(f"Failed to persist chat summary for {session_id}: {e}")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            **self._metrics,
+            "sessions": len(self._contexts),
+            "max_sessions": settings.chat_context_max_sessions,
+            "turns": settings.chat_context_turns,
+        }
+
+# Create global chat context manager instance
+chat_context = ChatContextManager()
@@ -0,0 +1,211 @@
+from database import get_database
+from config import settings
+from models import ContentGeneration, ContentGenerationCreate, ContentJob, ContentJobStatus
+from services.ai_service import ai_service
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Any, Optional, List, Set, Tuple, AsyncIterator
+import logging
+import asyncio
+
+logger = logging.getLogger(__name__)
+
+class ContentJobQueueFullError(Exception):
+    """Raised when a batch does not fit in the work queue"""
+
+class LiveJob:
+    """In-memory progress of a job, for streaming results as they finish"""
+
+    def __init__(self, job: ContentJob):
+        self.job = job
+        self.results: List[Dict[str, Any]] = []  # in completion order
+        self.processed: Set[int] = set()  # indices counted in completed or failed
+        self.pending_records: List[Dict[str, Any]] = []
+        self.finished = False
+        self.changed = asyncio.Condition()
+        self.flush_lock = asyncio.Lock()
+
+class ContentJobService:
+    """Batch content generation on a bounded worker pool.
+
+    A batch becomes a ``content_jobs`` document and one queue entry per
+    item. ``content_batch_workers`` workers generate items concurrently
+    (the provider client adds its own concurrency and rate limits), and
+    results are written to ``content_generation`` with ``insert_many`` in
+    groups of ``content_batch_insert_size``, tagged with the job id and
+    item index. Progress can be polled from the job document or streamed
+    from the in-memory ``LiveJob`` while this process holds it.
+    """
+
+    def __init__(self):
+        self._queue: asyncio.Queue = asyncio.Queue(maxsize=settings.content_batch_queue_size)
+        self._reserved = 0  # queue slots held by submits that are still saving their job
+        self._workers: List[asyncio.Task] = []
+        self._jobs: "OrderedDict[str, LiveJob]" = OrderedDict()
+
+    def get_live(self, job_id: str) -> Optional[LiveJob]:
+        return self._jobs.get(job_id)
+
+    def _track(self, live: LiveJob):
+        self._jobs[live.job.id] = live
+        # Forget the oldest finished jobs; unfinished ones are still being worked on
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= settings.content_batch_live_jobs:
+                break
+            if self._jobs[job_id].finished:
+                del self._jobs[job_id]
+
+    async def submit(self, items: List[ContentGenerationCreate], user_id: Optional[str] = None) -> ContentJob:
+        """Create a job and queue its items"""
+        # Reserve the slots before the first await so concurrent submits cannot overfill the queue
+        if self._queue.maxsize - self._queue.qsize() - self._reserved < len(items):
+            raise ContentJobQueueFullError("Content generation queue is full")
+        self._reserved += len(items)
+
+        job = ContentJob(total=len(items), user_id=user_id)
+        try:
+            await get_database().content_jobs.insert_one(job.dict())
+        finally:
+            self._reserved -= len(items)
+
+        live = LiveJob(job)
+        self._track(live)
+        for index, item in enumerate(items):
+            self._queue.put_nowait((live, index, item))
+        logger.info(f"Queued content job {job.id} with {len(items)} items")
+        return job
+
+    async def _flush(self, live: LiveJob):
+        """Insert buffered results and save job progress"""
+        db = get_database()
+        # Serialized per job so an older progress write cannot land last
+        async with live.flush_lock:
+            records, live.pending_records = live.pending_records, []
+            try:
+                if records:
+                    await db.content_generation.insert_many(records, ordered=False)
+                live.job.updated_at = datetime.utcnow()
+                await db.content_jobs.update_one(
+                    {"id": live.job.id},
+                    {"$set": {
+                        "status": live.job.status,
+                        "completed": live.job.completed,
+                        "failed": live.job.failed,
+                        "errors": live.job.errors,
+                        "updated_at": live.job.updated_at,
+                    }}
+                )
+            except Exception as e:
+                logger.error(f"Error saving results for content job {live.job.id}: {e}")
+
+    async def _process(self, live: LiveJob, index: int, item: ContentGenerationCreate):
+        job = live.job
+        if job.status == ContentJobStatus.QUEUED:
+            job.status = ContentJobStatus.RUNNING
+
+        try:
+            # Uncached: a batch of identical prompts asks for distinct variants
+            content = await ai_service.generate_content(item.content_type, item.prompt, raise_errors=True, use_cache=False)
+            record = ContentGeneration(
+                **item.dict(exclude={"user_id"}),
+                user_id=item.user_id or job.user_id,
+                generated_content=content,
+                metadata={"job_id": job.id, "index": index}
+            )
+            live.pending_records.append(record.dict())
+            job.completed += 1
+            result = {"index": index, "id": record.id, "content": content}
+        except Exception as e:
+            logger.error(f"Error generating item {index} of content job {job.id}: {e}")
+            job.failed += 1
+            job.errors.append({"index": index, "error": "Failed to generate content"})
+            result = {"index": index, "error": "Failed to generate content"}
+        live.processed.add(index)
+
+        done = job.completed + job.failed == job.total
+        if done:
+            job.status = ContentJobStatus.COMPLETED if job.completed else ContentJobStatus.FAILED
+        if done or len(live.pending_records) >= settings.content_batch_insert_size:
+            # Shielded so stopping the workers cannot drop records mid-insert
+            await asyncio.shield(self._flush(live))
+
+        async with live.changed:
+            live.results.append(result)
+            live.finished = done
+            live.changed.notify_all()
+
+    async def _worker(self):
+        while True:
+            live, index, item = await self._queue.get()
+            try:
+                await self._process(live, index, item)
+            except Exception as e:
+                logger.error(f"Content job worker error: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def stream(self, live: LiveJob) -> AsyncIterator[Tuple[str, Dict[str, Any]]]:
+        """Yield ("item", result) as items finish, then ("done", job)"""
+        sent = 0
+        while True:
+            async with live.changed:
+                await live.changed.wait_for(lambda: len(live.results) > sent or live.finished)
+                results, finished = live.results[sent:], live.finished
+            for result in results:
+                yield "item", result
+            sent += len(results)
+            if finished:
+                yield "done", live.job.dict()
+                return
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            "workers": len(self._workers),
+            "queue_depth": self._queue.qsize(),
+            "queue_reserved": self._reserved,
+            "queue_size": self._queue.maxsize,
+            "live_jobs": len(self._jobs),
+        }
+
+    async def start(self):
+        """Start the worker pool"""
+        if self._workers:
+            return
+        self._workers = [asyncio.create_task(self._worker()) for _ in range(settings.content_batch_workers)]
+        logger.info(f"Content job workers started ({len(self._workers)})")
+
+    async def _interrupt(self, live: LiveJob):
+        """Fail the items of a job that will not run, and save what did"""
+        job = live.job
+        for index in range(job.total):
+            if index not in live.processed:
+                job.failed += 1
+                job.errors.append({"index": index, "error": "Interrupted by shutdown"})
+        job.status = ContentJobStatus.COMPLETED if job.completed else ContentJobStatus.FAILED
+        await self._flush(live)
+
+        async with live.changed:
+            live.finished = True
+            live.changed.notify_all()
+
+    async def stop(self):
+        """Stop the workers; unfinished jobs are saved and marked failed.
+
+        Queued items only live in this process, so they cannot be resumed
+        after a restart. Results already generated are still inserted.
+        """
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+        while not self._queue.empty():
+            self._queue.get_nowait()
+            self._queue.task_done()
+        for live in list(self._jobs.values()):
+            if not live.finished:
+                await self._interrupt(live)
+        logger.info("Content job workers stopped")
+
+# Create global content job service instance
+content_job_service = ContentJobService()
@@ -0,0 +1,207 @@
+from database import get_database
+from config import settings
+from models import OutboundEmail, EmailStatus
+from services.email_transport import email_transport
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List, Tuple
+import logging
+import asyncio
+import random
+import uuid
+
+logger = logging.getLogger(__name__)
+
+class EmailOutbox:
+    """Durable outbound email queue in the ``email_outbox`` collection.
+
+    Emails are written to Mongo before the request returns, so a restart
+    or a slow provider loses nothing. A background worker claims due emails
+    in batches (pending ones, or ones whose claim expired because a worker
+    died mid-send), groups identical messages so each group goes out as
+    one provider call with a personalization per recipient, and sends the
+    groups concurrently. Failed sends are retried with jittered exponential
+    backoff; after ``email_outbox_max_attempts`` they are dead-lettered and
+    can be inspected and requeued over the API.
+
+    A claim's lock is extended right before each group is sent, and every
+    write checks ``claimed_by``, so a worker whose lock expired neither
+    sends nor overwrites emails another worker has taken over.
+    """
+
+    def __init__(self):
+        self.worker_id = str(uuid.uuid4())
+        self._wakeup = asyncio.Event()
+        # Groups wait here rather than in the transport, so a lock is only extended when its send can start
+        self._sending = asyncio.Semaphore(settings.email_max_concurrency)
+        self._task: Optional[asyncio.Task] = None
+        self._metrics = {"queued": 0, "sent": 0, "retried": 0, "dead": 0, "batches": 0}
+
+    async def enqueue(self, to_email: str, subject: str, content: str, content_type: str = "text/html") -> OutboundEmail:
+        """Store an email for delivery by the worker"""
+        email = OutboundEmail(to_email=to_email, subject=subject, content=content, content_type=content_type)
+        await get_database().email_outbox.insert_one(email.dict())
+        self._metrics["queued"] += 1
+        self._wakeup.set()
+        return email
+
+    async def _claim(self) -> List[Dict[str, Any]]:
+        """Atomically take up to ``email_outbox_batch_size`` due emails"""
+        db = get_database()
+        now = datetime.utcnow()
+        due = {"$or": [
+            {"status": EmailStatus.PENDING, "next_attempt_at": {"$lte": now}},
+            {"status": EmailStatus.SENDING, "locked_until": {"$lte": now}},
+        ]}
+        cursor = db.email_outbox.find(due, {"id": 1}).sort("next_attempt_at", 1).limit(settings.email_outbox_batch_size)
+        ids = [doc["id"] async for doc in cursor]
+        if not ids:
+            return []
+
+        # Re-checking the due filter in the update means only one worker wins each email
+        claim = str(uuid.uuid4())
+        await db.email_outbox.update_many(
+            {"$and": [{"id": {"$in": ids}}, due]},
+            {"$set": {
+                "status": EmailStatus.SENDING,
+                "claimed_by": f"{self.worker_id}:{claim}",
+                "locked_until": now + timedelta(seconds=settings.email_outbox_lock_timeout),
+                "updated_at": now,
+            }}
+        )
+        return await db.email_outbox.find({"claimed_by": f"{self.worker_id}:{claim}"}, {"_id": 0}).to_list(None)
+
+    def _backoff(self, attempts: int) -> float:
+        delay = min(settings.email_outbox_retry_max_delay, settings.email_outbox_retry_base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def _extend_claim(self, emails: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Push back the lock on ``emails`` and return the ones this claim still owns"""
+        db = get_database()
+        ids = [email["id"] for email in emails]
+        owned = {"id": {"$in": ids}, "claimed_by": emails[0]["claimed_by"], "status": EmailStatus.SENDING}
+        result = await db.email_outbox.update_many(
+            owned,
+            {"$set": {"locked_until": datetime.utcnow() + timedelta(seconds=settings.email_outbox_lock_timeout)}}
+        )
+        if result.modified_count == len(ids):
+            return emails
+
+        still_owned = {doc["id"] async for doc in db.email_outbox.find(owned, {"id": 1})}
+        logger.warning(f"{len(ids) - len(still_owned)} claimed email(s) were taken over by another worker")
+        return [email for email in emails if email["id"] in still_owned]
+
+    async def _send_group(self, emails: List[Dict[str, Any]]):
+        async with self._sending:
+            emails = await self._extend_claim(emails)
+            if emails:
+                await self._deliver_group(emails)
+
+    async def _deliver_group(self, emails: List[Dict[str, Any]]):
+        db = get_database()
+        first = emails[0]
+        ids = [email["id"] for email in emails]
+        try:
+            await email_transport.send_batch(
+                [email["to_email"] for email in emails], first["subject"], first["content"], first["content_type"]
+            )
+        except Exception as e:
+            await self._fail(emails, str(e))
+            return
+
+        now = datetime.utcnow()
+        await db.email_outbox.update_many(
+            {"id": {"$in": ids}, "claimed_by": first["claimed_by"]},
+            {"$set": {"status": EmailStatus.SENT, "sent_at": now, "updated_at": now, "locked_until": None},
+             "$inc": {"attempts": 1}}
+        )
+        self._metrics["sent"] += len(emails)
+        self._metrics["batches"] += 1
+
+    async def _fail(self, emails: List[Dict[str, Any]], error: str):
+        db = get_database()
+        now = datetime.utcnow()
+        for email in emails:
+            attempts = email.get("attempts", 0) + 1
+            update = {"attempts": attempts, "last_error": error, "locked_until": None, "updated_at": now}
+            if attempts >= settings.email_outbox_max_attempts:
+                update["status"] = EmailStatus.DEAD
+                self._metrics["dead"] += 1
+                logger.error(f"Email {email['id']} to {email['to_email']} dead-lettered after {attempts} attempts: {error}")
+            else:
+                update["status"] = EmailStatus.PENDING
+                update["next_attempt_at"] = now + timedelta(seconds=self._backoff(attempts))
+                self._metrics["retried"] += 1
+            await db.email_outbox.update_one({"id": email["id"], "claimed_by": email["claimed_by"]}, {"$set": update})
+        logger.warning(f"Failed to send {len(emails)} email(s): {error}")
+
+    async def process_batch(self) -> int:
+        """Claim and send one batch; returns how many emails were claimed"""
+        emails = await self._claim()
+        groups: Dict[Tuple[str, str, str], List[Dict[str, Any]]] = {}
+        for email in emails:
+            groups.setdefault((email["subject"], email["content"], email["content_type"]), []).append(email)
+
+        sends = []
+        for group in groups.values():
+            for start in range(0, len(group), email_transport.max_recipients):
+                sends.append(self._send_group(group[start:start + email_transport.max_recipients]))
+        await asyncio.gather(*sends)
+        return len(emails)
+
+    async def _run(self):
+        while True:
+            try:
+                if await self.process_batch():
+                    continue
+            except Exception as e:
+                logger.error(f"Email outbox worker error: {e}")
+
+            # Idle until an email is queued or retries may be due
+            self._wakeup.clear()
+            try:
+                async with asyncio.timeout(settings.email_outbox_poll_interval):
+                    await self._wakeup.wait()
+            except TimeoutError:
+                pass
+
+    async def requeue(self, email_id: str) -> bool:
+        """Move a dead-lettered email back to the queue"""
+        result = await get_database().email_outbox.update_one(
+            {"id": email_id, "status": EmailStatus.DEAD},
+            {"$set": {
+                "status": EmailStatus.PENDING,
+                "attempts": 0,
+                "next_attempt_at": datetime.utcnow(),
+                "updated_at": datetime.utcnow(),
+            }}
+        )
+        if result.modified_count:
+            self._wakeup.set()
+        return bool(result.modified_count)
+
+    async def get_metrics(self) -> Dict[str, Any]:
+        counts = {status.value: 0 for status in EmailStatus}
+        async for row in get_database().email_outbox.aggregate([{"$group": {"_id": "$status", "count": {"$sum": 1}}}]):
+            counts[row["_id"]] = row["count"]
+        return {**self._metrics, "statuses": counts, "running": self._task is not None}
+
+    async def start(self):
+        """Start the delivery worker"""
+        if self._task:
+            return
+        self._task = asyncio.create_task(self._run())
+        logger.info("Email outbox worker started")
+
+    async def stop(self):
+        """Stop the worker; claimed emails are picked up again once their lock expires"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        logger.info("Email outbox worker stopped")
+
+# Create global email outbox instance
+email_outbox = EmailOutbox()
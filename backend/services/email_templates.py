@@ -0,0 +1,129 @@
+from database import get_database
+from config import settings, resolve_storage_dir
+from jinja2 import Template
+from jinja2.sandbox import ImmutableSandboxedEnvironment
+from enum import Enum
+from typing import Dict, Any, Optional, Tuple
+import logging
+import asyncio
+import time
+
+logger = logging.getLogger(__name__)
+
+class EmailTemplateNotFoundError(Exception):
+    """Raised when a template exists neither in the database nor on disk"""
+
+def humanize(value: Any) -> str:
+    """``web_development`` -> ``Web Development``"""
+    return str(value).replace("_", " ").title()
+
+def template_context(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Plain values for rendering (enum members become their values)"""
+    return {key: value.value if isinstance(value, Enum) else value for key, value in data.items()}
+
+class CompiledEmailTemplate:
+    """Compiled subject and body of one template, with the source version they came from"""
+
+    def __init__(self, subject: Template, body: Template, source: str, version: Any):
+        self.subject = subject
+        self.body = body
+        self.source = source  # "db" or "file"
+        self.version = version
+        self.checked_at = time.monotonic()
+        self.renders = 0
+
+class EmailTemplateEngine:
+    """Jinja2 email templates, compiled once and cached.
+
+    A template is looked up in the ``email_templates`` collection first
+    (by ``name``, so it can be edited without a deploy) and otherwise read
+    from ``email_templates_dir`` as ``{name}.html`` plus
+    ``{name}.subject.txt``. Bodies are rendered with HTML auto-escaping,
+    subjects without, both in Jinja2's immutable sandbox because database
+    templates are editable over the API. A cached template is re-validated
+    at most every ``email_templates_reload_interval`` seconds against the
+    document's ``updated_at`` or the files' mtimes and recompiled only when
+    those changed.
+    """
+
+    def __init__(self):
+        self.root = resolve_storage_dir(settings.email_templates_dir)
+        self._html = ImmutableSandboxedEnvironment(autoescape=True, trim_blocks=True, lstrip_blocks=True)
+        self._text = ImmutableSandboxedEnvironment(autoescape=False)
+        for env in (self._html, self._text):
+            env.filters["humanize"] = humanize
+        self._templates: Dict[str, CompiledEmailTemplate] = {}
+        self._metrics = {"compiles": 0, "renders": 0, "reload_checks": 0}
+
+    def _read_files(self, name: str) -> Optional[Tuple[Tuple[float, float], str, str]]:
+        body_path = self.root / f"{name}.html"
+        subject_path = self.root / f"{name}.subject.txt"
+        try:
+            version = (body_path.stat().st_mtime, subject_path.stat().st_mtime)
+            return version, subject_path.read_text(encoding="utf-8"), body_path.read_text(encoding="utf-8")
+        except FileNotFoundError:
+            return None
+
+    async def _load(self, name: str, cached: Optional[CompiledEmailTemplate]) -> Optional[CompiledEmailTemplate]:
+        """Return ``cached`` if its source is unchanged, else a freshly compiled template"""
+        doc = await get_database().email_templates.find_one({"name": name}, {"_id": 0, "subject": 1, "body": 1, "updated_at": 1})
+        if doc:
+            source, version = "db", doc.get("updated_at")
+            if cached and (cached.source, cached.version) == (source, version):
+                return cached
+            subject, body = doc["subject"], doc["body"]
+        else:
+            files = await asyncio.to_thread(self._read_files, name)
+            if files is None:
+                return None
+            source, version = "file", files[0]
+            if cached and (cached.source, cached.version) == (source, version):
+                return cached
+            subject, body = files[1], files[2]
+
+        self._metrics["compiles"] += 1
+        logger.info(f"Compiled email template {name} from {source}")
+        return CompiledEmailTemplate(self._text.from_string(subject.strip()), self._html.from_string(body), source, version)
+
+    async def get(self, name: str) -> CompiledEmailTemplate:
+        template = self._templates.get(name)
+        if template and time.monotonic() - template.checked_at < settings.email_templates_reload_interval:
+            return template
+
+        self._metrics["reload_checks"] += 1
+        loaded = await self._load(name, template)
+        if loaded is None:
+            raise EmailTemplateNotFoundError(f"Email template {name} not found")
+        loaded.checked_at = time.monotonic()
+        self._templates[name] = loaded
+        return loaded
+
+    async def render(self, name: str, data: Dict[str, Any]) -> Tuple[str, str]:
+        """Render a template to (subject, html body)"""
+        template = await self.get(name)
+        context = template_context(data)
+        template.renders += 1
+        self._metrics["renders"] += 1
+        return template.subject.render(context), template.body.render(context)
+
+    def validate(self, subject: str, body: str):
+        """Compile without caching; raises ``jinja2.TemplateSyntaxError`` on errors"""
+        self._text.from_string(subject)
+        self._html.from_string(body)
+
+    def invalidate(self, name: Optional[str] = None):
+        """Drop compiled templates so the next render reloads them"""
+        if name is None:
+            self._templates.clear()
+        else:
+            self._templates.pop(name, None)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {
+            **self._metrics,
+            "templates": {name: {"source": t.source, "renders": t.renders} for name, t in self._templates.items()},
+            "reload_interval": settings.email_templates_reload_interval,
+        }
+
+# Create global email template engine instance
+email_templates = EmailTemplateEngine()
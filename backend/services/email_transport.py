@@ -0,0 +1,153 @@
+from config import settings
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from typing import Dict, Any, Optional, Deque, List
+import logging
+import asyncio
+import random
+
+logger = logging.getLogger(__name__)
+
+class EmailDeliveryError(Exception):
+    """Raised when a transport could not hand an email over for delivery"""
+
+class EmailTransport:
+    """Delivers emails without blocking the event loop.
+
+    ``send_batch`` delivers one message to several recipients in a single
+    provider call, each recipient getting their own copy. It returns once
+    the provider accepted the message and raises ``EmailDeliveryError``
+    otherwise. This base transport is used when no provider is configured
+    and drops every message.
+    """
+
+    name = "disabled"
+    max_recipients = 1000  # SendGrid's personalizations limit per request
+
+    def __init__(self):
+        self._in_flight = 0
+        self._metrics = {"requests": 0, "sent": 0, "failed": 0}
+
+    async def _deliver(self, recipients: List[str], subject: str, content: str, content_type: str):
+        raise EmailDeliveryError("No email transport configured")
+
+    async def send_batch(self, recipients: List[str], subject: str, content: str, content_type: str = "text/html"):
+        if len(recipients) > self.max_recipients:
+            raise ValueError(f"At most {self.max_recipients} recipients per send")
+        self._in_flight += 1
+        self._metrics["requests"] += 1
+        try:
+            await self._deliver(recipients, subject, content, content_type)
+            self._metrics["sent"] += len(recipients)
+        except Exception:
+            self._metrics["failed"] += len(recipients)
+            raise
+        finally:
+            self._in_flight -= 1
+
+    async def send(self, to_email: str, subject: str, content: str, content_type: str = "text/html"):
+        await self.send_batch([to_email], subject, content, content_type)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {**self._metrics, "transport": self.name, "in_flight": self._in_flight}
+
+    async def close(self):
+        pass
+
+class SendGridTransport(EmailTransport):
+    """SendGrid delivery on a bounded thread pool.
+
+    The SendGrid SDK is synchronous, so each send runs on one of
+    ``max_concurrency`` threads; the semaphore keeps callers waiting on the
+    event loop rather than piling up in the executor's queue.
+    """
+
+    name = "sendgrid"
+
+    def __init__(self, api_key: str, max_concurrency: int, timeout: float):
+        super().__init__()
+        from sendgrid import SendGridAPIClient
+        self.sg = SendGridAPIClient(api_key=api_key)
+        self.sg.client.timeout = timeout
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    @property
+    def executor(self) -> ThreadPoolExecutor:
+        if self._executor is None:
+            self._executor = ThreadPoolExecutor(max_workers=self.max_concurrency, thread_name_prefix="sendgrid")
+        return self._executor
+
+    def _send_sync(self, recipients: List[str], subject: str, content: str, content_type: str) -> int:
+        from sendgrid.helpers.mail import Mail, Email, To, Content
+        from python_http_client.exceptions import HTTPError
+
+        # is_multiple gives every recipient a personalization of their own
+        mail = Mail(Email(settings.sender_email), [To(email) for email in recipients], subject, is_multiple=True)
+        mail.add_content(Content(content_type, content))
+        try:
+            return self.sg.send(mail).status_code
+        except HTTPError as e:
+            return e.status_code
+
+    async def _deliver(self, recipients: List[str], subject: str, content: str, content_type: str):
+        async with self._semaphore:
+            loop = asyncio.get_running_loop()
+            status_code = await loop.run_in_executor(
+                self.executor, self._send_sync, recipients, subject, content, content_type
+            )
+        if status_code not in (200, 201, 202):
+            raise EmailDeliveryError(f"SendGrid returned {status_code}")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {**super().get_metrics(), "max_concurrency": self.max_concurrency}
+
+    async def close(self):
+        """Shut down the worker threads"""
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+class MockEmailTransport(EmailTransport):
+    """Keeps sent emails in memory instead of delivering them, for local testing"""
+
+    name = "mock"
+
+    def __init__(self, latency: float = 0.0, max_concurrency: int = 4, failure_rate: float = 0.0, keep: int = 100):
+        super().__init__()
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.max_concurrency = max_concurrency
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self.outbox: Deque[Dict[str, Any]] = deque(maxlen=keep)
+
+    async def _deliver(self, recipients: List[str], subject: str, content: str, content_type: str):
+        async with self._semaphore:
+            if self.latency:
+                await asyncio.sleep(self.latency)
+            if random.random() < self.failure_rate:
+                raise EmailDeliveryError("Mock transport failure")
+            self.outbox.append({
+                "recipients": recipients,
+                "subject": subject,
+                "content": content,
+                "content_type": content_type,
+                "sent_at": datetime.utcnow(),
+            })
+        logger.info(f"Mock email to {', '.join(recipients)}: {subject}")
+
+    def get_metrics(self) -> Dict[str, Any]:
+        return {**super().get_metrics(), "max_concurrency": self.max_concurrency}
+
+def create_email_transport() -> EmailTransport:
+    """Build the transport selected by ``settings.email_transport``"""
+    if settings.email_transport == "mock":
+        return MockEmailTransport(settings.email_mock_latency, settings.email_max_concurrency, settings.email_mock_failure_rate)
+    if settings.email_transport == "sendgrid" and settings.sendgrid_api_key:
+        return SendGridTransport(settings.sendgrid_api_key, settings.email_max_concurrency, settings.email_send_timeout)
+    return EmailTransport()
+
+# Create global email transport instance
+email_transport = create_email_transport()
@@ -0,0 +1,192 @@
+from config import settings, resolve_storage_dir
+from models import ImageRef
+from services.image_store import image_store
+from singleflight import SingleFlight
+from concurrent.futures import ProcessPoolExecutor
+from collections import OrderedDict
+from pathlib import Path
+from typing import BinaryIO, Dict, Optional, Tuple
+import logging
+import asyncio
+import io
+import multiprocessing
+import os
+import threading
+import uuid
+
+logger = logging.getLogger(__name__)
+
+FORMAT_CONTENT_TYPES = {
+    "WEBP": "image/webp",
+    "JPEG": "image/jpeg",
+    "PNG": "image/png",
+}
+
+def render_derivative(data: bytes, width: int, image_format: str, quality: int) -> bytes:
+    """Resize and re-encode an image (runs in a worker process)"""
+    from PIL import Image, ImageOps
+
+    with Image.open(io.BytesIO(data)) as original:
+        image = ImageOps.exif_transpose(original)
+        if image.mode not in ("RGB", "RGBA"):
+            image = image.convert("RGBA" if image.mode in ("LA", "PA") or "transparency" in image.info else "RGB")
+        if image_format == "JPEG" and image.mode == "RGBA":
+            image = image.convert("RGB")
+
+        # Never upscale: small originals are only re-encoded
+        if image.width > width:
+            height = max(1, round(image.height * width / image.width))
+            image = image.resize((width, height), Image.LANCZOS)
+
+        output = io.BytesIO()
+        image.save(output, format=image_format, quality=quality, optimize=True)
+        return output.getvalue()
+
+class DerivativeCache:
+    """On-disk derivative cache with LRU eviction bounded by total size.
+
+    Recency lives in an in-memory index rebuilt from file modification times
+    on first use; hits bump the mtime so the order survives restarts.
+    """
+
+    def __init__(self, root: str, max_bytes: int):
+        self.root = resolve_storage_dir(root)
+        self.max_bytes = max_bytes
+        self._entries: Optional["OrderedDict[str, int]"] = None
+        self._total = 0
+        # Accessed from worker threads
+        self._lock = threading.Lock()
+
+    def _load(self):
+        self.root.mkdir(parents=True, exist_ok=True)
+        files = [entry for entry in os.scandir(self.root) if entry.is_file() and not entry.name.startswith(".")]
+        files.sort(key=lambda entry: entry.stat().st_mtime)
+        self._entries = OrderedDict((entry.name, entry.stat().st_size) for entry in files)
+        self._total = sum(self._entries.values())
+
+    def _ensure_loaded(self):
+        if self._entries is None:
+            self._load()
+
+    def path(self, name: str) -> Path:
+        return self.root / name
+
+    def get(self, name: str) -> Optional[int]:
+        """Return the cached file size and mark it recently used"""
+        with self._lock:
+            return self._get(name)
+
+    def open(self, name: str) -> Optional[Tuple[BinaryIO, int]]:
+        """Open a cached file for reading and mark it recently used.
+
+        Opening under the lock means eviction cannot remove the file first,
+        and an open handle stays readable after the file is evicted.
+        """
+        with self._lock:
+            size = self._get(name)
+            if size is None:
+                return None
+            return open(self.path(name), "rb"), size
+
+    def _get(self, name: str) -> Optional[int]:
+        self._ensure_loaded()
+        size = self._entries.get(name)
+        if size is None:
+            return None
+        if not self.path(name).exists():
+            self._entries.pop(name)
+            self._total -= size
+            return None
+        self._entries.move_to_end(name)
+        os.utime(self.path(name))
+        return size
+
+    def put(self, name: str, data: bytes):
+        """Store a derivative and evict the least recently used ones over budget"""
+        with self._lock:
+            self._put(name, data)
+
+    def _put(self, name: str, data: bytes):
+        self._ensure_loaded()
+        tmp = self.root / f".{name}.{uuid.uuid4().hex}"
+        tmp.write_bytes(data)
+        os.replace(tmp, self.path(name))
+
+        self._total -= self._entries.pop(name, 0)
+        self._entries[name] = len(data)
+        self._total += len(data)
+
+        while self._total > self.max_bytes and len(self._entries) > 1:
+            evicted, size = self._entries.popitem(last=False)
+            self._total -= size
+            try:
+                os.remove(self.path(evicted))
+            except FileNotFoundError:
+                pass
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            self._ensure_loaded()
+            return {"entries": len(self._entries), "bytes": self._total, "max_bytes": self.max_bytes}
+
+class ImageDerivativeService:
+    """Serves resized, re-encoded variants of stored images at fixed widths.
+
+    Decoding and encoding run in a process pool so request handling never
+    blocks on image work, and concurrent requests for the same missing
+    derivative share a single render.
+    """
+
+    def __init__(self):
+        self.widths = sorted(settings.image_derivative_widths)
+        self.image_format = settings.image_derivative_format.upper()
+        self.content_type = FORMAT_CONTENT_TYPES[self.image_format]
+        self.quality = settings.image_derivative_quality
+        self.cache = DerivativeCache(settings.image_derivative_dir, settings.image_derivative_cache_bytes)
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._rendering = SingleFlight()
+
+    @property
+    def executor(self) -> ProcessPoolExecutor:
+        if self._executor is None:
+            # Forking a process that already runs threads can copy held locks
+            self._executor = ProcessPoolExecutor(
+                max_workers=settings.image_derivative_workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    def name(self, image: ImageRef, width: int) -> str:
+        return f"{image.id}_w{width}.{self.image_format.lower()}"
+
+    async def _render(self, image: ImageRef, width: int, name: str) -> int:
+        data = await image_store.read(image)
+        loop = asyncio.get_running_loop()
+        derivative = await loop.run_in_executor(
+            self.executor, render_derivative, data, width, self.image_format, self.quality
+        )
+        await asyncio.to_thread(self.cache.put, name, derivative)
+        logger.info(f"Rendered derivative {name} ({len(derivative)} bytes)")
+        return len(derivative)
+
+    async def open(self, image: ImageRef, width: int) -> Tuple[ImageRef, BinaryIO]:
+        """Get (rendering if needed) the derivative of ``image`` at ``width``, opened for reading"""
+        name = self.name(image, width)
+        opened = await asyncio.to_thread(self.cache.open, name)
+
+        # Another render may evict it again before it is opened; render until it sticks
+        while opened is None:
+            await self._rendering.do(name, lambda: self._render(image, width, name))
+            opened = await asyncio.to_thread(self.cache.open, name)
+
+        handle, size = opened
+        return ImageRef(id=name, content_type=self.content_type, size=size), handle
+
+    async def stop(self):
+        """Shut down the worker processes"""
+        if self._executor:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+# Create global image derivative service instance
+image_derivative_service = ImageDerivativeService()
@@ -0,0 +1,224 @@
+from motor.motor_asyncio import AsyncIOMotorGridFSBucket
+from database import get_database
+from config import settings, resolve_storage_dir
+from models import ImageRef
+from abc import ABC, abstractmethod
+from pathlib import Path
+from typing import Optional, AsyncIterator, BinaryIO
+import logging
+import asyncio
+import hashlib
+import base64
+import binascii
+import json
+import os
+import re
+import uuid
+
+logger = logging.getLogger(__name__)
+
+IMAGE_ID_PATTERN = re.compile(r"^[0-9a-f]{64}$")
+DATA_URI_PATTERN = re.compile(r"^data:(?P<content_type>[\w/+.-]+);base64,(?P<data>.*)$", re.DOTALL)
+CHUNK_SIZE = 64 * 1024
+
+class ImageValidationError(ValueError):
+    """Raised when uploaded image data is rejected"""
+
+async def iter_file_range(path: Path, start: int, end: int) -> AsyncIterator[bytes]:
+    """Stream bytes ``start``..``end`` (inclusive) of a file without blocking the loop"""
+    handle = await asyncio.to_thread(open, path, "rb")
+    async for chunk in iter_handle_range(handle, start, end):
+        yield chunk
+
+async def iter_handle_range(handle: BinaryIO, start: int, end: int) -> AsyncIterator[bytes]:
+    """Stream bytes ``start``..``end`` (inclusive) of an open file, closing it afterwards"""
+    try:
+        await asyncio.to_thread(handle.seek, start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = await asyncio.to_thread(handle.read, min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+    finally:
+        await asyncio.to_thread(handle.close)
+
+def is_image_id(value: str) -> bool:
+    """Whether ``value`` is an image reference rather than inline image data"""
+    return bool(IMAGE_ID_PATTERN.match(value))
+
+def sniff_content_type(data: bytes) -> Optional[str]:
+    """Detect the image type from its magic bytes"""
+    if data.startswith(b"\xff\xd8\xff"):
+        return "image/jpeg"
+    if data.startswith(b"\x89PNG\r\n\x1a\n"):
+        return "image/png"
+    if data[:6] in (b"GIF87a", b"GIF89a"):
+        return "image/gif"
+    if data[:4] == b"RIFF" and data[8:12] == b"WEBP":
+        return "image/webp"
+    return None
+
+class ImageStore(ABC):
+    """Content-addressed image storage.
+
+    Images are keyed by the SHA-256 of their bytes, so identical uploads are
+    stored once and a reference never changes meaning. Documents only keep
+    the 64-character id; the bytes are served from ``/api/images/{id}``.
+    """
+
+    @abstractmethod
+    async def _write(self, image: ImageRef, data: bytes):
+        """Persist the bytes of a new image"""
+
+    @abstractmethod
+    async def get(self, image_id: str) -> Optional[ImageRef]:
+        """Get image metadata, or None if it is not stored"""
+
+    @abstractmethod
+    def iter_range(self, image: ImageRef, start: int, end: int) -> AsyncIterator[bytes]:
+        """Stream bytes ``start``..``end`` (inclusive) of a stored image"""
+
+    async def read(self, image: ImageRef) -> bytes:
+        """Read a whole stored image into memory"""
+        return b"".join([chunk async for chunk in self.iter_range(image, 0, image.size - 1)])
+
+    def validate(self, data: bytes) -> str:
+        """Check size and type of image data and return its content type"""
+        if not data:
+            raise ImageValidationError("Empty image")
+        if len(data) > settings.max_file_size:
+            raise ImageValidationError(f"Image exceeds {settings.max_file_size} bytes")
+
+        content_type = sniff_content_type(data)
+        if content_type not in settings.allowed_image_types:
+            raise ImageValidationError("Unsupported image type")
+        return content_type
+
+    async def put(self, data: bytes) -> ImageRef:
+        """Store image bytes (deduplicated by content hash)"""
+        content_type = self.validate(data)
+        image_id = hashlib.sha256(data).hexdigest()
+
+        existing = await self.get(image_id)
+        if existing:
+            return existing
+
+        image = ImageRef(id=image_id, content_type=content_type, size=len(data))
+        await self._write(image, data)
+        logger.info(f"Stored image {image_id} ({image.size} bytes)")
+        return image
+
+    async def ingest(self, value: str) -> str:
+        """Normalize an image field value to an image id.
+
+        Accepts the id of a stored image, a ``data:`` URI or a bare Base64
+        string, so clients that still send inline images keep working.
+        """
+        if is_image_id(value):
+            if not await self.get(value):
+                raise ImageValidationError(f"Image {value} not found")
+            return value
+
+        match = DATA_URI_PATTERN.match(value)
+        encoded = match.group("data") if match else value
+        try:
+            data = base64.b64decode(encoded, validate=True)
+        except (binascii.Error, ValueError):
+            raise ImageValidationError("Image must be an image id or Base64 data")
+
+        image = await self.put(data)
+        return image.id
+
+class LocalImageStore(ImageStore):
+    """Stores images on the local filesystem, sharded by hash prefix"""
+
+    def __init__(self, root: str):
+        self.root = resolve_storage_dir(root)
+
+    def _path(self, image_id: str) -> Path:
+        return self.root / image_id[:2] / image_id[2:4] / image_id
+
+    def _write_files(self, image: ImageRef, data: bytes):
+        path = self._path(image.id)
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Write to a temporary name and rename so readers never see partial files
+        for target, payload in ((path, data), (path.with_suffix(".json"), image.json().encode())):
+            tmp = target.with_name(f".{target.name}.{uuid.uuid4().hex}")
+            tmp.write_bytes(payload)
+            os.replace(tmp, target)
+
+    async def _write(self, image: ImageRef, data: bytes):
+        await asyncio.to_thread(self._write_files, image, data)
+
+    def _read_meta(self, image_id: str) -> Optional[ImageRef]:
+        try:
+            return ImageRef(**json.loads(self._path(image_id).with_suffix(".json").read_bytes()))
+        except FileNotFoundError:
+            return None
+
+    async def get(self, image_id: str) -> Optional[ImageRef]:
+        if not is_image_id(image_id):
+            return None
+        return await asyncio.to_thread(self._read_meta, image_id)
+
+    def iter_range(self, image: ImageRef, start: int, end: int) -> AsyncIterator[bytes]:
+        return iter_file_range(self._path(image.id), start, end)
+
+class GridFSImageStore(ImageStore):
+    """Stores images in a GridFS bucket, one file per content hash"""
+
+    def __init__(self, bucket_name: str = "images"):
+        self.bucket_name = bucket_name
+        self._bucket: Optional[AsyncIOMotorGridFSBucket] = None
+
+    @property
+    def bucket(self) -> AsyncIOMotorGridFSBucket:
+        if self._bucket is None:
+            self._bucket = AsyncIOMotorGridFSBucket(get_database(), bucket_name=self.bucket_name)
+        return self._bucket
+
+    async def _write(self, image: ImageRef, data: bytes):
+        await self.bucket.upload_from_stream(
+            image.id,
+            data,
+            metadata={"content_type": image.content_type}
+        )
+
+    async def get(self, image_id: str) -> Optional[ImageRef]:
+        if not is_image_id(image_id):
+            return None
+        db = get_database()
+        stored = await db[f"{self.bucket_name}.files"].find_one({"filename": image_id})
+        if not stored:
+            return None
+        return ImageRef(
+            id=image_id,
+            content_type=stored.get("metadata", {}).get("content_type", "application/octet-stream"),
+            size=stored["length"]
+        )
+
+    async def iter_range(self, image: ImageRef, start: int, end: int) -> AsyncIterator[bytes]:
+        stream = await self.bucket.open_download_stream_by_name(image.id)
+        try:
+            stream.seek(start)
+            remaining = end - start + 1
+            while remaining > 0:
+                chunk = await stream.read(min(CHUNK_SIZE, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+        finally:
+            stream.close()
+
+def create_image_store() -> ImageStore:
+    """Build the image store selected by ``settings.image_store_backend``"""
+    if settings.image_store_backend == "gridfs":
+        return GridFSImageStore()
+    return LocalImageStore(settings.image_store_dir)
+
+# Create global image store instance
+image_store = create_image_store()
@@ -0,0 +1,192 @@
+from database import get_database
+from config import settings
+from singleflight import SingleFlight
+from services.cache_backend import CacheBackend, cache
+from datetime import datetime, timedelta
+from typing import Dict, Any, Optional, List, Tuple, Callable, Awaitable
+import logging
+import hashlib
+import re
+import unicodedata
+
+logger = logging.getLogger(__name__)
+
+TOKEN_PATTERN = re.compile(r"\w+")
+NEAR_DUPLICATE_CANDIDATES = 50
+
+def normalize_prompt(prompt: str) -> List[str]:
+    """Lowercased word tokens with punctuation and spacing differences removed"""
+    return TOKEN_PATTERN.findall(unicodedata.normalize("NFKC", prompt).lower())
+
+def prompt_shingles(tokens: List[str], size: int) -> List[str]:
+    """Hashed overlapping runs of ``size`` tokens"""
+    size = max(1, min(size, len(tokens)))
+    shingles = {" ".join(tokens[i:i + size]) for i in range(len(tokens) - size + 1)}
+    return sorted(hashlib.blake2b(shingle.encode(), digest_size=8).hexdigest() for shingle in shingles)
+
+def jaccard(a: List[str], b: List[str]) -> float:
+    a, b = set(a), set(b)
+    return len(a & b) / len(a | b) if a or b else 1.0
+
+def _digest(*parts: str) -> str:
+    return hashlib.sha256("\0".join(parts).encode()).hexdigest()
+
+class PromptCache:
+    """Persistent prompt -> completion cache for AIService calls.
+
+    Entries are keyed on model + normalized system message and prompt and
+    stored in the ``ai_prompt_cache`` collection (expired by a TTL index),
+    fronted by the shared cache backend so repeat hits skip Mongo too.
+    Each AIService method has its own TTL (``settings.prompt_cache_ttls``).
+
+    With ``prompt_cache_near_duplicates`` enabled, an exact miss falls back
+    to the most similar cached prompt for the same model and system message,
+    by Jaccard similarity of token shingles, if it clears
+    ``prompt_cache_similarity``.
+    """
+
+    def __init__(self, backend: CacheBackend):
+        self.backend = backend
+        self.flight = SingleFlight()
+        self._metrics = {"hits": 0, "db_hits": 0, "near_hits": 0, "misses": 0, "errors": 0}
+
+    def ttl(self, method: str) -> int:
+        return settings.prompt_cache_ttls.get(method, settings.prompt_cache_default_ttl)
+
+    async def _find(self, key: str, scope: str, shingles: List[str]) -> Optional[Dict[str, Any]]:
+        collection = get_database().ai_prompt_cache
+        now = datetime.utcnow()
+
+        entry = await collection.find_one({"_id": key, "expires_at": {"$gt": now}}, {"completion": 1, "expires_at": 1})
+        if entry:
+            self._metrics["db_hits"] += 1
+            return entry
+
+        if not settings.prompt_cache_near_duplicates or not shingles:
+            return None
+
+        best, best_score = None, 0.0
+        cursor = collection.find(
+            {"scope": scope, "shingles": {"$in": shingles}, "expires_at": {"$gt": now}},
+            {"completion": 1, "expires_at": 1, "shingles": 1}
+        ).limit(NEAR_DUPLICATE_CANDIDATES)
+        async for candidate in cursor:
+            score = jaccard(shingles, candidate["shingles"])
+            if score > best_score:
+                best, best_score = candidate, score
+
+        if best_score >= settings.prompt_cache_similarity:
+            self._metrics["near_hits"] += 1
+            return best
+        return None
+
+    async def _store(self, key: str, scope: str, method: str, model: str,
+                     tokens: List[str], shingles: List[str], completion: str, ttl: int):
+        now = datetime.utcnow()
+        await get_database().ai_prompt_cache.replace_one(
+            {"_id": key},
+            {
+                "scope": scope,
+                "method": method,
+                "model": model,
+                "prompt": " ".join(tokens),
+                "shingles": shingles,
+                "completion": completion,
+                "created_at": now,
+                "expires_at": now + timedelta(seconds=ttl),
+            },
+            upsert=True
+        )
+
+    def _keys(self, model: str, system_message: str, prompt: str) -> Tuple[List[str], str, str]:
+        tokens = normalize_prompt(prompt)
+        # Prompts for the same model and system message share a scope
+        scope = _digest(model, " ".join(normalize_prompt(system_message)))
+        return tokens, scope, _digest(scope, " ".join(tokens))
+
+    async def _lookup(self, key: str, scope: str, tokens: List[str]) -> Optional[str]:
+        shingles = prompt_shingles(tokens, settings.prompt_cache_shingle_size) if tokens else []
+        try:
+            entry = await self._find(key, scope, shingles)
+        except Exception as e:
+            # The cache must never take the AI features down with it
+            self._metrics["errors"] += 1
+            logger.warning(f"Prompt cache lookup failed: {e}")
+            return None
+
+        if not entry:
+            return None
+        remaining = (entry["expires_at"] - datetime.utcnow()).total_seconds()
+        await self.backend.set(f"prompt:{key}", entry["completion"].encode(), max(remaining, 1))
+        return entry["completion"]
+
+    async def _put(self, key: str, scope: str, method: str, model: str, tokens: List[str], completion: str):
+        ttl = self.ttl(method)
+        await self.backend.set(f"prompt:{key}", completion.encode(), ttl)
+        try:
+            shingles = prompt_shingles(tokens, settings.prompt_cache_shingle_size) if tokens else []
+            await self._store(key, scope, method, model, tokens, shingles, completion, ttl)
+        except Exception as e:
+            self._metrics["errors"] += 1
+            logger.warning(f"Failed to persist prompt cache entry: {e}")
+
+    async def _lookup_or_complete(self, key: str, scope: str, method: str, model: str,
+                                  tokens: List[str], complete: Callable[[], Awaitable[str]]) -> str:
+        completion = await self._lookup(key, scope, tokens)
+        if completion is not None:
+            return completion
+
+        self._metrics["misses"] += 1
+        completion = await complete()
+        await self._put(key, scope, method, model, tokens, completion)
+        return completion
+
+    async def get(self, method: str, model: str, system_message: str, prompt: str) -> Optional[str]:
+        """Return the cached completion for this prompt, if any"""
+        if not settings.prompt_cache_enabled:
+            return None
+
+        tokens, scope, key = self._keys(model, system_message, prompt)
+        cached = await self.backend.get(f"prompt:{key}")
+        if cached is not None:
+            self._metrics["hits"] += 1
+            return cached.decode()
+
+        completion = await self._lookup(key, scope, tokens)
+        if completion is None:
+            self._metrics["misses"] += 1
+        return completion
+
+    async def put(self, method: str, model: str, system_message: str, prompt: str, completion: str):
+        """Cache a completion obtained outside ``get_or_complete`` (e.g. streamed)"""
+        if settings.prompt_cache_enabled:
+            tokens, scope, key = self._keys(model, system_message, prompt)
+            await self._put(key, scope, method, model, tokens, completion)
+
+    async def get_or_complete(self, method: str, model: str, system_message: str, prompt: str,
+                              complete: Callable[[], Awaitable[str]]) -> str:
+        """Return the cached completion for this prompt, calling ``complete`` on a miss"""
+        if not settings.prompt_cache_enabled:
+            return await complete()
+
+        tokens, scope, key = self._keys(model, system_message, prompt)
+        cached = await self.backend.get(f"prompt:{key}")
+        if cached is not None:
+            self._metrics["hits"] += 1
+            return cached.decode()
+
+        return await self.flight.do(
+            key, lambda: self._lookup_or_complete(key, scope, method, model, tokens, complete)
+        )
+
+    def get_metrics(self) -> Dict[str, Any]:
+        lookups = sum(self._metrics[name] for name in ("hits", "db_hits", "near_hits", "misses"))
+        hits = lookups - self._metrics["misses"]
+        return {
+            **self._metrics,
+            "hit_ratio": round(hits / lookups, 4) if lookups else None,
+            "near_duplicates": settings.prompt_cache_near_duplicates,
+        }
+
+# Create global prompt cache instance
+prompt_cache = PromptCache(cache)
@@ -0,0 +1,164 @@
+from config import settings
+from http_utils import http_date, is_not_modified
+from services.cache_backend import CacheBackend, cache
+from pydantic import BaseModel
+from starlette.requests import Request
+from starlette.responses import Response
+from collections import defaultdict
+from datetime import datetime
+from enum import Enum
+from functools import wraps
+from typing import Dict, Any, Optional, Callable, Awaitable, NamedTuple
+from urllib.parse import urlencode
+import inspect
+import logging
+import hashlib
+import json
+import pydantic_core
+
+logger = logging.getLogger(__name__)
+
+class CachedBody(NamedTuple):
+    body: bytes
+    etag: str  # Strong validator: hash of the serialized body
+    last_modified: Optional[datetime]
+
+def last_modified_of(value: Any) -> Optional[datetime]:
+    """``updated_at`` of a single rendered document, if it carries one.
+
+    Lists get no Last-Modified: deleting an item or shifting a page leaves
+    the newest ``updated_at`` unchanged, so only their ETag is reliable.
+    """
+    if isinstance(value, BaseModel):
+        return getattr(value, "updated_at", None)
+    if isinstance(value, dict):
+        stamp = value.get("updated_at")
+        return stamp if isinstance(stamp, datetime) else None
+    return None
+
+class ResponseCache:
+    """Read-through cache of serialized JSON responses.
+
+    Entries are keyed on namespace + normalized query parameters and hold
+    the JSON bytes, so a hit skips both the database and Pydantic
+    validation/serialization. Entries live in the shared cache backend, so
+    every worker sees the same responses, and expire after ``ttl`` seconds.
+    Writes invalidate a whole namespace by bumping its generation counter,
+    which makes every older key unreachable in O(1).
+
+    Each entry also carries an ETag (and, for single documents, a
+    Last-Modified) computed once at render time, so conditional requests
+    are answered with a bodyless 304.
+    """
+
+    def __init__(self, backend: CacheBackend, ttl: float):
+        self.backend = backend
+        self.ttl = ttl
+        self._metrics: Dict[str, Dict[str, int]] = defaultdict(
+            lambda: {"hits": 0, "misses": 0, "not_modified": 0, "invalidations": 0}
+        )
+
+    @staticmethod
+    def _normalize(value: Any) -> str:
+        if isinstance(value, Enum):
+            return str(value.value)
+        if isinstance(value, bool):
+            return "true" if value else "false"
+        return str(value)
+
+    @staticmethod
+    def _pack(cached: CachedBody) -> bytes:
+        header = json.dumps({
+            "etag": cached.etag,
+            "last_modified": cached.last_modified.isoformat() if cached.last_modified else None,
+        }).encode()
+        return header + b"\n" + cached.body
+
+    @staticmethod
+    def _unpack(value: bytes) -> CachedBody:
+        header, body = value.split(b"\n", 1)
+        meta = json.loads(header)
+        last_modified = datetime.fromisoformat(meta["last_modified"]) if meta["last_modified"] else None
+        return CachedBody(body=body, etag=meta["etag"], last_modified=last_modified)
+
+    async def make_key(self, namespace: str, params: Dict[str, Any]) -> str:
+        """Build a cache key from the namespace and its non-empty params"""
+        generation = await self.backend.get(f"response:{namespace}:generation")
+        query = urlencode(sorted(
+            (name, self._normalize(value)) for name, value in params.items() if value is not None
+        ))
+        return f"response:{namespace}:{int(generation or 0)}?{query}"
+
+    async def invalidate(self, namespace: str):
+        """Drop every cached response in ``namespace``"""
+        await self.backend.incr(f"response:{namespace}:generation")
+        self._metrics[namespace]["invalidations"] += 1
+
+    async def get_or_render(self, namespace: str, params: Dict[str, Any], render: Callable[[], Awaitable[Any]]) -> CachedBody:
+        """Return cached JSON bytes, rendering and caching them on a miss"""
+        key = await self.make_key(namespace, params)
+        rendered = False
+
+        async def load() -> bytes:
+            nonlocal rendered
+            rendered = True
+            result = await render()
+            serialized = pydantic_core.to_json(result)
+            return self._pack(CachedBody(
+                body=serialized,
+                etag=f'"{hashlib.blake2b(serialized, digest_size=16).hexdigest()}"',
+                last_modified=last_modified_of(result)
+            ))
+
+        value = await self.backend.get_or_set(key, load, self.ttl)
+        self._metrics[namespace]["misses" if rendered else "hits"] += 1
+        return self._unpack(value)
+
+    def cached(self, namespace: str):
+        """Decorator caching an endpoint's result keyed on its parameters.
+
+        The wrapped endpoint also answers If-None-Match / If-Modified-Since
+        with 304 and sets ETag, Cache-Control and (for single documents)
+        Last-Modified headers.
+        """
+        def decorator(endpoint: Callable[..., Awaitable[Any]]):
+            @wraps(endpoint)
+            async def wrapper(request: Request, **params):
+                cached = await self.get_or_render(namespace, params, lambda: endpoint(**params))
+
+                headers = {"ETag": cached.etag, "Cache-Control": settings.http_cache_control}
+                if cached.last_modified:
+                    headers["Last-Modified"] = http_date(cached.last_modified)
+
+                if is_not_modified(request.headers, cached.etag, cached.last_modified):
+                    self._metrics[namespace]["not_modified"] += 1
+                    return Response(status_code=304, headers=headers)
+                return Response(content=cached.body, media_type="application/json", headers=headers)
+
+            # Expose the endpoint's parameters plus the request to FastAPI
+            signature = inspect.signature(endpoint)
+            request_param = inspect.Parameter("request", inspect.Parameter.KEYWORD_ONLY, annotation=Request)
+            wrapper.__signature__ = signature.replace(parameters=[
+                *[param.replace(kind=inspect.Parameter.KEYWORD_ONLY) for param in signature.parameters.values()],
+                request_param,
+            ])
+            return wrapper
+        return decorator
+
+    def get_metrics(self) -> Dict[str, Any]:
+        """Hit/miss metrics per namespace (for this worker)"""
+        namespaces = {}
+        for namespace, counters in self._metrics.items():
+            lookups = counters["hits"] + counters["misses"]
+            namespaces[namespace] = {
+                **counters,
+                "hit_ratio": round(counters["hits"] / lookups, 4) if lookups else None,
+            }
+        return {
+            "backend": type(self.backend).__name__,
+            "ttl": self.ttl,
+            "namespaces": namespaces,
+        }
+
+# Create global response cache instance
+response_cache = ResponseCache(cache, settings.response_cache_ttl)
@@ -0,0 +1,41 @@
+from typing import Dict, Any, Callable, Awaitable, Hashable, TypeVar
+import asyncio
+
+T = TypeVar("T")
+
+class SingleFlight:
+    """Coalesces concurrent identical calls ("single-flight").
+
+    The first caller for a key runs the coroutine and every caller that
+    arrives while it is in flight awaits the same result (or exception).
+    Nothing is kept once the call completes, so this only removes
+    duplicate concurrent work; pair it with a cache for reuse over time.
+    """
+
+    def __init__(self):
+        self._inflight: Dict[Hashable, asyncio.Future] = {}
+        self.calls = 0
+        self.shared = 0
+
+    async def do(self, key: Hashable, fn: Callable[[], Awaitable[T]]) -> T:
+        """Run ``fn`` for ``key`` unless a call for it is already in flight"""
+        future = self._inflight.get(key)
+        if future is None:
+            self.calls += 1
+            future = asyncio.ensure_future(fn())
+            self._inflight[key] = future
+            future.add_done_callback(lambda _: self._inflight.pop(key, None))
+        else:
+            self.shared += 1
+
+        # A cancelled caller must not cancel the call the others are waiting on
+        return await asyncio.shield(future)
+
+    def get_metrics(self) -> Dict[str, Any]:
+        total = self.calls + self.shared
+        return {
+            "calls": self.calls,
+            "shared": self.shared,
+            "in_flight": len(self._inflight),
+            "coalesce_ratio": round(self.shared / total, 4) if total else None,
+        }
@@ -3,6 +3,7 @@ import { Sparkles, Download, Copy, RefreshCw, FileText, Image, Video, Mic } from
 import { Card, CardContent, CardDescription, CardHeader, CardTitle } from './ui/card';
 import { Button } from './ui/button';
 import TerminalWindow from './TerminalWindow';
+import { postEventStream } from '../lib/sse';
 
 const AIContentGenerator = ({ className = "" }) => {
   const [isGenerating, setIsGenerating] = useState(false);
@@ -23,24 +24,19 @@ const AIContentGenerator = ({ className = "" }) => {
     setIsGenerating(true);
     try {
       const backendUrl = process.env.REACT_APP_BACKEND_URL;
-      const response = await fetch(`${backendUrl}/api/content/generate`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          content_type: contentType,
-          prompt: prompt
-        })
-      });
+      setGeneratedContent('');
 
-      const result = await response.json();
-      
-      if (result.success) {
-        setGeneratedContent(result.data.content);
-      } else {
-        setGeneratedContent('ERROR: Failed to generate content. Please try again.');
-      }
+      // Show the content as it is generated
+      await postEventStream(`${backendUrl}/api/content/generate/stream`, {
+        content_type: contentType,
+        prompt: prompt
+      }, (event, data) => {
+        if (event === 'token') {
+          setGeneratedContent(prev => prev + data.text);
+        } else if (event === 'error') {
+          setGeneratedContent('ERROR: Failed to generate content. Please try again.');
+        }
+      });
     } catch (error) {
       console.error('Error generating content:', error);
       setGeneratedContent('ERROR: Connection failed. Please check your connection and try again.');
@@ -29,7 +29,7 @@ const AdminDashboard = ({ className = "" }) => {
       // Load recent contacts
       const contactsResponse = await fetch(`${backendUrl}/api/contact?limit=10`);
       const contactsData = await contactsResponse.json();
-      setContacts(Array.isArray(contactsData) ? contactsData : []);
+      setContacts(Array.isArray(contactsData.items) ? contactsData.items : []);
 
     } catch (error) {
       console.error('Error loading dashboard data:', error);
@@ -2,6 +2,7 @@ import React, { useState, useEffect, useRef } from 'react';
 import { MessageCircle, Send, Bot, User, Minimize2, Maximize2, X } from 'lucide-react';
 import { Button } from './ui/button';
 import { Card, CardContent, CardHeader, CardTitle } from './ui/card';
+import { postEventStream } from '../lib/sse';
 
 const MatrixChatSystem = () => {
   const [isOpen, setIsOpen] = useState(false);
@@ -83,31 +84,39 @@ const MatrixChatSystem = () => {
 
     try {
       const backendUrl = process.env.REACT_APP_BACKEND_URL;
-      const response = await fetch(`${backendUrl}/api/chat/message`, {
-        method: 'POST',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          session_id: sessionId,
-          message: inputMessage
-        })
+      const botMessageId = Date.now() + 2;
+      let started = false;
+
+      // Stream the reply token by token, replacing the typing indicator on the first one
+      await postEventStream(`${backendUrl}/api/chat/message/stream`, {
+        session_id: sessionId,
+        message: inputMessage
+      }, (event, data) => {
+        if (event === 'token') {
+          const isFirst = !started;
+          started = true;
+          setMessages(prev => isFirst
+            ? [
+                ...prev.filter(msg => !msg.typing),
+                { id: botMessageId, type: 'bot', message: data.text, timestamp: new Date() }
+              ]
+            : prev.map(msg => msg.id === botMessageId ? { ...msg, message: msg.message + data.text } : msg)
+          );
+        } else if (event === 'error') {
+          throw new Error(data.detail);
+        }
       });
 
-      if (response.ok) {
-        const data = await response.json();
-        // Remove typing indicator and add real response
+      if (!started) {
         setMessages(prev => [
           ...prev.filter(msg => !msg.typing),
           {
-            id: Date.now() + 2,
+            id: botMessageId,
             type: 'bot',
-            message: data.data.response || 'I apologize, but I cannot process your request at the moment. Please contact our team directly.',
+            message: 'I apologize, but I cannot process your request at the moment. Please contact our team directly.',
             timestamp: new Date()
           }
         ]);
-      } else {
-        throw new Error('Failed to send message');
       }
     } catch (error) {
       console.error('Error sending message:', error);
@@ -0,0 +1,34 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+import pytest
+
+# The backend is a flat package of top-level modules (``config``, ``services``...)
+BACKEND_DIR = Path(__file__).resolve().parent.parent / "backend"
+sys.path.insert(0, str(BACKEND_DIR))
+
+# Keep module-level singletons away from real services and the source tree
+_scratch = tempfile.mkdtemp(prefix="nowhere-tests-")
+os.environ.setdefault("IMAGE_STORE_DIR", os.path.join(_scratch, "images"))
+os.environ.setdefault("IMAGE_DERIVATIVE_DIR", os.path.join(_scratch, "derivatives"))
+os.environ.setdefault("CACHE_BACKEND", "memory")
+os.environ.setdefault("EMAIL_TRANSPORT", "mock")
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def mock_db(monkeypatch):
+    """An in-memory Mongo (mongomock-motor) behind ``get_database()``"""
+    from mongomock_motor import AsyncMongoMockClient
+    import database
+
+    client = AsyncMongoMockClient()
+    monkeypatch.setattr(database.db, "client", client)
+    monkeypatch.setattr(database.db, "db", client["nowhere_digital_test"])
+    return database.db.db
@@ -0,0 +1,159 @@
+import time
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime
+
+import httpx
+import pytest
+
+from config import settings
+from services import ai_provider as ai_provider_module
+from services.ai_provider import AIProviderClient, AIProviderError, TokenBucket, retry_after_seconds
+
+pytestmark = pytest.mark.anyio
+
+COMPLETION = {"choices": [{"message": {"content": "Hello from the mock provider"}}]}
+
+
+@pytest.fixture
+def no_sleep(monkeypatch):
+    """Record backoff delays instead of sleeping through them"""
+    delays = []
+
+    async def sleep(delay):
+        delays.append(delay)
+
+    monkeypatch.setattr(ai_provider_module.asyncio, "sleep", sleep)
+    return delays
+
+
+def make_client(monkeypatch, responses):
+    """A provider client whose transport replays ``responses`` in order"""
+    monkeypatch.setattr(settings, "ai_rate_limit", 0)
+    provider = AIProviderClient()
+    provider.api_key = "test-key"
+    seen = []
+
+    def handler(request: httpx.Request) -> httpx.Response:
+        seen.append(request)
+        response = responses.pop(0)
+        if isinstance(response, Exception):
+            raise response
+        return response
+
+    provider._client = httpx.AsyncClient(base_url="https://provider.test/v1", transport=httpx.MockTransport(handler))
+    return provider, seen
+
+
+def test_retry_after_seconds():
+    assert retry_after_seconds(httpx.Response(429, headers={"Retry-After": "3"})) == 3.0
+    assert retry_after_seconds(httpx.Response(429, headers={"Retry-After": "-1"})) == 0.0
+    assert retry_after_seconds(httpx.Response(429)) is None
+    assert retry_after_seconds(httpx.Response(429, headers={"Retry-After": "soon"})) is None
+
+    later = format_datetime(datetime.now(timezone.utc) + timedelta(seconds=30), usegmt=True)
+    assert 25 <= retry_after_seconds(httpx.Response(503, headers={"Retry-After": later})) <= 30
+
+
+async def test_retries_throttled_and_server_errors_then_succeeds(monkeypatch, no_sleep):
+    monkeypatch.setattr(settings, "ai_max_retries", 3)
+    provider, seen = make_client(monkeypatch, [
+        httpx.Response(429, headers={"Retry-After": "2"}),
+        httpx.Response(503),
+        httpx.Response(200, json=COMPLETION),
+    ])
+
+    reply = await provider.chat([{"role": "user", "content": "hi"}], "gpt-4o")
+
+    assert reply == "Hello from the mock provider"
+    assert len(seen) == 3
+    metrics = provider.get_metrics()
+    assert (metrics["requests"], metrics["retries"], metrics["throttled"], metrics["errors"]) == (3, 2, 1, 0)
+    # The 429 waits exactly as long as Retry-After asks; the 503 uses jittered backoff
+    assert no_sleep[0] == 2.0
+    assert 0 <= no_sleep[1] <= settings.ai_retry_base_delay * 2
+    await provider.close()
+
+
+async def test_retry_after_is_capped(monkeypatch, no_sleep):
+    monkeypatch.setattr(settings, "ai_retry_max_delay", 5)
+    provider, _ = make_client(monkeypatch, [
+        httpx.Response(429, headers={"Retry-After": "120"}),
+        httpx.Response(200, json=COMPLETION),
+    ])
+
+    await provider.chat([{"role": "user", "content": "hi"}], "gpt-4o")
+    assert no_sleep == [5]
+    await provider.close()
+
+
+async def test_transport_errors_are_retried(monkeypatch, no_sleep):
+    provider, _ = make_client(monkeypatch, [
+        httpx.ConnectError("connection refused"),
+        httpx.Response(200, json=COMPLETION),
+    ])
+
+    assert await provider.chat([{"role": "user", "content": "hi"}], "gpt-4o") == "Hello from the mock provider"
+    assert provider.get_metrics()["retries"] == 1
+    await provider.close()
+
+
+async def test_gives_up_after_max_retries(monkeypatch, no_sleep):
+    monkeypatch.setattr(settings, "ai_max_retries", 2)
+    provider, seen = make_client(monkeypatch, [httpx.Response(500) for _ in range(3)])
+
+    with pytest.raises(AIProviderError):
+        await provider.chat([{"role": "user", "content": "hi"}], "gpt-4o")
+    assert len(seen) == 3
+    metrics = provider.get_metrics()
+    assert (metrics["retries"], metrics["errors"]) == (2, 1)
+    await provider.close()
+
+
+async def test_client_errors_are_not_retried(monkeypatch, no_sleep):
+    provider, seen = make_client(monkeypatch, [httpx.Response(400), httpx.Response(200, json=COMPLETION)])
+
+    with pytest.raises(AIProviderError):
+        await provider.chat([{"role": "user", "content": "hi"}], "gpt-4o")
+    assert len(seen) == 1
+    assert provider.get_metrics()["retries"] == 0
+    assert no_sleep == []
+    await provider.close()
+
+
+async def test_stream_chat_yields_deltas(monkeypatch, no_sleep):
+    body = (
+        'data: {"choices": [{"delta": {"content": "Hel"}}]}\n\n'
+        'data: {"choices": [{"delta": {"content": "lo"}}]}\n\n'
+        "data: [DONE]\n\n"
+    )
+    provider, _ = make_client(monkeypatch, [
+        httpx.Response(429, headers={"Retry-After": "0"}),
+        httpx.Response(200, text=body),
+    ])
+
+    chunks = [chunk async for chunk in provider.stream_chat([{"role": "user", "content": "hi"}], "gpt-4o")]
+    assert chunks == ["Hel", "lo"]
+    assert provider.get_metrics()["throttled"] == 1
+    await provider.close()
+
+
+async def test_token_bucket_allows_burst_then_limits_rate():
+    bucket = TokenBucket(rate=20, capacity=5)
+
+    start = time.monotonic()
+    for _ in range(5):
+        await bucket.acquire()
+    assert time.monotonic() - start < 0.1
+
+    for _ in range(5):
+        await bucket.acquire()
+    # Five more tokens at 20/s take about 0.25s to refill
+    assert time.monotonic() - start >= 0.2
+
+
+async def test_token_bucket_disabled_with_zero_rate():
+    bucket = TokenBucket(rate=0, capacity=1)
+    start = time.monotonic()
+    for _ in range(100):
+        await bucket.acquire()
+    assert time.monotonic() - start < 0.1
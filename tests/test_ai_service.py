@@ -0,0 +1,67 @@
+import asyncio
+
+import pytest
+
+from services.ai_provider import AIProviderClient, ai_provider
+from services.ai_service import AIService
+from services.cache_backend import MemoryCacheBackend
+from services import ai_service as ai_service_module
+from services.prompt_cache import PromptCache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def prompt_cache(mock_db, monkeypatch):
+    cache = PromptCache(MemoryCacheBackend(max_entries=100))
+    monkeypatch.setattr(ai_service_module, "prompt_cache", cache)
+    return cache
+
+
+@pytest.fixture
+def provider(monkeypatch):
+    """Turns the provider on and answers every chat with a numbered reply"""
+    calls = []
+
+    async def chat(messages, model, **options):
+        calls.append(messages)
+        return f"completion {len(calls)}"
+
+    monkeypatch.setattr(ai_provider, "chat", chat)
+    return calls
+
+
+async def test_mock_responses_are_not_cached(prompt_cache, provider, mock_db, monkeypatch):
+    service = AIService()
+    mock = await service.generate_service_recommendations("We sell coffee")
+    assert "contact us" in mock.lower()
+    assert await mock_db.ai_prompt_cache.count_documents({}) == 0
+
+    # Configuring a provider takes effect at once, not after the mock's TTL
+    monkeypatch.setattr(AIProviderClient, "enabled", property(lambda self: True))
+    assert await service.generate_service_recommendations("We sell coffee") == "completion 1"
+    assert await service.generate_service_recommendations("We sell coffee") == "completion 1"
+    assert len(provider) == 1
+    assert await mock_db.ai_prompt_cache.count_documents({}) == 1
+
+
+async def test_mock_streams_are_not_cached(prompt_cache, mock_db):
+    service = AIService()
+    chunks = [chunk async for chunk in service.stream_content("blog_post", "Coffee trends")]
+    assert "".join(chunks).startswith("Generated blog_post content")
+    assert await mock_db.ai_prompt_cache.count_documents({}) == 0
+
+
+async def test_uncached_calls_get_their_own_completions(prompt_cache, provider, mock_db, monkeypatch):
+    monkeypatch.setattr(AIProviderClient, "enabled", property(lambda self: True))
+    service = AIService()
+
+    variants = await asyncio.gather(*[
+        service.generate_content("ad_copy", "Summer sale", use_cache=False) for _ in range(3)
+    ])
+    assert sorted(variants) == ["completion 1", "completion 2", "completion 3"]
+    assert await mock_db.ai_prompt_cache.count_documents({}) == 0
+
+    cached = await asyncio.gather(*[service.generate_content("ad_copy", "Summer sale") for _ in range(3)])
+    assert len(set(cached)) == 1
+    assert len(provider) == 4
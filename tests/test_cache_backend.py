@@ -0,0 +1,195 @@
+import asyncio
+import sqlite3
+from datetime import datetime
+
+import fakeredis
+import pytest
+
+from services.cache_backend import CacheBackend, MemoryCacheBackend, RedisCacheBackend, SQLiteCacheBackend
+from services.response_cache import ResponseCache
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture(params=["memory", "sqlite", "redis"])
+async def backend(request, tmp_path):
+    if request.param == "memory":
+        backend = MemoryCacheBackend(max_entries=100)
+    elif request.param == "sqlite":
+        backend = SQLiteCacheBackend(str(tmp_path / "cache.sqlite3"), max_entries=100)
+    else:
+        backend = RedisCacheBackend(client=fakeredis.aioredis.FakeRedis(), prefix="test:")
+    yield backend
+    await backend.close()
+
+
+def test_cache_backend_is_abstract():
+    with pytest.raises(TypeError):
+        CacheBackend()
+
+
+async def test_get_set_delete(backend):
+    assert await backend.get("missing") is None
+
+    await backend.set("key", b"value")
+    assert await backend.get("key") == b"value"
+
+    await backend.set("key", b"replaced")
+    assert await backend.get("key") == b"replaced"
+
+    await backend.delete("key")
+    assert await backend.get("key") is None
+
+
+async def test_ttl_expires(backend):
+    await backend.set("short", b"gone soon", ttl=0.05)
+    await backend.set("forever", b"kept")
+    assert await backend.get("short") == b"gone soon"
+
+    await asyncio.sleep(0.15)
+    assert await backend.get("short") is None
+    assert await backend.get("forever") == b"kept"
+
+
+async def test_get_many_and_set_many(backend):
+    await backend.set_many({"a": b"1", "b": b"2"})
+    assert await backend.get_many(["a", "b", "c"]) == {"a": b"1", "b": b"2"}
+    assert await backend.get_many([]) == {}
+
+
+async def test_incr(backend):
+    assert await backend.incr("counter") == 1
+    assert await backend.incr("counter") == 2
+    assert int(await backend.get("counter")) == 2
+
+
+async def test_get_or_set_loads_once_for_concurrent_misses(backend):
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return b"loaded"
+
+    values = await asyncio.gather(*[backend.get_or_set("hot", loader, ttl=10) for _ in range(10)])
+    assert values == [b"loaded"] * 10
+    assert calls == 1
+    assert await backend.get_or_set("hot", loader) == b"loaded"
+    assert calls == 1
+
+
+async def test_memory_backend_evicts_least_recently_used():
+    backend = MemoryCacheBackend(max_entries=2)
+    await backend.set("a", b"1")
+    await backend.set("b", b"2")
+    await backend.get("a")
+    await backend.set("c", b"3")
+    assert await backend.get_many(["a", "b", "c"]) == {"a": b"1", "c": b"3"}
+
+
+async def test_sqlite_backend_is_shared_between_instances(tmp_path):
+    path = str(tmp_path / "shared.sqlite3")
+    first = SQLiteCacheBackend(path, max_entries=100)
+    second = SQLiteCacheBackend(path, max_entries=100)
+    try:
+        await first.set("key", b"value")
+        assert await second.get("key") == b"value"
+        assert await first.incr("counter") == 1
+        assert await second.incr("counter") == 2
+    finally:
+        await first.close()
+        await second.close()
+
+
+async def test_sqlite_reads_only_touch_stale_rows(tmp_path):
+    path = str(tmp_path / "touch.sqlite3")
+    backend = SQLiteCacheBackend(path, max_entries=100, touch_interval=60)
+    try:
+        await backend.set("key", b"value")
+        conn = sqlite3.connect(path)
+        accessed_at = conn.execute("SELECT accessed_at FROM cache WHERE key = 'key'").fetchone()[0]
+
+        assert await backend.get("key") == b"value"
+        assert conn.execute("SELECT accessed_at FROM cache WHERE key = 'key'").fetchone()[0] == accessed_at
+
+        conn.execute("UPDATE cache SET accessed_at = accessed_at - 120 WHERE key = 'key'")
+        conn.commit()
+        assert await backend.get("key") == b"value"
+        assert conn.execute("SELECT accessed_at FROM cache WHERE key = 'key'").fetchone()[0] > accessed_at - 120
+        conn.close()
+    finally:
+        await backend.close()
+
+
+async def test_redis_fill_lock_is_shared_across_processes():
+    # Two backends on one server stand in for two worker processes
+    server = fakeredis.FakeServer()
+    workers = [
+        RedisCacheBackend(client=fakeredis.aioredis.FakeRedis(server=server), prefix="test:")
+        for _ in range(2)
+    ]
+    calls = 0
+
+    async def loader():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.1)
+        return b"filled"
+
+    values = await asyncio.gather(*[worker.get_or_set("hot", loader, ttl=10) for worker in workers])
+    assert values == [b"filled", b"filled"]
+    assert calls == 1
+    assert await workers[0].client.get("test:hot:fill-lock") is None
+    for worker in workers:
+        await worker.close()
+
+
+async def test_redis_lock_holder_failure_falls_back_to_loading():
+    client = fakeredis.aioredis.FakeRedis()
+    backend = RedisCacheBackend(client=client, prefix="test:", lock_timeout=0.2)
+    # A crashed process left its fill lock behind
+    await client.set("test:hot:fill-lock", b"1", px=10000)
+
+    async def loader():
+        return b"fallback"
+
+    assert await backend.get_or_set("hot", loader) == b"fallback"
+    await backend.close()
+
+
+async def test_response_cache_generation_invalidation(backend):
+    responses = ResponseCache(backend, ttl=60)
+    renders = 0
+
+    async def render():
+        nonlocal renders
+        renders += 1
+        return {"items": [renders]}
+
+    first = await responses.get_or_render("services", {"page": 1}, render)
+    again = await responses.get_or_render("services", {"page": 1}, render)
+    assert renders == 1
+    assert again.body == first.body and again.etag == first.etag
+
+    await responses.invalidate("services")
+    fresh = await responses.get_or_render("services", {"page": 1}, render)
+    assert renders == 2
+    assert fresh.etag != first.etag
+
+    metrics = responses.get_metrics()["namespaces"]["services"]
+    assert (metrics["hits"], metrics["misses"], metrics["invalidations"]) == (1, 2, 1)
+
+
+async def test_response_cache_last_modified_only_for_single_documents():
+    responses = ResponseCache(MemoryCacheBackend(max_entries=100), ttl=60)
+    stamp = datetime(2025, 1, 2, 3, 4, 5)
+
+    async def render_item():
+        return {"id": "1", "updated_at": stamp}
+
+    async def render_list():
+        return [{"id": "1", "updated_at": stamp}]
+
+    assert (await responses.get_or_render("item", {}, render_item)).last_modified == stamp
+    assert (await responses.get_or_render("list", {}, render_list)).last_modified is None
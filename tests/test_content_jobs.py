@@ -0,0 +1,52 @@
+import asyncio
+
+import pytest
+
+from config import settings
+from models import ContentGenerationCreate, ContentJobStatus
+from services.ai_service import ai_service
+from services.content_jobs import ContentJobService
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def generate(monkeypatch):
+    """Answers the first prompt at once and blocks on every later one"""
+    calls = []
+    blocked = asyncio.Event()
+
+    async def generate_content(content_type, prompt, **options):
+        calls.append(prompt)
+        if len(calls) > 1:
+            blocked.set()
+            await asyncio.Event().wait()
+        return f"content for {prompt}"
+
+    monkeypatch.setattr(ai_service, "generate_content", generate_content)
+    return blocked
+
+
+async def test_stop_saves_results_and_fails_unfinished_items(mock_db, generate, monkeypatch):
+    monkeypatch.setattr(settings, "content_batch_workers", 1)
+    monkeypatch.setattr(settings, "content_batch_insert_size", 100)
+    service = ContentJobService()
+    await service.start()
+
+    items = [ContentGenerationCreate(content_type="blog_post", prompt=f"post {i}") for i in range(3)]
+    job = await service.submit(items)
+    live = service.get_live(job.id)
+    await asyncio.wait_for(generate.wait(), 1)
+    await service.stop()
+
+    records = await mock_db.content_generation.find({"metadata.job_id": job.id}).to_list(None)
+    assert [record["generated_content"] for record in records] == ["content for post 0"]
+
+    saved = await mock_db.content_jobs.find_one({"id": job.id})
+    assert saved["status"] == ContentJobStatus.COMPLETED
+    assert (saved["completed"], saved["failed"]) == (1, 2)
+    assert [error["index"] for error in saved["errors"]] == [1, 2]
+
+    events = [event async for event in service.stream(live)]
+    assert events[-1][0] == "done"
+    assert service.get_metrics()["queue_depth"] == 0
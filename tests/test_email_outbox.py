@@ -0,0 +1,139 @@
+from datetime import datetime, timedelta
+
+import pytest
+
+from config import settings
+from models import EmailStatus
+from services import email_outbox as email_outbox_module
+from services.email_outbox import EmailOutbox
+from services.email_transport import MockEmailTransport
+
+pytestmark = pytest.mark.anyio
+
+
+@pytest.fixture
+def transport(monkeypatch):
+    transport = MockEmailTransport()
+    monkeypatch.setattr(email_outbox_module, "email_transport", transport)
+    return transport
+
+
+@pytest.fixture
+def outbox(mock_db, transport):
+    return EmailOutbox()
+
+
+async def expire_claims(db):
+    """Make every claim look abandoned, as if its worker had died"""
+    await db.email_outbox.update_many({}, {"$set": {"locked_until": datetime.utcnow() - timedelta(seconds=1)}})
+
+
+async def test_identical_emails_are_sent_as_one_batch(outbox, transport, mock_db):
+    for recipient in ["a@example.com", "b@example.com", "c@example.com"]:
+        await outbox.enqueue(recipient, "Welcome", "<p>Hi</p>")
+    await outbox.enqueue("d@example.com", "Other", "<p>Other</p>")
+
+    assert await outbox.process_batch() == 4
+
+    sends = sorted(transport.outbox, key=lambda email: email["subject"])
+    assert [email["recipients"] for email in sends] == [["d@example.com"], ["a@example.com", "b@example.com", "c@example.com"]]
+    async for email in mock_db.email_outbox.find():
+        assert email["status"] == EmailStatus.SENT
+        assert email["attempts"] == 1
+        assert email["locked_until"] is None
+    assert await outbox.process_batch() == 0
+
+
+async def test_failed_send_is_retried_later(outbox, transport, mock_db):
+    transport.failure_rate = 1.0
+    email = await outbox.enqueue("a@example.com", "Hello", "<p>Hi</p>")
+
+    assert await outbox.process_batch() == 1
+
+    stored = await mock_db.email_outbox.find_one({"id": email.id})
+    assert stored["status"] == EmailStatus.PENDING
+    assert stored["attempts"] == 1
+    assert stored["next_attempt_at"] > datetime.utcnow()
+    assert "Mock transport failure" in stored["last_error"]
+    # Not due yet
+    assert await outbox.process_batch() == 0
+
+    transport.failure_rate = 0.0
+    await mock_db.email_outbox.update_one({"id": email.id}, {"$set": {"next_attempt_at": datetime.utcnow()}})
+    assert await outbox.process_batch() == 1
+    stored = await mock_db.email_outbox.find_one({"id": email.id})
+    assert (stored["status"], stored["attempts"]) == (EmailStatus.SENT, 2)
+    metrics = await outbox.get_metrics()
+    assert (metrics["retried"], metrics["sent"]) == (1, 1)
+
+
+async def test_dead_letter_and_requeue(outbox, transport, mock_db, monkeypatch):
+    monkeypatch.setattr(settings, "email_outbox_max_attempts", 2)
+    transport.failure_rate = 1.0
+    email = await outbox.enqueue("a@example.com", "Hello", "<p>Hi</p>")
+
+    await outbox.process_batch()
+    await mock_db.email_outbox.update_one({"id": email.id}, {"$set": {"next_attempt_at": datetime.utcnow()}})
+    await outbox.process_batch()
+
+    stored = await mock_db.email_outbox.find_one({"id": email.id})
+    assert (stored["status"], stored["attempts"]) == (EmailStatus.DEAD, 2)
+    assert await outbox.process_batch() == 0
+    assert (await outbox.get_metrics())["statuses"][EmailStatus.DEAD.value] == 1
+
+    assert await outbox.requeue(email.id)
+    assert not await outbox.requeue(email.id)
+    transport.failure_rate = 0.0
+    assert await outbox.process_batch() == 1
+    assert (await mock_db.email_outbox.find_one({"id": email.id}))["status"] == EmailStatus.SENT
+
+
+async def test_expired_claim_is_taken_over(outbox, transport, mock_db):
+    await outbox.enqueue("a@example.com", "Hello", "<p>Hi</p>")
+    stale = await outbox._claim()
+    await expire_claims(mock_db)
+
+    other = EmailOutbox()
+    assert await other.process_batch() == 1
+    assert len(transport.outbox) == 1
+
+    # The worker that lost its claim neither sends again nor overwrites the result
+    await outbox._send_group(stale)
+    assert len(transport.outbox) == 1
+    stored = await mock_db.email_outbox.find_one({})
+    assert (stored["status"], stored["attempts"]) == (EmailStatus.SENT, 1)
+
+
+async def test_stale_failure_does_not_overwrite_new_owner(outbox, transport, mock_db):
+    await outbox.enqueue("a@example.com", "Hello", "<p>Hi</p>")
+    stale = await outbox._claim()
+    await expire_claims(mock_db)
+    current = await EmailOutbox()._claim()
+
+    await outbox._fail(stale, "timed out")
+
+    stored = await mock_db.email_outbox.find_one({})
+    assert stored["status"] == EmailStatus.SENDING
+    assert stored["claimed_by"] == current[0]["claimed_by"]
+    assert stored["attempts"] == 0
+
+
+async def test_lock_is_extended_before_each_group(outbox, transport, mock_db, monkeypatch):
+    monkeypatch.setattr(settings, "email_outbox_lock_timeout", 600)
+    await outbox.enqueue("a@example.com", "Hello", "<p>Hi</p>")
+    claimed = await outbox._claim()
+    await expire_claims(mock_db)
+
+    # Still owned, so the group is extended and sent rather than abandoned
+    assert await outbox._extend_claim(claimed) == claimed
+    stored = await mock_db.email_outbox.find_one({})
+    assert stored["locked_until"] > datetime.utcnow() + timedelta(seconds=500)
+    assert await EmailOutbox()._claim() == []
+
+
+def test_outbox_endpoints_require_admin(mock_db):
+    from server import api_router, require_admin
+
+    for path in ("/api/email/outbox/dead", "/api/email/outbox/{email_id}/retry"):
+        route = next(route for route in api_router.routes if route.path == path)
+        assert require_admin in [dependency.dependency for dependency in route.dependencies]
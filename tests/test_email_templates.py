@@ -0,0 +1,92 @@
+from datetime import datetime
+
+import jwt
+import pytest
+from fastapi import HTTPException
+from fastapi.security import HTTPAuthorizationCredentials
+from jinja2.exceptions import SecurityError
+
+from config import settings
+from services.email_templates import EmailTemplateEngine
+
+pytestmark = pytest.mark.anyio
+
+TEST_SECRET = "test-secret-0123456789abcdef0123456789"
+
+CONTACT = {
+    "name": "Layla <b>Haddad</b>",
+    "email": "layla@example.com",
+    "phone": "+971 50 123 4567",
+    "service": "web_development",
+    "message": "Hello",
+    "created_at": datetime(2025, 1, 1, 12, 0),
+}
+
+
+@pytest.fixture
+def engine(mock_db):
+    return EmailTemplateEngine()
+
+
+async def store_template(db, name, subject, body):
+    await db.email_templates.insert_one({"name": name, "subject": subject, "body": body, "updated_at": datetime.utcnow()})
+
+
+@pytest.mark.parametrize("name, data", [
+    ("contact_confirmation", CONTACT),
+    ("contact_notification", CONTACT),
+    ("booking_confirmation", {"service_type": "seo", "preferred_date": "2025-02-01", "preferred_time": "10:00", "name": "Layla"}),
+    ("ai_content", {"content_type": "blog_post", "generated_content": "Text"}),
+    ("admin_digest", {"contacts": [CONTACT], "count": 1, "services": [("web_development", 1)],
+                      "since": CONTACT["created_at"], "until": CONTACT["created_at"], "generated_at": datetime.utcnow()}),
+])
+async def test_file_templates_render_in_sandbox(engine, name, data):
+    subject, body = await engine.render(name, {"sender_email": settings.sender_email, **data})
+    assert subject
+    assert body
+
+
+async def test_body_is_escaped(engine):
+    _, body = await engine.render("contact_confirmation", {"sender_email": settings.sender_email, **CONTACT})
+    assert "&lt;b&gt;Haddad&lt;/b&gt;" in body
+
+
+@pytest.mark.parametrize("expression", [
+    '{{ lipsum.__globals__["os"].getpid() }}',
+    "{{ ''.__class__.__mro__[1].__subclasses__() }}",
+    "{{ cycler.__init__.__globals__ }}",
+])
+async def test_database_templates_cannot_reach_python_internals(engine, mock_db, expression):
+    await store_template(mock_db, "evil", "Hi", expression)
+    with pytest.raises(SecurityError):
+        await engine.render("evil", {})
+
+
+async def test_database_templates_cannot_mutate_context(engine, mock_db):
+    await store_template(mock_db, "mutate", "Hi", "{{ items.append(1) }}")
+    with pytest.raises(SecurityError):
+        await engine.render("mutate", {"items": []})
+
+
+def admin_credentials(claims, secret=TEST_SECRET):
+    return HTTPAuthorizationCredentials(scheme="Bearer", credentials=jwt.encode(claims, secret, algorithm="HS256"))
+
+
+async def test_template_endpoints_require_admin(monkeypatch, mock_db):
+    from server import require_admin
+
+    monkeypatch.setattr(settings, "jwt_secret", TEST_SECRET)
+    assert (await require_admin(admin_credentials({"role": "admin"})))["role"] == "admin"
+
+    with pytest.raises(HTTPException) as error:
+        await require_admin(admin_credentials({"role": "customer"}))
+    assert error.value.status_code == 403
+
+    with pytest.raises(HTTPException) as error:
+        await require_admin(admin_credentials({"role": "admin"}, secret="forged-" + TEST_SECRET))
+    assert error.value.status_code == 401
+
+    monkeypatch.setattr(settings, "jwt_secret", "your-secret-key-change-in-production")
+    with pytest.raises(HTTPException) as error:
+        await require_admin(admin_credentials({"role": "admin"}, secret="your-secret-key-change-in-production"))
+    assert error.value.status_code == 503
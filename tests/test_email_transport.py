@@ -0,0 +1,120 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from services import email_transport as transport_module
+from services.email_transport import EmailDeliveryError, EmailTransport, MockEmailTransport, SendGridTransport
+
+pytestmark = pytest.mark.anyio
+
+
+class ConcurrencyProbe:
+    """Counts how many calls overlap"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.current = 0
+        self.peak = 0
+
+    def __enter__(self):
+        with self._lock:
+            self.current += 1
+            self.peak = max(self.peak, self.current)
+
+    def __exit__(self, *exc):
+        with self._lock:
+            self.current -= 1
+
+
+async def test_disabled_transport_raises():
+    transport = EmailTransport()
+    with pytest.raises(EmailDeliveryError):
+        await transport.send("a@example.com", "Hi", "<p>Hi</p>")
+    assert transport.get_metrics()["failed"] == 1
+
+
+async def test_mock_transport_records_sends():
+    transport = MockEmailTransport()
+    await transport.send_batch(["a@example.com", "b@example.com"], "Hello", "<p>Hello</p>")
+    await transport.send("c@example.com", "Plain", "Hello", "text/plain")
+
+    assert [email["recipients"] for email in transport.outbox] == [["a@example.com", "b@example.com"], ["c@example.com"]]
+    assert transport.outbox[1]["content_type"] == "text/plain"
+    metrics = transport.get_metrics()
+    assert (metrics["requests"], metrics["sent"], metrics["failed"], metrics["in_flight"]) == (2, 3, 0, 0)
+
+
+async def test_mock_transport_failures():
+    transport = MockEmailTransport(failure_rate=1.0)
+    with pytest.raises(EmailDeliveryError):
+        await transport.send_batch(["a@example.com", "b@example.com"], "Hello", "<p>Hello</p>")
+    assert len(transport.outbox) == 0
+    assert transport.get_metrics()["failed"] == 2
+
+
+async def test_mock_transport_caps_concurrency(monkeypatch):
+    transport = MockEmailTransport(latency=0.02, max_concurrency=3)
+    probe = ConcurrencyProbe()
+    sleep = asyncio.sleep
+
+    # The latency sleep runs while a send holds the semaphore
+    async def probed_sleep(delay):
+        with probe:
+            await sleep(delay)
+
+    monkeypatch.setattr(transport_module.asyncio, "sleep", probed_sleep)
+    await asyncio.gather(*[transport.send(f"{i}@example.com", "Hi", "Hi") for i in range(9)])
+    assert probe.peak == 3
+    assert len(transport.outbox) == 9
+
+
+async def test_send_batch_rejects_too_many_recipients():
+    transport = MockEmailTransport()
+    recipients = [f"{i}@example.com" for i in range(transport.max_recipients + 1)]
+    with pytest.raises(ValueError):
+        await transport.send_batch(recipients, "Hi", "Hi")
+    assert transport.get_metrics()["requests"] == 0
+
+
+@pytest.fixture
+async def sendgrid_transport():
+    transport = SendGridTransport("SG.test-key", max_concurrency=2, timeout=5)
+    yield transport
+    await transport.close()
+
+
+async def test_sendgrid_deliver_accepts_2xx(sendgrid_transport):
+    sent = []
+
+    def send_sync(recipients, subject, content, content_type):
+        sent.append((recipients, subject))
+        return 202
+
+    sendgrid_transport._send_sync = send_sync
+    await sendgrid_transport.send_batch(["a@example.com", "b@example.com"], "Hello", "<p>Hello</p>")
+    assert sent == [(["a@example.com", "b@example.com"], "Hello")]
+    assert sendgrid_transport.get_metrics()["sent"] == 2
+
+
+@pytest.mark.parametrize("status_code", [400, 401, 429, 500])
+async def test_sendgrid_deliver_raises_on_error_status(sendgrid_transport, status_code):
+    sendgrid_transport._send_sync = lambda *args: status_code
+    with pytest.raises(EmailDeliveryError, match=str(status_code)):
+        await sendgrid_transport.send("a@example.com", "Hello", "<p>Hello</p>")
+    assert sendgrid_transport.get_metrics()["failed"] == 1
+
+
+async def test_sendgrid_caps_concurrent_sends(sendgrid_transport):
+    probe = ConcurrencyProbe()
+
+    def send_sync(*args):
+        with probe:
+            time.sleep(0.02)
+        return 202
+
+    sendgrid_transport._send_sync = send_sync
+    await asyncio.gather(*[sendgrid_transport.send(f"{i}@example.com", "Hi", "Hi") for i in range(8)])
+    assert probe.peak == 2
+    assert sendgrid_transport.get_metrics()["sent"] == 8